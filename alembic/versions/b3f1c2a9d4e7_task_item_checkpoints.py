@@ -0,0 +1,52 @@
+"""task_item checkpoints
+
+Revision ID: b3f1c2a9d4e7
+Revises: 584272c2e407
+Create Date: 2026-10-18 10:12:31.418205
+
+"""
+from typing import Sequence, Union
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3f1c2a9d4e7"
+down_revision: Union[str, Sequence[str], None] = "584272c2e407"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "task_item",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("task_id", sa.Uuid(), nullable=False),
+        sa.Column("work_id", sa.Uuid(), nullable=False),
+        sa.Column("donor_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "DONE", "FAILED", name="taskitemstatus"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("source", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["task_id"], ["task.id"]),
+        sa.ForeignKeyConstraint(["work_id"], ["work.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("task_id", "donor_id"),
+    )
+    op.create_index(op.f("ix_task_item_task_id"), "task_item", ["task_id"], unique=False)
+    op.create_index(op.f("ix_task_item_work_id"), "task_item", ["work_id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_task_item_work_id"), table_name="task_item")
+    op.drop_index(op.f("ix_task_item_task_id"), table_name="task_item")
+    op.drop_table("task_item")
+    sa.Enum(name="taskitemstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,33 @@
+"""work content_hash
+
+Revision ID: c4e8a1d7f2b3
+Revises: b3f1c2a9d4e7
+Create Date: 2026-10-18 16:05:12.734519
+
+"""
+from typing import Sequence, Union
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e8a1d7f2b3"
+down_revision: Union[str, Sequence[str], None] = "b3f1c2a9d4e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "work",
+        sa.Column("content_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.create_index(op.f("ix_work_content_hash"), "work", ["content_hash"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_work_content_hash"), table_name="work")
+    op.drop_column("work", "content_hash")
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Form, Request, Depends
 from fastapi.responses import HTMLResponse
-from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.config import TEMPLATES
-from app.database.db import get_async_session
-from app.database.models import Task as TaskModel, TaskStatus
+from app.core.dependencies import get_work_status_use_case
+from app.database.models import TaskStatus
+from app.service.work_status import WorkStatusUseCase
 
 
 router = APIRouter(prefix="/check", tags=["Check Routes"])
@@ -18,10 +18,11 @@ def get_form(request: Request):
 async def check_status(
     request: Request,
     work_id: str = Form(...),
-    session: AsyncSession = Depends(get_async_session),
+    use_case: WorkStatusUseCase = Depends(get_work_status_use_case),
 ):
     """
-    Verifica el estado de una tarea en la base de datos.
+    Verifica el estado de una tarea (caché de Redis con respaldo en la base
+    de datos).
     
     Estados posibles:
     - PENDING: La tarea está en cola esperando ser procesada
@@ -29,21 +30,18 @@ async def check_status(
     - COMPLETED: La tarea finalizó exitosamente
     - FAILED: La tarea falló
     """
-    # Buscar la task en la DB por work_id
-    from sqlalchemy import select
-    stmt = select(TaskModel).where(TaskModel.work_id == work_id)
-    result = await session.execute(stmt)
-    task = result.scalar_one_or_none()
-    
-    if not task:
+    data = await use_case.execute(work_id)
+
+    if not data:
         status = "no encontrado"
         download_url = None
         error_message = None
+        progress = None
     else:
-        # Convertimos el status a string para la plantilla
-        status = task.status.value if isinstance(task.status, TaskStatus) else str(task.status)
-        download_url = f"/download/{task.id}" if task.status == TaskStatus.COMPLETED else None
-        error_message = task.error if task.status == TaskStatus.FAILED else None
+        status = data["status"]
+        download_url = data.get("download_url")
+        error_message = data.get("error") if status == TaskStatus.FAILED.value else None
+        progress = data.get("progress")
 
     return TEMPLATES.TemplateResponse(
         "status.html",
@@ -52,6 +50,7 @@ async def check_status(
             "status": status, 
             "download_url": download_url,
             "error_message": error_message,
-            "work_id": work_id
+            "work_id": work_id,
+            "progress": progress,
         },
     )
\ No newline at end of file
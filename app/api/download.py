@@ -1,16 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from app.database.db import get_async_session
-from app.database.models import Task as TaskModel, TaskStatus
+from app.database.models import Task as TaskModel, TaskStatus, Work as WorkModel, WorkStatus
+from app.utils.output_formats import convert_result, detect_output, media_type_for, validate_output
+from app.utils.result_encoding import ENCODINGS, checksum_for, encoded_variant
+from pathlib import Path
+from uuid import UUID
 import os
 
 router = APIRouter(tags=["Download"])
 
 
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    """Codificaciones aceptadas por el cliente (las de q=0 no cuentan)."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name, params = name.strip().lower(), params.strip()
+        quality = 1.0
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista de ETags o "*")."""
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def _result_response(
+    request: Request,
+    result_path: str,
+    output_format: Optional[str],
+    layout: Optional[str],
+) -> Response:
+    """
+    Respuesta de descarga del resultado.
+
+    - Convierte al formato/layout pedidos si no coinciden con los del
+      archivo guardado (la conversión se cachea junto a él).
+    - Negocia Content-Encoding (zstd, gzip) sirviendo las copias
+      precomprimidas escritas en el merge.
+    - ETag a partir del checksum del resultado (distinto por codificación)
+      y Last-Modified; responde 304 a If-None-Match / If-Modified-Since.
+    - Range e If-Range los resuelve FileResponse sobre el archivo servido.
+    """
+    path = Path(result_path)
+    if output_format or layout:
+        try:
+            stored_format, stored_layout = detect_output(path)
+            output_format = output_format or stored_format
+            layout = layout or stored_layout
+            validate_output(output_format, layout)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        path = await run_in_threadpool(convert_result, path, output_format, layout)
+
+    checksum = await run_in_threadpool(checksum_for, path)
+
+    encoding = None
+    served_path = path
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for candidate in ENCODINGS:
+        if candidate in accepted:
+            variant = encoded_variant(path, candidate)
+            if variant is not None:
+                encoding, served_path = candidate, variant
+                break
+
+    mtime = path.stat().st_mtime
+    etag = f'"{checksum[:32]}-{encoding}"' if encoding else f'"{checksum[:32]}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    headers["Content-Disposition"] = f'attachment; filename="{path.name}"'
+    return FileResponse(
+        path=served_path,
+        filename=path.name,
+        media_type=media_type_for(path),
+        headers=headers,
+    )
+
+
 @router.get("/download/{task_id}")
 async def download_result(
     task_id: str,
+    request: Request,
+    output_format: Optional[str] = Query(None, alias="format"),
+    layout: Optional[str] = Query(None),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
@@ -18,9 +127,13 @@ async def download_result(
 
     Args:
         task_id: ID de la tarea
+        format: csv, csv.gz, csv.zst, parquet o feather (por defecto, el
+            elegido al subir)
+        layout: wide o long (por defecto, el elegido al subir)
 
     Returns:
-        FileResponse con el archivo CSV resultante
+        FileResponse con el archivo resultante, o redirección a
+        /download/work/{work_id} si la tarea es un shard
     """
     task = await session.get(TaskModel, task_id)
 
@@ -33,6 +146,16 @@ async def download_result(
             detail=f"La tarea no está completada. Estado actual: {task.status.value}",
         )
 
+    # Un shard no tiene archivo propio (su result_path es el directorio de
+    # descargas): el resultado es el combinado del Work
+    if (task.payload or {}).get("shards") or (
+        task.result_path and os.path.isdir(task.result_path)
+    ):
+        url = str(request.url_for("download_work_result", work_id=str(task.work_id)))
+        if request.url.query:
+            url = f"{url}?{request.url.query}"
+        return RedirectResponse(url, status_code=307)
+
     if not task.result_path:
         raise HTTPException(
             status_code=404, detail="No se encontró el archivo de resultado"
@@ -45,12 +168,44 @@ async def download_result(
             detail=f"El archivo de resultado no existe en el servidor: {task.result_path}",
         )
 
-    # Extraer el nombre del archivo del path
-    filename = os.path.basename(task.result_path)
+    return await _result_response(request, task.result_path, output_format, layout)
 
-    return FileResponse(
-        path=task.result_path,
-        filename=filename,
-        media_type="text/csv",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+
+@router.get("/download/work/{work_id}")
+async def download_work_result(
+    work_id: str,
+    request: Request,
+    output_format: Optional[str] = Query(None, alias="format"),
+    layout: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Descarga el archivo combinado de un Work dividido en varias tareas.
+
+    Args:
+        work_id: ID del trabajo
+        format / layout: como en /download/{task_id}
+
+    Returns:
+        FileResponse con el archivo resultante
+    """
+    try:
+        work = await session.get(WorkModel, UUID(work_id))
+    except ValueError:
+        work = None
+
+    if not work:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    if work.status != WorkStatus.COMPLETED:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El trabajo no está completado. Estado actual: {work.status.value}",
+        )
+
+    if not work.output_path or not os.path.exists(work.output_path):
+        raise HTTPException(
+            status_code=404, detail="No se encontró el archivo de resultado"
+        )
+
+    return await _result_response(request, work.output_path, output_format, layout)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from redis import asyncio as aioredis
+from app.celery.events import TERMINAL_STATUSES, read_status_snapshot
+from app.database.db import async_session_maker
+from app.database.redis import get_redis, redis_client as shared_redis
+from app.repositories.task import TaskRepository
+from app.repositories.work import WorkRepository
+from app.service.work_events import WorkEventHub
+from app.service.work_status import WorkStatusUseCase
+
+router = APIRouter(prefix="/api", tags=["API Routes"])
+
+# Un suscriptor pub/sub por proceso, compartido por todos los clientes SSE
+work_event_hub = WorkEventHub(shared_redis)
+
+# Sin eventos durante este tiempo se envía un keepalive y se resincroniza
+# con la última foto del estado (por si se perdió algún evento)
+KEEPALIVE_SECONDS = 15
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _current_status(redis_client: aioredis.Redis, work_id: str) -> Optional[dict]:
+    """
+    Estado actual desde la caché de Redis. La sesión de base de datos (solo
+    se usa si falta la foto) se cierra antes de empezar el stream, para no
+    retener una conexión del pool mientras el cliente está conectado.
+    """
+    async with async_session_maker() as session:
+        use_case = WorkStatusUseCase(
+            TaskRepository(session), WorkRepository(session), redis_client
+        )
+        return await use_case.execute(work_id)
+
+
+@router.get("/events/{work_id}")
+async def stream_work_events(
+    work_id: str,
+    request: Request,
+    redis_client: aioredis.Redis = Depends(get_redis),
+):
+    """
+    Estado y progreso de un Work por Server-Sent Events.
+
+    Eventos:
+    - status: el mismo JSON que /api/status/{work_id}; se envía al conectar
+      y en cada cambio de estado. Tras completed, failed o not_found el
+      servidor cierra el stream.
+    - progress: el objeto progress de /api/status, tras cada lote procesado
+    """
+
+    async def stream():
+        async with work_event_hub.subscribe(work_id) as queue:
+            last = await _current_status(redis_client, work_id)
+            if last is None:
+                yield _sse("status", {"status": "not_found", "work_id": work_id})
+                return
+            yield _sse("status", last)
+
+            while last["status"] not in TERMINAL_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    current = await read_status_snapshot(redis_client, work_id)
+                    if current is not None and current["status"] != last["status"]:
+                        last = current
+                        yield _sse("status", last)
+                    else:
+                        yield ": keepalive\n\n"
+                    continue
+
+                if event["event"] == "status":
+                    last = event["data"]
+                yield _sse(event["event"], event["data"])
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
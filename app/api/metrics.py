@@ -0,0 +1,46 @@
+import json
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from redis import asyncio as aioredis
+from starlette.concurrency import run_in_threadpool
+from app.celery.capacity import list_worker_reports
+from app.celery.runtime import BROWSER_POOL_PREFIX
+from app.celery.semaphore import RedisSemaphore
+from app.database.redis import get_redis
+from app.integrations.scraper_service import get_donor_cache, get_signature_store
+
+router = APIRouter(prefix="/api", tags=["API Routes"])
+
+
+@router.get("/metrics")
+async def get_metrics(redis_client: aioredis.Redis = Depends(get_redis)):
+    """
+    Métricas del procesamiento leídas de Redis.
+
+    Retorna JSON con:
+    - processing: capacidad, titulares actuales y profundidad de la cola
+    - queue_wait: admisiones y tiempos de espera en cola (media, máximo, última)
+    - workers: último informe de capacidad de cada nodo worker vivo
+    - browser_pools: tamaño, préstamos, lanzamientos y reciclados del pool de
+      navegador de cada proceso worker
+    - cache: entradas y bytes de la caché de donantes y del almacén de firmas
+      (índices SQLite compartidos por API y workers)
+    """
+    semaphore = RedisSemaphore(redis_client)
+    browser_pools = {}
+    async for key in redis_client.scan_iter(match=f"{BROWSER_POOL_PREFIX}*"):
+        raw = await redis_client.get(key)
+        if raw:
+            browser_pools[key[len(BROWSER_POOL_PREFIX):]] = json.loads(raw)
+    return JSONResponse(
+        content={
+            "processing": await semaphore.state(),
+            "queue_wait": await semaphore.wait_stats(),
+            "workers": await list_worker_reports(redis_client),
+            "browser_pools": browser_pools,
+            "cache": {
+                "donors": await run_in_threadpool(lambda: get_donor_cache().stats()),
+                "signatures": await run_in_threadpool(lambda: get_signature_store().stats()),
+            },
+        }
+    )
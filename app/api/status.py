@@ -1,20 +1,31 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database.db import get_async_session
-from app.database.models import Task as TaskModel, TaskStatus
+from pydantic import BaseModel, Field
+from app.core.dependencies import get_work_status_use_case
+from app.service.work_status import WorkStatusUseCase
 
 router = APIRouter(prefix="/api", tags=["API Routes"])
 
+# Máximo de work_ids por consulta en lote
+MAX_BATCH_WORK_IDS = 1000
+
+
+class BatchStatusRequest(BaseModel):
+    work_ids: list[str]
+    status: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=MAX_BATCH_WORK_IDS)
+
 
 @router.get("/status/{work_id}")
 async def get_task_status(
     work_id: str,
-    session: AsyncSession = Depends(get_async_session),
+    use_case: WorkStatusUseCase = Depends(get_work_status_use_case),
 ):
     """
-    Obtiene el estado de una tarea por work_id.
+    Obtiene el estado de una tarea por work_id (de la caché de Redis; la
+    base de datos solo si falta).
     
     Retorna JSON con:
     - status: PENDING, RUNNING, COMPLETED, FAILED, o "not_found"
@@ -22,12 +33,15 @@ async def get_task_status(
     - task_id: ID de la tarea (si existe)
     - error: Mensaje de error (si falló)
     - result_path: Ruta del resultado (si completó)
+    - tasks_total / tasks_completed: progreso de los shards (si el Work
+      se dividió en varias tareas)
+    - progress: donantes (total, done, failed, remaining, percent),
+      cache_hits / cache_misses, throughput_per_second y eta_seconds, a
+      partir de los contadores agregados del Work (si ya empezó)
     """
-    stmt = select(TaskModel).where(TaskModel.work_id == work_id)  # type: ignore
-    result = await session.execute(stmt)
-    task = result.scalar_one_or_none()
-    
-    if not task:
+    data = await use_case.execute(work_id)
+
+    if not data:
         return JSONResponse(
             status_code=404,
             content={
@@ -36,20 +50,46 @@ async def get_task_status(
                 "message": "No se encontró ninguna tarea con ese work_id"
             }
         )
-    
-    status_value = task.status.value if isinstance(task.status, TaskStatus) else str(task.status)
-    
-    response_data = {
-        "status": status_value,
-        "work_id": work_id,
-        "task_id": str(task.id),
-    }
-    
-    if task.status == TaskStatus.FAILED and task.error:
-        response_data["error"] = task.error
-        
-    if task.status == TaskStatus.COMPLETED and task.result_path:
-        response_data["result_path"] = task.result_path
-        response_data["download_url"] = f"/download/{task.id}"
-    
-    return JSONResponse(content=response_data)
+
+    return JSONResponse(content=data)
+
+
+@router.post("/status")
+async def get_task_statuses(
+    body: BatchStatusRequest,
+    use_case: WorkStatusUseCase = Depends(get_work_status_use_case),
+):
+    """
+    Obtiene el estado de varios trabajos en una sola llamada.
+
+    Body JSON:
+    - work_ids: lista de IDs (máximo 1000; los repetidos se ignoran)
+    - status: devolver solo los que estén en ese estado (opcional)
+    - offset / limit: paginación sobre la lista filtrada, en el orden pedido
+
+    Retorna JSON con:
+    - items: estados en el mismo formato que /api/status/{work_id}
+    - total: número de trabajos tras el filtro
+    - not_found: work_ids sin ninguna tarea
+    """
+    work_ids = list(dict.fromkeys(body.work_ids))
+    if len(work_ids) > MAX_BATCH_WORK_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se admiten como máximo {MAX_BATCH_WORK_IDS} work_ids por consulta",
+        )
+
+    statuses = await use_case.execute_many(work_ids)
+    found = [statuses[w] for w in work_ids if w in statuses]
+    if body.status:
+        found = [data for data in found if data["status"] == body.status.lower()]
+
+    return JSONResponse(
+        content={
+            "items": found[body.offset : body.offset + body.limit],
+            "total": len(found),
+            "offset": body.offset,
+            "limit": body.limit,
+            "not_found": [w for w in work_ids if w not in statuses],
+        }
+    )
@@ -1,10 +1,13 @@
+import os
 from pathlib import Path
-from fastapi import APIRouter, Request, UploadFile, File, HTTPException, Depends
+from uuid import uuid4
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, Depends
 from fastapi.responses import HTMLResponse, JSONResponse
-from app.config.config import TEMPLATES, UPLOAD_DIR
+from app.config.config import TEMPLATES, UPLOAD_DIR, UPLOAD_CHUNK_SIZE
 from app.core.dependencies import get_upload_csv_use_case
 from app.service.upload_csv import UploadCSVUseCase
-from app.utils.validate_csv_bytes import validate_csv_bytes
+from app.utils.output_formats import DEFAULT_FORMAT, DEFAULT_LAYOUT, validate_output
+from app.utils.validate_csv_bytes import CSVStreamValidator
 
 router = APIRouter(tags=["Upload Routes"])
 
@@ -17,6 +20,8 @@ async def form_get(request: Request):
 @router.post("/")
 async def upload_csv(
     file: UploadFile = File(...),
+    output_format: str = Form(DEFAULT_FORMAT),
+    layout: str = Form(DEFAULT_LAYOUT),
     use_case: UploadCSVUseCase = Depends(get_upload_csv_use_case),
 ):
     if not file.filename:
@@ -31,27 +36,53 @@ async def upload_csv(
             content={"ok": False, "error": "El archivo debe tener extensión .csv"},
         )
 
-    # Leer bytes del archivo
-    content = await file.read()
-    result = validate_csv_bytes(content)
+    try:
+        validate_output(output_format, layout)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+
+    # Copiar el archivo a disco por bloques, validando sobre la marcha
+    validator = CSVStreamValidator()
+    tmp_path = UPLOAD_DIR / f".{uuid4().hex}.part"
+    try:
+        with tmp_path.open("wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                validator.feed(chunk)
+                out.write(chunk)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    result = validator.close()
     if not result["valid"]:
+        tmp_path.unlink(missing_ok=True)
         return JSONResponse(
             status_code=400,
             content={"ok": False, "error": "Validación fallida", "details": result},
         )
 
-    # Guardar archivo en disco
-    out_path = UPLOAD_DIR / filename
-    out_path.write_bytes(content)
+    # Mover el archivo validado a su nombre definitivo (único: dos subidas
+    # con el mismo nombre no se pisan)
+    out_path = UPLOAD_DIR / f"{uuid4().hex}_{filename}"
+    os.replace(tmp_path, out_path)
 
     try:
-        response = await use_case.execute(file_path=str(out_path), filename=filename)
+        response = await use_case.execute(
+            file_path=str(out_path),
+            filename=filename,
+            output_format=output_format,
+            layout=layout,
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"ok": False, "error": f"Error al procesar Work/Task: {e}"},
         )
 
+    if response["deduplicated"]:
+        # El Work reutilizado trabaja con su propia copia del archivo
+        out_path.unlink(missing_ok=True)
+
     # Responder con información del Work y Task creados
     return JSONResponse(
         status_code=200,
@@ -59,8 +90,13 @@ async def upload_csv(
             "ok": True,
             "work_id": response["work_id"],
             "task_id": response["task_id"],
+            "task_ids": response["task_ids"],
+            "download_url": response["download_url"],
             "filename": filename,
             "validation": result["info"],
-            "saved_to": str(out_path),
+            "saved_to": None if response["deduplicated"] else str(out_path),
+            "output": {"format": output_format, "layout": layout},
+            "deduplicated": response["deduplicated"],
+            "reused": response["reused"],
         },
     )
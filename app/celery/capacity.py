@@ -0,0 +1,218 @@
+"""
+Capacidad dinámica del semáforo de procesamiento.
+
+Cada nodo worker publica periódicamente (heartbeat) un informe con su memoria
+libre, la huella de Chromium y de los procesos del worker, y cuántas plazas
+puede aportar. La capacidad global (global:processing_capacity) se recalcula
+como la suma de las plazas de los nodos vivos, así que un nodo que entra o
+sale del clúster cambia la capacidad sin tocar Redis a mano.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import psutil
+import redis
+from redis import asyncio as aioredis
+from celery.signals import worker_ready, worker_shutdown
+
+from app.celery.celery_app import broker_url
+from app.celery.semaphore import CAPACITY_KEY
+from app.config.environment import settings
+from app.integrations.memory_watchdog import is_chromium
+
+# ------------------------------
+# Claves Redis
+# ------------------------------
+WORKERS_KEY = "global:workers"
+WORKER_PREFIX = "global:worker:"
+
+# KEYS: workers set, capacity | ARGV: worker prefix
+# Suma las plazas de los informes vivos y olvida los nodos caducados.
+_RESIZE_SCRIPT = """
+local total = 0
+for _, name in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local raw = redis.call('GET', ARGV[1] .. name)
+    if raw then
+        total = total + tonumber(cjson.decode(raw)['slots'] or 0)
+    else
+        redis.call('SREM', KEYS[1], name)
+    end
+end
+if total < 1 then
+    total = 1
+end
+redis.call('SET', KEYS[2], total)
+return total
+"""
+
+MB = 1024 * 1024
+
+
+def _cgroup_available_bytes() -> Optional[int]:
+    """Memoria libre dentro del límite del contenedor (cgroup v2), si lo hay."""
+    limit_file = Path("/sys/fs/cgroup/memory.max")
+    current_file = Path("/sys/fs/cgroup/memory.current")
+    try:
+        limit = limit_file.read_text().strip()
+        if limit == "max":
+            return None
+        return int(limit) - int(current_file.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def available_memory_bytes() -> int:
+    """Memoria disponible del nodo, respetando el límite del contenedor."""
+    available = psutil.virtual_memory().available
+    cgroup_available = _cgroup_available_bytes()
+    if cgroup_available is not None:
+        available = min(available, cgroup_available)
+    return max(0, available)
+
+
+def process_tree_footprint(root: Optional[psutil.Process] = None) -> dict:
+    """
+    RSS de los procesos del worker y de sus Chromium.
+
+    Returns:
+        Dict con rss_mb (procesos Python del worker), chromium_mb y browsers
+        (nº de navegadores, contando solo los procesos Chromium raíz)
+    """
+    root = root or psutil.Process()
+    rss = chromium = 0
+    browsers = 0
+    for proc in [root] + root.children(recursive=True):
+        try:
+            mem = proc.memory_info().rss
+            if is_chromium(proc):
+                chromium += mem
+                if not is_chromium(proc.parent()):
+                    browsers += 1
+            elif "python" in proc.name().lower() or proc.pid == root.pid:
+                rss += mem
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return {"rss_mb": rss // MB, "chromium_mb": chromium // MB, "browsers": browsers}
+
+
+def build_report(concurrency: int) -> dict:
+    """
+    Informe de capacidad del nodo.
+
+    La memoria que ya usan los jobs en curso cuenta como disponible para
+    ellos (si no, la capacidad oscilaría con cada job que arranca). La huella
+    por job es la observada por navegador, nunca menor que
+    WORKER_JOB_MEMORY_MB.
+    """
+    footprint = process_tree_footprint()
+    available_mb = available_memory_bytes() // MB
+    per_job_mb = settings.WORKER_JOB_MEMORY_MB
+    if footprint["browsers"]:
+        per_job_mb = max(per_job_mb, footprint["chromium_mb"] // footprint["browsers"])
+    headroom_mb = available_mb + footprint["chromium_mb"]
+    slots = max(0, min(concurrency, int(headroom_mb // per_job_mb)))
+    return {
+        "available_mb": available_mb,
+        "per_job_mb": per_job_mb,
+        "concurrency": concurrency,
+        "slots": slots,
+        "ts": time.time(),
+        **footprint,
+    }
+
+
+def resize_capacity(redis_client: redis.Redis) -> int:
+    """Recalcula la capacidad global a partir de los informes vivos."""
+    script = redis_client.register_script(_RESIZE_SCRIPT)
+    return int(script(keys=[WORKERS_KEY, CAPACITY_KEY], args=[WORKER_PREFIX]))
+
+
+async def list_worker_reports(redis_client: aioredis.Redis) -> dict:
+    """Informes vivos de los nodos worker (para métricas)."""
+    names = sorted(await redis_client.smembers(WORKERS_KEY))
+    if not names:
+        return {}
+    raws = await redis_client.mget([f"{WORKER_PREFIX}{name}" for name in names])
+    return {name: json.loads(raw) for name, raw in zip(names, raws) if raw}
+
+
+class CapacityHeartbeat:
+    """Thread que publica el informe del nodo y redimensiona la capacidad."""
+
+    def __init__(self, node_name: str, concurrency: int, interval: float):
+        self.node_name = node_name
+        self.concurrency = concurrency
+        self.interval = interval
+        self.redis = redis.Redis.from_url(broker_url, decode_responses=True)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="capacity-heartbeat", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def beat(self):
+        report = build_report(self.concurrency)
+        self.redis.set(
+            f"{WORKER_PREFIX}{self.node_name}",
+            json.dumps(report),
+            ex=int(self.interval * 3),
+        )
+        self.redis.sadd(WORKERS_KEY, self.node_name)
+        capacity = resize_capacity(self.redis)
+        return report, capacity
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.beat()
+            except Exception as e:
+                print(f"[WARN] Heartbeat de capacidad fallido: {e}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        """Detiene el heartbeat y retira el nodo de la capacidad global."""
+        self._stop.set()
+        try:
+            self.redis.delete(f"{WORKER_PREFIX}{self.node_name}")
+            self.redis.srem(WORKERS_KEY, self.node_name)
+            capacity = resize_capacity(self.redis)
+            print(f"[CAPACITY] Nodo {self.node_name} retirado, capacidad global: {capacity}")
+        except Exception as e:
+            print(f"[WARN] No se pudo retirar el nodo {self.node_name}: {e}")
+        finally:
+            self.redis.close()
+
+
+_heartbeat: Optional[CapacityHeartbeat] = None
+
+
+@worker_ready.connect
+def start_capacity_heartbeat(sender=None, **kwargs):
+    global _heartbeat
+    controller = getattr(sender, "controller", None)
+    concurrency = getattr(controller, "concurrency", None) or os.cpu_count() or 1
+    node_name = f"{socket.gethostname()}:{os.getpid()}"
+    _heartbeat = CapacityHeartbeat(
+        node_name, int(concurrency), settings.WORKER_HEARTBEAT_SECONDS
+    )
+    report, capacity = _heartbeat.beat()
+    _heartbeat.start()
+    print(
+        f"[CAPACITY] Nodo {node_name}: {report['slots']} plazas "
+        f"({report['available_mb']} MB libres), capacidad global: {capacity}"
+    )
+
+
+@worker_shutdown.connect
+def stop_capacity_heartbeat(**kwargs):
+    global _heartbeat
+    if _heartbeat is not None:
+        _heartbeat.stop()
+        _heartbeat = None
@@ -8,7 +8,7 @@ celery = Celery(
     "app",
     broker=broker_url,
     backend=backend_url,
-    include=["app.celery.task.process_task"]
+    include=["app.celery.task.process_task", "app.celery.capacity"]
 )
 
 celery.conf.update(
@@ -0,0 +1,101 @@
+"""
+Escritura por lotes de los checkpoints por donante de una tarea.
+
+El scraper notifica cada donante terminado (``record``, síncrono y sin E/S);
+los resultados se acumulan en memoria y se vuelcan a la tabla task_item en
+lotes, cuando se alcanza ``batch_size`` o cada ``flush_seconds``. Si el
+worker muere, como mucho se pierde el último lote: esos donantes se repiten
+en el reintento (normalmente como aciertos de caché).
+
+Cada lote confirmado se suma también a los contadores de progreso del Work
+en Redis (``WorkProgress``), que son los que lee la API de estado.
+"""
+import asyncio
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.celery.progress import WorkProgress
+from app.repositories.task_item import TaskItemRepository
+
+
+class CheckpointWriter:
+    def __init__(
+        self,
+        session_maker,
+        task_id: str,
+        batch_size: int = 50,
+        flush_seconds: float = 5.0,
+        progress: Optional[WorkProgress] = None,
+    ):
+        self.session_maker = session_maker
+        self.task_id = task_id
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.progress = progress
+        self._done: dict[str, str] = {}
+        self._failed: dict[str, str] = {}
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+
+    def record(self, donor_id: str, ok: bool, source: str, error: Optional[str] = None):
+        """Callback del scraper: anota el resultado de un donante."""
+        if ok:
+            self._failed.pop(donor_id, None)
+            self._done[donor_id] = source
+        else:
+            self._failed[donor_id] = error or "error"
+        if len(self._done) + len(self._failed) >= self.batch_size:
+            self._wake.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Vuelca el lote pendiente; si falla, lo conserva para el siguiente."""
+        async with self._lock:
+            if not self._done and not self._failed:
+                return
+            done, self._done = self._done, {}
+            failed, self._failed = self._failed, {}
+            try:
+                async with self.session_maker() as db:
+                    repo = TaskItemRepository(db)
+                    await repo.mark_done(self.task_id, done)
+                    await repo.mark_failed(self.task_id, failed)
+                    await db.commit()
+                self.flushed += len(done) + len(failed)
+            except Exception as e:
+                print(f"[WARN] No se pudo guardar el checkpoint de {self.task_id}: {e}")
+                # Lo más reciente gana frente a lo que se reintenta
+                self._done = {**done, **self._done}
+                self._failed = {**failed, **self._failed}
+                return
+            if self.progress is not None:
+                try:
+                    await self.progress.add(done, failed)
+                except aioredis.RedisError as e:
+                    # El checkpoint ya está en la base de datos; solo se
+                    # pierde precisión en el progreso mostrado
+                    print(f"[WARN] No se pudo actualizar el progreso de {self.task_id}: {e}")
+
+    async def close(self):
+        """Detiene el volcado periódico y escribe lo que quede."""
+        self._stopping = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
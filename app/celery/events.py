@@ -0,0 +1,97 @@
+"""
+Eventos de estado y progreso de un Work publicados por los workers.
+
+Cada cambio de estado publica el estado completo (el mismo JSON que
+``/api/status``) en el canal ``work:{id}:events`` y lo guarda como última
+foto en ``work:{id}:status``; cada lote de checkpoints publica el progreso.
+La API los reenvía a los navegadores por Server-Sent Events sin tocar la
+base de datos.
+
+La foto es también la caché de lectura de los endpoints de estado: los
+estados intermedios caducan pronto (``STATUS_CACHE_TTL_SECONDS``) y los
+finales se conservan un día. El progreso no se guarda en la foto; se lee
+siempre de sus contadores.
+"""
+import json
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.config.environment import settings
+
+EVENTS_PREFIX = "work:"
+EVENTS_SUFFIX = ":events"
+STATUS_SUFFIX = ":status"
+STATUS_SNAPSHOT_TTL = 24 * 3600
+
+# Estados tras los que ya no llegan más eventos
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def events_channel(work_id: str) -> str:
+    return f"{EVENTS_PREFIX}{work_id}{EVENTS_SUFFIX}"
+
+
+def status_key(work_id: str) -> str:
+    return f"{EVENTS_PREFIX}{work_id}{STATUS_SUFFIX}"
+
+
+def work_id_from_channel(channel: str) -> str:
+    return channel[len(EVENTS_PREFIX) : -len(EVENTS_SUFFIX)]
+
+
+def status_ttl(data: dict) -> int:
+    if data["status"] in TERMINAL_STATUSES:
+        return STATUS_SNAPSHOT_TTL
+    return settings.STATUS_CACHE_TTL_SECONDS
+
+
+def _snapshot(data: dict) -> str:
+    return json.dumps({k: v for k, v in data.items() if k != "progress"})
+
+
+async def cache_status(
+    redis_client: aioredis.Redis, work_id: str, data: dict, overwrite: bool = True
+):
+    """Guarda la foto del estado; con ``overwrite=False`` solo si no hay otra."""
+    await redis_client.set(
+        status_key(work_id), _snapshot(data), ex=status_ttl(data), nx=not overwrite
+    )
+
+
+async def publish_status(redis_client: aioredis.Redis, work_id: str, data: dict):
+    """Guarda la foto del estado y la publica como evento "status"."""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(status_key(work_id), _snapshot(data), ex=status_ttl(data))
+        pipe.publish(events_channel(work_id), json.dumps({"event": "status", "data": data}))
+        await pipe.execute()
+
+
+async def publish_progress(redis_client: aioredis.Redis, work_id: str, progress: dict):
+    """Publica el progreso agregado como evento "progress"."""
+    await redis_client.publish(
+        events_channel(work_id), json.dumps({"event": "progress", "data": progress})
+    )
+
+
+async def read_status_snapshot(redis_client: aioredis.Redis, work_id: str) -> Optional[dict]:
+    raw = await redis_client.get(status_key(work_id))
+    return json.loads(raw) if raw else None
+
+
+async def read_status_snapshots(
+    redis_client: aioredis.Redis, work_ids: list[str]
+) -> dict[str, dict]:
+    """Fotos de estado de varios Works con un único MGET (solo las que hay)."""
+    if not work_ids:
+        return {}
+    raws = await redis_client.mget([status_key(w) for w in work_ids])
+    return {w: json.loads(raw) for w, raw in zip(work_ids, raws) if raw}
+
+
+async def cache_statuses(redis_client: aioredis.Redis, statuses: dict[str, dict]):
+    """Cachea varios estados en un pipeline, sin pisar los que ya existan."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for work_id, data in statuses.items():
+            pipe.set(status_key(work_id), _snapshot(data), ex=status_ttl(data), nx=True)
+        await pipe.execute()
@@ -0,0 +1,139 @@
+"""
+Progreso agregado de un Work en Redis.
+
+Un hash por Work (``work:{id}:progress``) con contadores que los workers
+incrementan en lote, junto con los checkpoints de cada tarea: total de
+donantes, hechos, fallidos, aciertos y fallos de caché, y una media móvil
+exponencial del ritmo (donantes/s). La API lee el hash de una vez (HGETALL)
+y deriva porcentaje y ETA sin recorrer la tabla task_item. Los shards de un
+mismo Work suman sobre el mismo hash. Cada lote se publica además como
+evento "progress" para los clientes suscritos por SSE.
+"""
+import time
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.celery.events import publish_progress
+
+PROGRESS_PREFIX = "work:"
+PROGRESS_SUFFIX = ":progress"
+PROGRESS_TTL_SECONDS = 7 * 24 * 3600
+
+# Peso de la última medida en la media móvil del ritmo
+RATE_ALPHA = 0.3
+
+# KEYS: hash de progreso
+# ARGV: done, failed, hits, now, alpha, ttl
+# Suma un lote y actualiza el ritmo con el tiempo desde la última marca
+_ADD_SCRIPT = """
+local n = tonumber(ARGV[1]) + tonumber(ARGV[2])
+local now = tonumber(ARGV[4])
+redis.call('HINCRBY', KEYS[1], 'done', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'failed', ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'cache_hits', ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'cache_misses', n - tonumber(ARGV[3]))
+local last = tonumber(redis.call('HGET', KEYS[1], 'last_at') or '0')
+if last > 0 and now > last then
+    local inst = n / (now - last)
+    local rate = tonumber(redis.call('HGET', KEYS[1], 'rate') or '0')
+    if rate > 0 then
+        local alpha = tonumber(ARGV[5])
+        rate = alpha * inst + (1 - alpha) * rate
+    else
+        rate = inst
+    end
+    redis.call('HSET', KEYS[1], 'rate', tostring(rate))
+end
+redis.call('HSET', KEYS[1], 'last_at', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return 1
+"""
+
+
+def progress_key(work_id: str) -> str:
+    return f"{PROGRESS_PREFIX}{work_id}{PROGRESS_SUFFIX}"
+
+
+class WorkProgress:
+    """Escritura de los contadores de progreso de un Work."""
+
+    def __init__(self, redis_client: aioredis.Redis, work_id: str):
+        self.redis = redis_client
+        self.work_id = work_id
+        self.key = progress_key(work_id)
+        self._add = redis_client.register_script(_ADD_SCRIPT)
+
+    async def register(self, new_items: int, retrying: int = 0):
+        """
+        Arranque de una tarea: suma sus donantes nuevos al total y descuenta
+        de ``failed`` los fallidos que se van a reintentar. Marca el inicio
+        de la medida del ritmo.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if new_items:
+                pipe.hincrby(self.key, "total", new_items)
+            if retrying:
+                pipe.hincrby(self.key, "failed", -retrying)
+            pipe.hsetnx(self.key, "started_at", time.time())
+            pipe.hset(self.key, "last_at", time.time())
+            pipe.expire(self.key, PROGRESS_TTL_SECONDS)
+            await pipe.execute()
+
+    async def add(self, done: dict[str, str], failed: dict[str, str]):
+        """Suma un lote de checkpoints ({donor_id: origen} y {donor_id: error})."""
+        if not done and not failed:
+            return
+        hits = sum(1 for source in done.values() if source == "cache")
+        await self._add(
+            keys=[self.key],
+            args=[len(done), len(failed), hits, time.time(), RATE_ALPHA, PROGRESS_TTL_SECONDS],
+        )
+        progress = await read_progress(self.redis, self.work_id)
+        if progress:
+            await publish_progress(self.redis, self.work_id, progress)
+
+
+async def read_progress(redis_client: aioredis.Redis, work_id: str) -> Optional[dict]:
+    """
+    Progreso de un Work: done/total, aciertos y fallos de caché, ritmo
+    (donantes/s) y ETA en segundos. None si el Work aún no tiene contadores.
+    """
+    return _from_hash(await redis_client.hgetall(progress_key(work_id)))
+
+
+async def read_progress_many(
+    redis_client: aioredis.Redis, work_ids: list[str]
+) -> dict[str, dict]:
+    """Progreso de varios Works en una ida y vuelta (pipeline de HGETALL)."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for work_id in work_ids:
+            pipe.hgetall(progress_key(work_id))
+        raws = await pipe.execute()
+    progress = {}
+    for work_id, raw in zip(work_ids, raws):
+        data = _from_hash(raw)
+        if data:
+            progress[work_id] = data
+    return progress
+
+
+def _from_hash(raw: dict) -> Optional[dict]:
+    if not raw:
+        return None
+    total = int(raw.get("total", 0))
+    done = int(raw.get("done", 0))
+    failed = int(raw.get("failed", 0))
+    rate = float(raw.get("rate", 0))
+    remaining = max(0, total - done - failed)
+    return {
+        "total": total,
+        "done": done,
+        "failed": failed,
+        "remaining": remaining,
+        "percent": round(100 * (done + failed) / total, 1) if total else 0.0,
+        "cache_hits": int(raw.get("cache_hits", 0)),
+        "cache_misses": int(raw.get("cache_misses", 0)),
+        "throughput_per_second": round(rate, 3),
+        "eta_seconds": round(remaining / rate) if rate > 0 and remaining else None,
+    }
@@ -0,0 +1,112 @@
+import asyncio
+import random
+from redis import asyncio as aioredis
+
+# ------------------------------
+# Claves Redis (junto a global:processing_capacity)
+# ------------------------------
+RATE_BUCKET_KEY = "global:rate_limit:bucket"
+RATE_PENALTY_KEY = "global:rate_limit:penalty"
+
+# Recarga y consumo atómico del bucket. Usa el reloj de Redis para que todos
+# los workers compartan la misma referencia temporal. Devuelve los segundos a
+# esperar (0 si se concedió el token).
+_ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local penalty = tonumber(redis.call('GET', KEYS[2]) or '1')
+rate = rate / penalty
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# Backoff adaptativo: duplica la penalización ante lentitud/timeouts y la
+# reduce gradualmente con respuestas normales.
+_REPORT_SCRIPT = """
+local p = tonumber(redis.call('GET', KEYS[1]) or '1')
+if ARGV[1] == 'slow' then
+    p = math.min(tonumber(ARGV[2]), p * 2)
+else
+    p = math.max(1, p * 0.9)
+end
+if p <= 1 then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], tostring(p), 'EX', ARGV[3])
+end
+return tostring(p)
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token bucket distribuido en Redis para las peticiones al sitio de signal.
+
+    Todas las instancias (de cualquier worker o proceso) comparten el mismo
+    bucket, de modo que añadir workers nunca supera `rate` peticiones/segundo.
+    La tasa efectiva se divide por una penalización compartida que crece
+    cuando el sitio responde lento o con timeouts.
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        rate: float,
+        burst: int = 1,
+        slow_seconds: float = 20.0,
+        max_penalty: float = 8.0,
+        penalty_ttl: int = 600,
+    ):
+        self.redis = redis_client
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.slow_seconds = slow_seconds
+        self.max_penalty = max_penalty
+        self.penalty_ttl = penalty_ttl
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._report = redis_client.register_script(_REPORT_SCRIPT)
+
+    async def acquire(self):
+        """Espera hasta obtener un token del bucket global."""
+        while True:
+            wait = float(
+                await self._acquire(
+                    keys=[RATE_BUCKET_KEY, RATE_PENALTY_KEY],
+                    args=[self.rate, self.burst],
+                )
+            )
+            if wait <= 0:
+                return
+            # Pequeño jitter para que los workers no reintenten a la vez
+            await asyncio.sleep(wait + random.uniform(0, 0.1))
+
+    async def report(self, latency: float, overloaded: bool = False):
+        """
+        Informa del resultado de una petición para ajustar el backoff.
+
+        Solo penalizan las señales de saturación del sitio: ``overloaded``
+        (timeout, 429 o 5xx) o una respuesta más lenta que ``slow_seconds``.
+        Un donante inexistente o una respuesta inválida no frenan el bucket.
+        """
+        outcome = "slow" if overloaded or latency > self.slow_seconds else "ok"
+        penalty = float(
+            await self._report(
+                keys=[RATE_PENALTY_KEY],
+                args=[outcome, self.max_penalty, self.penalty_ttl],
+            )
+        )
+        if outcome == "slow":
+            print(f"[RATE LIMIT] Sitio lento o con timeouts, penalización x{penalty:g}")
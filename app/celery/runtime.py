@@ -0,0 +1,152 @@
+"""
+Runtime por proceso worker de Celery.
+
+Cada proceso hijo del worker crea, al arrancar (señal worker_process_init),
+un event loop de larga duración, un engine de base de datos con su pool de
+conexiones y un cliente Redis con su pool. Todas las tareas de ese proceso los
+reutilizan en lugar de crear y destruir conexiones en cada ejecución, y se
+cierran ordenadamente al terminar el proceso (worker_process_shutdown).
+
+El runtime también aloja el pool de navegador precalentado del proceso, que
+se crea en la primera tarea que lo necesita y se presta a las siguientes; sus
+estadísticas se publican en Redis para /api/metrics.
+"""
+import asyncio
+import json
+import os
+import socket
+from typing import Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.celery.celery_app import broker_url
+from app.database.db import DB_URL
+from app.integrations.browser_pool import BrowserPool
+from app.integrations.scraper_service import build_browser_pool
+
+# Estadísticas del pool de navegador de cada proceso worker
+BROWSER_POOL_PREFIX = "global:browser_pool:"
+BROWSER_POOL_STATS_TTL = 3600
+
+
+class WorkerRuntime:
+    """Loop, pool de base de datos y pool de Redis compartidos por las tareas."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.engine = create_async_engine(
+            DB_URL,
+            echo=False,
+            pool_size=2,  # cada proceso ejecuta una tarea a la vez
+            max_overflow=2,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+        )
+        self.session_maker = async_sessionmaker(
+            self.engine, expire_on_commit=False, class_=AsyncSession
+        )
+        self.redis: aioredis.Redis = aioredis.from_url(
+            broker_url, decode_responses=True
+        )
+        self.browser_pool: Optional[BrowserPool] = None
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def run(self, coro):
+        """
+        Ejecuta una corrutina en el loop del proceso.
+
+        Al terminar, también si falla, se cancelan las tareas que dejó
+        pendientes (salvo las residentes del pool de navegador): el loop es
+        compartido y, si no, se reanudarían dentro de la siguiente tarea.
+        """
+        before = asyncio.all_tasks(self.loop)
+        try:
+            return self.loop.run_until_complete(coro)
+        finally:
+            self._cancel_leftovers(before)
+
+    def _cancel_leftovers(self, before: set):
+        resident = self.browser_pool.background_tasks() if self.browser_pool else set()
+        leftovers = asyncio.all_tasks(self.loop) - before - resident
+        if not leftovers:
+            return
+        print(f"[WARN] Cancelando {len(leftovers)} corrutinas pendientes de la tarea anterior")
+        for task in leftovers:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*leftovers, return_exceptions=True))
+
+    def get_browser_pool(self) -> BrowserPool:
+        """Pool de navegador del proceso (Chromium se lanza en el primer préstamo)."""
+        if self.browser_pool is None:
+            self.browser_pool = build_browser_pool()
+        return self.browser_pool
+
+    async def publish_pool_stats(self):
+        """Publica las estadísticas del pool de navegador en Redis."""
+        if self.browser_pool is None:
+            return
+        try:
+            await self.redis.set(
+                f"{BROWSER_POOL_PREFIX}{self.name}",
+                json.dumps(self.browser_pool.stats()),
+                ex=BROWSER_POOL_STATS_TTL,
+            )
+        except aioredis.RedisError as e:
+            print(f"[WARN] No se pudieron publicar las estadísticas del pool: {e}")
+
+    async def _forget_pool_stats(self):
+        try:
+            await self.redis.delete(f"{BROWSER_POOL_PREFIX}{self.name}")
+        except aioredis.RedisError:
+            pass  # caducan solas con su TTL
+
+    def close(self):
+        try:
+            if self.browser_pool is not None:
+                self.loop.run_until_complete(self.browser_pool.close())
+                self.loop.run_until_complete(self._forget_pool_stats())
+            self.loop.run_until_complete(self.engine.dispose())
+            self.loop.run_until_complete(self.redis.aclose())
+        finally:
+            self.loop.close()
+
+
+_runtime: Optional[WorkerRuntime] = None
+
+
+def get_runtime() -> WorkerRuntime:
+    """
+    Devuelve el runtime del proceso actual.
+
+    Si el proceso no pasó por worker_process_init (p. ej. pool solo o
+    ejecución eager) se crea en el primer uso.
+    """
+    global _runtime
+    if _runtime is None or _runtime.loop.is_closed():
+        _runtime = WorkerRuntime()
+    return _runtime
+
+
+@worker_process_init.connect
+def init_worker_runtime(**kwargs):
+    global _runtime
+    _runtime = WorkerRuntime()
+    print("[RUNTIME] Runtime del proceso worker inicializado")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_runtime(**kwargs):
+    global _runtime
+    if _runtime is None:
+        return
+    try:
+        _runtime.close()
+        print("[RUNTIME] Runtime del proceso worker cerrado")
+    except Exception as e:
+        print(f"[WARN] Error cerrando el runtime del worker: {e}")
+    finally:
+        _runtime = None
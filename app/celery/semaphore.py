@@ -0,0 +1,267 @@
+"""
+Semáforo distribuido en Redis para limitar las tareas pesadas en ejecución.
+
+Cada titular ocupa una plaza con un lease (ZSET holder -> expiración en ms).
+Adquirir es un único script Lua (una ida y vuelta): purga los leases
+caducados, comprueba la capacidad y registra al titular. Si un worker muere
+sin liberar, su plaza vuelve al pool cuando vence el lease; mientras la tarea
+vive, un heartbeat lo renueva.
+
+Quien no obtiene plaza queda en una cola FIFO y espera con BLPOP sobre su
+propia clave de aviso, que `release` rellena para los primeros de la cola:
+la tarea arranca en cuanto hay capacidad y las admisiones respetan el orden
+de llegada.
+"""
+import asyncio
+import time
+from typing import Optional
+from redis import asyncio as aioredis
+
+# ------------------------------
+# Claves Redis
+# ------------------------------
+CAPACITY_KEY = "global:processing_capacity"
+HOLDERS_KEY = "global:processing_holders"
+QUEUE_KEY = "global:processing_queue"  # ZSET titular -> nº de turno (FIFO)
+WAITERS_KEY = "global:processing_waiters"  # ZSET titular -> expiración (vivos)
+SEQ_KEY = "global:processing_seq"
+WAKE_PREFIX = "global:processing_wake:"
+WAIT_STATS_KEY = "global:processing_wait_stats"
+
+_NOW = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+"""
+
+# Purga leases caducados y esperas abandonadas (sin heartbeat)
+_PURGE = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local dead = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', now)
+for _, w in ipairs(dead) do
+    redis.call('ZREM', KEYS[3], w)
+    redis.call('ZREM', KEYS[4], w)
+end
+"""
+
+# KEYS: holders, capacity, queue, waiters, seq
+# ARGV: holder, lease_ms, waiter_ttl_ms
+# Concede la plaza solo si hay hueco y el titular está dentro de los primeros
+# turnos de la cola (orden FIFO); si no, lo encola y devuelve 0.
+_ACQUIRE_SCRIPT = _NOW + _PURGE + """
+local lease_until = now + tonumber(ARGV[2])
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    redis.call('ZADD', KEYS[1], lease_until, ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    redis.call('ZREM', KEYS[4], ARGV[1])
+    return 1
+end
+local capacity = tonumber(redis.call('GET', KEYS[2]) or '1')
+local free = capacity - redis.call('ZCARD', KEYS[1])
+if free > 0 then
+    local rank = redis.call('ZRANK', KEYS[3], ARGV[1])
+    if not rank then
+        rank = redis.call('ZCARD', KEYS[3])
+    end
+    if rank < free then
+        redis.call('ZADD', KEYS[1], lease_until, ARGV[1])
+        redis.call('ZREM', KEYS[3], ARGV[1])
+        redis.call('ZREM', KEYS[4], ARGV[1])
+        return 1
+    end
+end
+if not redis.call('ZSCORE', KEYS[3], ARGV[1]) then
+    redis.call('ZADD', KEYS[3], redis.call('INCR', KEYS[5]), ARGV[1])
+end
+redis.call('ZADD', KEYS[4], now + tonumber(ARGV[3]), ARGV[1])
+return 0
+"""
+
+# KEYS: holders, capacity, queue, waiters | ARGV: holder, wake_prefix
+# Libera la plaza y despierta a los primeros de la cola que caben.
+_RELEASE_SCRIPT = _NOW + _PURGE + """
+redis.call('ZREM', KEYS[1], ARGV[1])
+local capacity = tonumber(redis.call('GET', KEYS[2]) or '1')
+local free = capacity - redis.call('ZCARD', KEYS[1])
+if free > 0 then
+    for _, w in ipairs(redis.call('ZRANGE', KEYS[3], 0, free - 1)) do
+        local wake = ARGV[2] .. w
+        redis.call('LPUSH', wake, '1')
+        redis.call('EXPIRE', wake, 60)
+    end
+end
+return free
+"""
+
+# KEYS: holders | ARGV: holder, lease_ms
+_RENEW_SCRIPT = _NOW + """
+local expires = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not expires or tonumber(expires) <= now then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+return 1
+"""
+
+# KEYS: holders, capacity, queue, waiters | devuelve [titulares vivos, en cola]
+_STATE_SCRIPT = _NOW + _PURGE + """
+return {redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES'), redis.call('ZCARD', KEYS[3])}
+"""
+
+# KEYS: stats | ARGV: segundos esperados
+_RECORD_WAIT_SCRIPT = """
+local wait = tonumber(ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'count', 1)
+redis.call('HINCRBYFLOAT', KEYS[1], 'total_seconds', wait)
+redis.call('HSET', KEYS[1], 'last_seconds', ARGV[1])
+local max = tonumber(redis.call('HGET', KEYS[1], 'max_seconds') or '0')
+if wait > max then
+    redis.call('HSET', KEYS[1], 'max_seconds', ARGV[1])
+end
+return 1
+"""
+
+
+class LeaseLost(RuntimeError):
+    """El titular perdió su plaza (lease caducado y sin hueco para recuperarla)."""
+
+
+class RedisSemaphore:
+    """
+    Semáforo con leases y cola de espera FIFO sobre Redis.
+
+    - lease_seconds: vida de una plaza sin heartbeat
+    - waiter_ttl_seconds: vida de un turno en la cola sin volver a reclamarlo
+    - poll_seconds: espera máxima entre reintentos si nadie avisa (p. ej.
+      cuando una plaza se libera por caducidad del lease)
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        lease_seconds: float = 120,
+        waiter_ttl_seconds: float = 30,
+        poll_seconds: int = 5,
+    ):
+        self.redis = redis_client
+        self.lease_ms = int(lease_seconds * 1000)
+        self.waiter_ttl_ms = int(waiter_ttl_seconds * 1000)
+        self.poll_seconds = max(1, int(poll_seconds))
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+        self._state = redis_client.register_script(_STATE_SCRIPT)
+        self._record_wait = redis_client.register_script(_RECORD_WAIT_SCRIPT)
+
+    async def acquire(self, holder: str) -> bool:
+        """
+        Intenta ocupar una plaza respetando el orden de la cola.
+
+        Reentrante para el mismo titular. Si no hay plaza, el titular queda
+        encolado (conserva su turno mientras vuelva a intentarlo).
+        """
+        granted = await self._acquire(
+            keys=[HOLDERS_KEY, CAPACITY_KEY, QUEUE_KEY, WAITERS_KEY, SEQ_KEY],
+            args=[holder, self.lease_ms, self.waiter_ttl_ms],
+        )
+        return bool(granted)
+
+    async def wait_acquire(
+        self,
+        holder: str,
+        timeout: float,
+        keep_turn: bool = False,
+        since: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Espera en la cola FIFO hasta obtener una plaza.
+
+        Se despierta en cuanto otro titular libera (BLPOP sobre su clave de
+        aviso) o, como mucho, cada `poll_seconds`.
+
+        Args:
+            keep_turn: al agotar `timeout` el titular conserva su turno (para
+                volver a esperar enseguida) en lugar de abandonar la cola
+            since: instante (time.monotonic) desde el que se cuenta la espera,
+                si empezó en una llamada anterior
+
+        Returns:
+            Segundos esperados, o None si se agotó `timeout`
+        """
+        started = time.monotonic()
+        wake_key = f"{WAKE_PREFIX}{holder}"
+        while not await self.acquire(holder):
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                if not keep_turn:
+                    await self.leave_queue(holder)
+                return None
+            await self.redis.blpop([wake_key], timeout=min(self.poll_seconds, max(1, int(remaining))))
+        await self.redis.delete(wake_key)
+
+        waited = time.monotonic() - (started if since is None else since)
+        await self._record_wait(keys=[WAIT_STATS_KEY], args=[f"{waited:.3f}"])
+        return waited
+
+    async def leave_queue(self, holder: str):
+        await self.redis.zrem(QUEUE_KEY, holder)
+        await self.redis.zrem(WAITERS_KEY, holder)
+
+    async def renew(self, holder: str) -> bool:
+        """Extiende el lease; False si ya había caducado."""
+        return bool(await self._renew(keys=[HOLDERS_KEY], args=[holder, self.lease_ms]))
+
+    async def release(self, holder: str):
+        """Libera la plaza y avisa a los siguientes de la cola."""
+        await self._release(
+            keys=[HOLDERS_KEY, CAPACITY_KEY, QUEUE_KEY, WAITERS_KEY],
+            args=[holder, WAKE_PREFIX],
+        )
+
+    async def keep_alive(self, holder: str):
+        """
+        Heartbeat: renueva el lease cada tercio de su duración hasta ser cancelado.
+
+        Si el lease caducó (p. ej. Redis inaccesible más que su duración),
+        intenta recuperar la plaza sin esperar turno; si no hay hueco lanza
+        LeaseLost, porque la plaza puede estar ya ocupada por otra tarea.
+        """
+        interval = self.lease_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self.renew(holder):
+                    continue
+                print(f"[WARN] Lease de {holder} caducado antes de renovarse")
+                if await self.acquire(holder):
+                    continue
+                await self.leave_queue(holder)
+                raise LeaseLost(f"La tarea {holder} perdió su plaza de procesamiento")
+            except aioredis.RedisError as e:
+                print(f"[WARN] No se pudo renovar el lease de {holder}: {e}")
+
+    async def state(self) -> dict:
+        """Capacidad, titulares actuales (con expiración en ms) y profundidad de la cola."""
+        holders, waiting = await self._state(
+            keys=[HOLDERS_KEY, CAPACITY_KEY, QUEUE_KEY, WAITERS_KEY]
+        )
+        capacity = int(await self.redis.get(CAPACITY_KEY) or 1)
+        return {
+            "capacity": capacity,
+            "holders": {
+                holders[i]: int(float(holders[i + 1])) for i in range(0, len(holders), 2)
+            },
+            "queue_depth": int(waiting),
+        }
+
+    async def wait_stats(self) -> dict:
+        """Métrica de espera en cola: nº de admisiones, media, máximo y última."""
+        raw = await self.redis.hgetall(WAIT_STATS_KEY)
+        count = int(raw.get("count", 0))
+        total = float(raw.get("total_seconds", 0))
+        return {
+            "count": count,
+            "avg_seconds": round(total / count, 3) if count else 0.0,
+            "max_seconds": float(raw.get("max_seconds", 0)),
+            "last_seconds": float(raw.get("last_seconds", 0)),
+        }
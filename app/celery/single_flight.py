@@ -0,0 +1,245 @@
+"""
+Descarga única por donante entre todos los jobs del clúster (single-flight).
+
+Antes de descargar un donante que no está en la caché, el job toma su lease
+en Redis (``donor:{id}:fetch``, SET NX con caducidad y el token del job). Si
+otro job ya lo tiene, no lo descarga: espera su aviso en el canal
+``donor:fetched``, que el dueño publica al terminar cada donante, y entonces
+lo toma de la caché compartida.
+
+- Los leases se renuevan en segundo plano mientras el job vive; si el worker
+  muere, caducan y el siguiente que espera el donante lo reclama.
+- Si el dueño falla con un donante, su lease se libera y quien lo esperaba
+  lo intenta por su cuenta.
+- Los avisos pueden perderse (pub/sub no guarda mensajes): quien espera
+  revisa igualmente los leases cada ``poll_seconds``.
+
+Como en CheckpointWriter, el scraper notifica cada donante terminado de
+forma síncrona (``finish``) y los leases se liberan por lotes desde una
+tarea en segundo plano.
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Iterable, Optional
+from uuid import uuid4
+
+from redis import asyncio as aioredis
+
+LEASE_PREFIX = "donor:"
+LEASE_SUFFIX = ":fetch"
+FETCHED_CHANNEL = "donor:fetched"
+
+# KEYS: leases | ARGV: token, lease_ms
+# Renueva solo los leases que siguen siendo de este job.
+_RENEW_SCRIPT = """
+local renewed = 0
+for _, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('PEXPIRE', key, ARGV[2])
+        renewed = renewed + 1
+    end
+end
+return renewed
+"""
+
+# KEYS: leases | ARGV: token, canal, aviso de cada lease (mismo orden)
+# Libera los leases propios y avisa a quien espera esos donantes.
+_RELEASE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('DEL', key)
+    end
+    redis.call('PUBLISH', ARGV[2], ARGV[i + 2])
+end
+return #KEYS
+"""
+
+
+def lease_key(donor_id: str) -> str:
+    return f"{LEASE_PREFIX}{donor_id}{LEASE_SUFFIX}"
+
+
+class DonorFlights:
+    """
+    Leases por donante de un job de scraping.
+
+    - lease_seconds: vida de un lease sin renovar (lo que tarda en
+      recuperarse un donante si su dueño muere)
+    - poll_seconds: espera máxima entre revisiones de los leases ajenos
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        lease_seconds: float = 120,
+        poll_seconds: float = 5,
+    ):
+        self.redis = redis_client
+        self.token = uuid4().hex
+        self.lease_ms = int(lease_seconds * 1000)
+        self.poll_seconds = poll_seconds
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self._owned: set[str] = set()
+        self._finished: dict[str, bool] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.coalesced = 0
+
+    # ------------------------------
+    # Dueño
+    # ------------------------------
+    async def claim(self, donor_ids: Iterable[str]) -> tuple[list[str], list[str]]:
+        """
+        Toma los leases libres en un pipeline.
+
+        Returns:
+            (propios, ajenos): los donantes que descarga este job y los que
+            ya está descargando otro
+        """
+        donor_ids = list(donor_ids)
+        if not donor_ids:
+            return [], []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for donor_id in donor_ids:
+                pipe.set(lease_key(donor_id), self.token, nx=True, px=self.lease_ms)
+            granted = await pipe.execute()
+
+        owned = [d for d, ok in zip(donor_ids, granted) if ok]
+        self._owned.update(owned)
+        self._start()
+        return owned, [d for d, ok in zip(donor_ids, granted) if not ok]
+
+    def finish(self, donor_id: str, ok: bool):
+        """Callback del scraper: el donante terminó (se ignora si no es propio)."""
+        if donor_id in self._owned:
+            self._finished[donor_id] = ok
+            self._wake.set()
+
+    def _start(self):
+        if self._task is None and not self._stopping:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Libera lo terminado en cuanto llega y renueva el resto cada tercio del lease."""
+        interval = self.lease_ms / 3000
+        next_renew = time.monotonic() + interval
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(), timeout=max(0, next_renew - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._flush()
+                if time.monotonic() >= next_renew:
+                    next_renew = time.monotonic() + interval
+                    if self._owned:
+                        await self._renew(keys=[lease_key(d) for d in self._owned], args=[self.token, self.lease_ms])
+            except aioredis.RedisError as e:
+                print(f"[WARN] No se pudieron actualizar los leases de donantes: {e}")
+
+    async def _flush(self):
+        if not self._finished:
+            return
+        finished, self._finished = self._finished, {}
+        try:
+            await self._release(
+                keys=[lease_key(d) for d in finished],
+                args=[
+                    self.token,
+                    FETCHED_CHANNEL,
+                    *(json.dumps({"donor_id": d, "ok": ok}) for d, ok in finished.items()),
+                ],
+            )
+        except aioredis.RedisError:
+            self._finished = {**finished, **self._finished}
+            raise
+        self._owned.difference_update(finished)
+
+    async def close(self):
+        """
+        Libera los leases que queden. Los donantes sin terminar (job
+        abortado) se anuncian como fallidos para que otro los reclame ya.
+        """
+        self._stopping = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        for donor_id in self._owned:
+            self._finished.setdefault(donor_id, False)
+        try:
+            await self._flush()
+        except aioredis.RedisError as e:
+            print(f"[WARN] No se pudieron liberar los leases de donantes (caducarán solos): {e}")
+
+    # ------------------------------
+    # Espera
+    # ------------------------------
+    async def wait(self, donor_ids: Iterable[str], take_ready: Callable[[str], bool]) -> list[str]:
+        """
+        Espera a los donantes que descarga otro job.
+
+        ``take_ready(donor_id)`` se llama cuando el lease ajeno desaparece y
+        debe devolver True si el donante ya está en la caché (y tomarlo). Si
+        no lo está (el dueño falló o murió), este job reclama el lease.
+
+        Returns:
+            Donantes reclamados: este job debe descargarlos
+        """
+        pending = set(donor_ids)
+        taken_over: list[str] = []
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(FETCHED_CHANNEL)
+        try:
+            while pending:
+                # Revisión completa tras suscribirse y cada poll_seconds:
+                # cubre avisos perdidos y dueños caídos
+                held = await self._held(pending)
+                for donor_id in [d for d in pending if d not in held]:
+                    pending.discard(donor_id)
+                    if not await self._settle(donor_id, take_ready, taken_over):
+                        pending.add(donor_id)
+
+                deadline = time.monotonic() + self.poll_seconds
+                while pending and (remaining := deadline - time.monotonic()) > 0:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=remaining
+                    )
+                    if message is None:
+                        continue
+                    donor_id = json.loads(message["data"])["donor_id"]
+                    if donor_id in pending:
+                        pending.discard(donor_id)
+                        if not await self._settle(donor_id, take_ready, taken_over):
+                            pending.add(donor_id)
+        finally:
+            await pubsub.unsubscribe(FETCHED_CHANNEL)
+            await pubsub.aclose()
+        return taken_over
+
+    async def _held(self, donor_ids: set[str]) -> set[str]:
+        """Donantes cuyo lease sigue existiendo."""
+        ordered = list(donor_ids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for donor_id in ordered:
+                pipe.exists(lease_key(donor_id))
+            exists = await pipe.execute()
+        return {d for d, n in zip(ordered, exists) if n}
+
+    async def _settle(self, donor_id: str, take_ready: Callable[[str], bool], taken_over: list) -> bool:
+        """Resuelve un donante cuyo lease ajeno terminó; False si sigue pendiente."""
+        if take_ready(donor_id):
+            self.coalesced += 1
+            return True
+        owned, _ = await self.claim([donor_id])
+        if owned:
+            taken_over.append(donor_id)
+            return True
+        # Otro job lo reclamó antes: se sigue esperando
+        return False
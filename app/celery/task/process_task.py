@@ -1,23 +1,46 @@
+from typing import Optional
 from celery import shared_task
+from celery.exceptions import Retry
 import psutil
 import asyncio
+import time
 from redis import asyncio as aioredis
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from app.database.db import DB_URL
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.database.models import Task, TaskStatus
-from app.integrations.scraper_service import run_scraper_job
+from app.integrations.scraper_service import (
+    load_mapping_from_csv,
+    merge_work_outputs,
+    run_scraper_job_async,
+)
+from app.repositories.task import TaskRepository
+from app.repositories.task_item import TaskItemRepository
+from app.repositories.work import WorkRepository
 from app.celery.celery_app import broker_url
+from app.celery.checkpoint import CheckpointWriter
+from app.celery.events import publish_status
+from app.celery.progress import WorkProgress, read_progress
+from app.celery.runtime import get_runtime
+from app.celery.semaphore import CAPACITY_KEY, RedisSemaphore
+from app.config.environment import settings
+from app.service.work_status import load_work_status
 
 # ------------------------------
 # Configuración Redis
 # ------------------------------
-TOKEN_KEY = "global:processing_tokens"
+# Capacidad del semáforo de procesamiento (plazas simultáneas)
+TOKEN_KEY = CAPACITY_KEY
 
 # ==============================
 # Inicialización de tokens
 # ==============================
 async def set_initial_tokens():
-    """Inicializa tokens en Redis basado en RAM disponible"""
+    """
+    Capacidad inicial de respaldo basada en la RAM disponible de la API.
+
+    Solo se usa mientras ningún worker ha publicado su informe: en cuanto
+    arranca el primer nodo, app.celery.capacity redimensiona la clave con la
+    memoria real de los workers.
+    """
     r = aioredis.from_url(broker_url, decode_responses=True)
     try:
         mem = psutil.virtual_memory()
@@ -37,29 +60,67 @@ async def set_initial_tokens():
     finally:
         await r.aclose()
 
+
+def get_semaphore(redis_client: aioredis.Redis) -> RedisSemaphore:
+    """Semáforo de procesamiento con el lease configurado."""
+    return RedisSemaphore(redis_client, lease_seconds=settings.TOKEN_LEASE_SECONDS)
+
 # ==============================
-# Funciones ASÍNCRONAS para tokens
+# Estado del Work
 # ==============================
-async def acquire_token(redis_client: aioredis.Redis) -> bool:
-    """Intenta adquirir un token del pool usando transacciones Redis"""
-    async with redis_client.pipeline() as pipe:
-        while True:
-            try:
-                await pipe.watch(TOKEN_KEY)
-                tokens = int(await redis_client.get(TOKEN_KEY) or 0)
-                if tokens <= 0:
-                    await pipe.unwatch()
-                    return False
-                pipe.multi()
-                pipe.decr(TOKEN_KEY)
-                await pipe.execute()
-                return True
-            except aioredis.WatchError:
-                continue
-
-async def release_token(redis_client: aioredis.Redis):
-    """Libera un token de vuelta al pool"""
-    await redis_client.incr(TOKEN_KEY)
+async def refresh_work_status(
+    db: AsyncSession, work_id: str, output_path: Optional[str] = None
+):
+    """Recalcula el estado del Work a partir de sus tareas y lo persiste."""
+    work_repo = WorkRepository(db)
+    work = await work_repo.get(work_id)
+    if not work:
+        return None
+    work.tasks = await TaskRepository(db).list_by_work(work_id)
+    if output_path:
+        work.output_path = output_path
+    work.refresh_status()
+    await work_repo.update(work)
+    await db.commit()
+    await publish_work_status(db, work_id)
+    return work
+
+
+async def publish_work_status(db: AsyncSession, work_id: str):
+    """
+    Publica el estado del Work a los clientes suscritos y lo deja en la
+    caché de estado de la API.
+    """
+    redis_client = get_runtime().redis
+    try:
+        data = await load_work_status(TaskRepository(db), WorkRepository(db), work_id)
+        if data:
+            progress = await read_progress(redis_client, work_id)
+            if progress:
+                data["progress"] = progress
+            await publish_status(redis_client, work_id, data)
+    except aioredis.RedisError as e:
+        print(f"[WARN] No se pudo publicar el estado de {work_id}: {e}")
+
+async def _while_leased(job, heartbeat: asyncio.Task):
+    """
+    Ejecuta el scraping mientras la tarea conserve su plaza.
+
+    Si el heartbeat termina antes (LeaseLost: la plaza pudo pasar a otra
+    tarea), el scraping se cancela y el error se propaga como un fallo más:
+    la tarea se reintenta y retoma desde sus checkpoints.
+    """
+    job = asyncio.ensure_future(job)
+    try:
+        await asyncio.wait({job, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        lost = not job.done()
+        if lost:
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
+    if lost:
+        heartbeat.result()
+    return job.result()
 
 # ==============================
 # Tarea Celery
@@ -68,19 +129,21 @@ async def release_token(redis_client: aioredis.Redis):
 def process_task(self, task_id: str):
     """
     Wrapper síncrono para Celery que ejecuta la tarea principal de forma async.
+
+    Devuelve (como resultado de Celery) la ruta del resultado y los contadores
+    de caché del scraping. Se ejecuta en el loop de larga duración del proceso
+    worker, reutilizando sus pools de base de datos y Redis.
     """
-    asyncio.run(_process_task_async(self, task_id))
+    return get_runtime().run(_process_task_async(self, task_id))
 
 # ==============================
 # Función asíncrona interna
 # ==============================
 async def _process_task_async(self, task_id: str):
-    # Crear un engine y sessionmaker locales para este loop
-    engine = create_async_engine(DB_URL, echo=False)
-    async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    
-    # Crear cliente Redis local para este loop
-    redis_client = aioredis.from_url(broker_url, decode_responses=True)
+    # Pools compartidos del proceso worker
+    runtime = get_runtime()
+    async_session = runtime.session_maker
+    semaphore = get_semaphore(runtime.redis)
     
     db_task = None
     
@@ -92,32 +155,111 @@ async def _process_task_async(self, task_id: str):
                 print(f"[ERROR] Task {task_id} not found in database")
                 return
 
-            if not await acquire_token(redis_client):
-                print(f"No hay tokens, reintentando tarea {task_id}...")
-                raise self.retry(countdown=30)
+            # Espera en la cola FIFO hasta que haya capacidad. Esperar no es
+            # un fallo: la tarea conserva su turno y no gasta reintentos
+            queued_at = time.monotonic()
+            while (
+                queue_wait := await semaphore.wait_acquire(
+                    task_id,
+                    timeout=settings.TOKEN_WAIT_TIMEOUT,
+                    keep_turn=True,
+                    since=queued_at,
+                )
+            ) is None:
+                print(
+                    f"[QUEUE] Task {task_id} sigue en cola tras "
+                    f"{time.monotonic() - queued_at:.0f}s sin capacidad"
+                )
+            print(f"[QUEUE] Task {task_id} admitida tras {queue_wait:.1f}s en cola")
+
+            # Heartbeat del lease mientras la tarea trabaja
+            heartbeat = asyncio.create_task(semaphore.keep_alive(task_id))
+            work_id = str(db_task.work_id)
 
             try:
                 # Actualizamos estado a RUNNING
                 db_task.status = TaskStatus.RUNNING
                 await db.commit()
+                await refresh_work_status(db, work_id)
 
                 if not db_task.payload:
                     raise ValueError("task.payload no puede ser None")
 
-                # Ejecutamos función pesada sin bloquear el loop
-                loop = asyncio.get_running_loop()
-                result_path = await loop.run_in_executor(
-                    None, 
-                    run_scraper_job, 
-                    db_task.payload["csv_path"],
-                    str(db_task.work_id)
+                # En modo fan-out la tarea solo procesa su shard y el merge
+                # lo hace el callback del chord
+                csv_path = db_task.payload["csv_path"]
+                donor_ids = db_task.payload.get("donor_ids")
+                all_ids = donor_ids if donor_ids is not None else list(load_mapping_from_csv(csv_path))
+
+                # Checkpoints: solo se procesan los donantes que faltan
+                items = TaskItemRepository(db)
+                new_items = await items.add_pending(task_id, work_id, all_ids)
+                await db.commit()
+                counts = await items.count_by_status(task_id)
+                remaining = await items.list_remaining(task_id, settings.ITEM_MAX_ATTEMPTS)
+                if len(remaining) < len(all_ids):
+                    print(
+                        f"[CHECKPOINT] Task {task_id} reanudada: "
+                        f"{len(all_ids) - len(remaining)}/{len(all_ids)} donantes ya hechos"
+                    )
+
+                # Progreso agregado del Work: total nuevo y fallidos que se
+                # reintentan (dejan de contar como fallidos)
+                progress = WorkProgress(runtime.redis, work_id)
+                try:
+                    await progress.register(
+                        new_items, retrying=len(remaining) - counts["pending"]
+                    )
+                except aioredis.RedisError as e:
+                    print(f"[WARN] No se pudo registrar el progreso de {task_id}: {e}")
+
+                checkpoints = CheckpointWriter(
+                    async_session,
+                    task_id,
+                    settings.CHECKPOINT_BATCH_SIZE,
+                    progress=progress,
                 )
+                checkpoints.start()
+                try:
+                    # El scraping corre en el loop del runtime con su pool de
+                    # navegador precalentado y su cliente Redis
+                    job_result = await _while_leased(
+                        run_scraper_job_async(
+                            csv_path,
+                            work_id,
+                            remaining,
+                            donor_ids is None,
+                            redis_client=runtime.redis,
+                            browser_pool=runtime.get_browser_pool(),
+                            on_item=checkpoints.record,
+                            protect=all_ids,
+                            output=db_task.payload.get("output"),
+                        ),
+                        heartbeat,
+                    )
+                finally:
+                    await checkpoints.close()
+                job_result["resumed_done"] = len(all_ids) - len(remaining)
 
                 # Guardamos resultado y marcamos completada
-                db_task.result_path = result_path
+                db_task.result_path = job_result["result_path"]
                 db_task.status = TaskStatus.COMPLETED
                 await db.commit()
-                print(f"[SUCCESS] Task {task_id} completed successfully")
+                await refresh_work_status(
+                    db,
+                    work_id,
+                    output_path=job_result["result_path"] if donor_ids is None else None,
+                )
+                print(
+                    f"[SUCCESS] Task {task_id} completed successfully "
+                    f"(cache hits: {job_result['cache_hits']}, "
+                    f"misses: {job_result['cache_misses']})"
+                )
+                return {
+                    "task_id": task_id,
+                    "queue_wait_seconds": round(queue_wait, 3),
+                    **job_result,
+                }
 
             except Exception as exc:
                 print(f"[ERROR] Task {task_id} failed: {exc}")
@@ -125,11 +267,18 @@ async def _process_task_async(self, task_id: str):
                 db_task.status = TaskStatus.FAILED
                 db_task.error = str(exc)
                 await db.commit()
+                await refresh_work_status(db, work_id)
                 raise self.retry(exc=exc)
             
             finally:
-                await release_token(redis_client)
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+                await semaphore.release(task_id)
+                await runtime.publish_pool_stats()
             
+    except Retry:
+        raise
+
     except Exception as exc:
         # Error al conectar a la DB o error general fuera del bloque interno
         print(f"[CRITICAL ERROR] Failed to process task {task_id}: {exc}")
@@ -142,14 +291,60 @@ async def _process_task_async(self, task_id: str):
                     task_err.status = TaskStatus.FAILED
                     task_err.error = f"Error crítico: {str(exc)}"
                     await db_err.commit()
+                    await refresh_work_status(db_err, str(task_err.work_id))
         except Exception as commit_error:
             print(f"[ERROR] Could not update task status: {commit_error}")
         
         raise
-    
-    finally:
-        # Importante: cerrar el engine local y el cliente Redis
-        await engine.dispose()
-        await redis_client.aclose()
 
 
+# ==============================
+# Callback del chord (fan-out por shards)
+# ==============================
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def merge_work_results(self, results: list, work_id: str, output: Optional[dict] = None):
+    """
+    Une las salidas de todos los shards de un Work en un único archivo
+    combinado, con el formato de salida elegido al subir (`output`).
+
+    Se ejecuta como callback del chord cuando todas las tareas del Work han
+    terminado; `results` son los resultados de cada process_task.
+    """
+    return get_runtime().run(_merge_work_results_async(self, results, work_id, output))
+
+
+async def _merge_work_results_async(
+    self, results: list, work_id: str, output: Optional[dict] = None
+):
+    async with get_runtime().session_maker() as db:
+        work_repo = WorkRepository(db)
+        work = await work_repo.get(work_id)
+        if not work:
+            print(f"[ERROR] Work {work_id} not found in database")
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+            output_path = await loop.run_in_executor(
+                None, merge_work_outputs, work.storage_path, work_id, output
+            )
+        except Exception as exc:
+            print(f"[ERROR] Merge of work {work_id} failed: {exc}")
+            work.mark_failed(f"Error al combinar shards: {exc}")
+            await work_repo.update(work)
+            await db.commit()
+            await publish_work_status(db, work_id)
+            raise self.retry(exc=exc)
+
+        await refresh_work_status(db, work_id, output_path=output_path)
+
+    totals = {"cache_hits": 0, "cache_misses": 0, "downloaded": 0, "coalesced": 0, "failed": []}
+    for result in results or []:
+        if not result:
+            continue
+        for key in ("cache_hits", "cache_misses", "downloaded", "coalesced"):
+            totals[key] += result.get(key, 0)
+        totals["failed"].extend(result.get("failed", []))
+
+    print(f"[SUCCESS] Work {work_id} merged from {len(results or [])} shards")
+    return {"work_id": work_id, "result_path": output_path, **totals}
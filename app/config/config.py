@@ -5,3 +5,6 @@ TEMPLATES = Jinja2Templates(directory="app/templates")
 
 UPLOAD_DIR = Path("app/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+# Tamaño de bloque al copiar las subidas a disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
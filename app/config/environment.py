@@ -1,5 +1,6 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, ValidationError, PositiveInt
+from pydantic import Field, ValidationError, PositiveInt, PositiveFloat, NonNegativeInt, NonNegativeFloat
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +15,55 @@ class Settings(BaseSettings):
     DATABASE_HOST: str = Field(..., env="DATABASE_HOST")  # type: ignore
     DATABASE_PORT: PositiveInt = Field(..., env="DATABASE_PORT")  # type: ignore
 
+    # Scraper Settings
+    SIGNAL_BASE_URL: str = Field("https://signal.mutationalsignatures.com/", env="SIGNAL_BASE_URL")  # type: ignore
+    SCRAPER_FETCH_MODE: Literal["browser", "http"] = Field("browser", env="SCRAPER_FETCH_MODE")  # type: ignore
+    SCRAPER_HTTP_CONCURRENCY: PositiveInt = Field(4, env="SCRAPER_HTTP_CONCURRENCY")  # type: ignore
+    BROWSER_MAX_PAGES: NonNegativeInt = Field(0, env="BROWSER_MAX_PAGES")  # type: ignore
+    BROWSER_MAX_RSS_MB: NonNegativeInt = Field(1536, env="BROWSER_MAX_RSS_MB")  # type: ignore
+    BROWSER_MEMORY_SAMPLE_SECONDS: PositiveFloat = Field(5.0, env="BROWSER_MEMORY_SAMPLE_SECONDS")  # type: ignore
+    SCRAPER_BLOCK_RESOURCES: bool = Field(True, env="SCRAPER_BLOCK_RESOURCES")  # type: ignore
+    SCRAPER_ALLOWED_RESOURCE_TYPES: str = Field("document,script,xhr,fetch,other", env="SCRAPER_ALLOWED_RESOURCE_TYPES")  # type: ignore
+    SCRAPER_ALLOWED_DOMAINS: str = Field("", env="SCRAPER_ALLOWED_DOMAINS")  # type: ignore
+    SCRAPER_BLOCKED_DOMAINS: str = Field(
+        "google-analytics.com,googletagmanager.com,doubleclick.net,hotjar.com,"
+        "segment.io,mixpanel.com,facebook.net,clarity.ms",
+        env="SCRAPER_BLOCKED_DOMAINS",
+    )  # type: ignore
+    SCRAPER_CONCURRENCY: PositiveInt = Field(1, env="SCRAPER_CONCURRENCY")  # type: ignore
+    SCRAPER_RATE_LIMIT: PositiveFloat = Field(0.5, env="SCRAPER_RATE_LIMIT")  # type: ignore
+    SCRAPER_RATE_BURST: PositiveInt = Field(1, env="SCRAPER_RATE_BURST")  # type: ignore
+    SCRAPER_SLOW_SECONDS: PositiveFloat = Field(20.0, env="SCRAPER_SLOW_SECONDS")  # type: ignore
+    SCRAPER_MAX_BACKOFF: PositiveFloat = Field(8.0, env="SCRAPER_MAX_BACKOFF")  # type: ignore
+
+    # Processing semaphore Settings
+    TOKEN_LEASE_SECONDS: PositiveInt = Field(120, env="TOKEN_LEASE_SECONDS")  # type: ignore
+    TOKEN_WAIT_TIMEOUT: PositiveInt = Field(3600, env="TOKEN_WAIT_TIMEOUT")  # type: ignore
+
+    # Worker capacity Settings
+    WORKER_JOB_MEMORY_MB: PositiveInt = Field(2048, env="WORKER_JOB_MEMORY_MB")  # type: ignore
+    WORKER_HEARTBEAT_SECONDS: PositiveFloat = Field(15.0, env="WORKER_HEARTBEAT_SECONDS")  # type: ignore
+
+    # Checkpoint Settings (progreso por donante en task_item)
+    ITEM_MAX_ATTEMPTS: PositiveInt = Field(3, env="ITEM_MAX_ATTEMPTS")  # type: ignore
+    CHECKPOINT_BATCH_SIZE: PositiveInt = Field(50, env="CHECKPOINT_BATCH_SIZE")  # type: ignore
+
+    # Status cache Settings (estados intermedios; los finales duran un día)
+    STATUS_CACHE_TTL_SECONDS: PositiveInt = Field(10, env="STATUS_CACHE_TTL_SECONDS")  # type: ignore
+
+    # Fan-out Settings (0 = una única tarea por Work)
+    SHARD_SIZE: NonNegativeInt = Field(0, env="SHARD_SIZE")  # type: ignore
+
+    # Upload dedupe Settings (reutilizar Works con el mismo mapping)
+    DEDUPE_UPLOADS: bool = Field(True, env="DEDUPE_UPLOADS")  # type: ignore
+
+    # Single-flight Settings (lease por donante en descarga, renovado en segundo plano)
+    DONOR_LEASE_SECONDS: PositiveInt = Field(120, env="DONOR_LEASE_SECONDS")  # type: ignore
+
+    # Donor cache Settings (0 = sin caducidad / sin límite)
+    CACHE_TTL_DAYS: NonNegativeFloat = Field(0, env="CACHE_TTL_DAYS")  # type: ignore
+    CACHE_MAX_MB: NonNegativeInt = Field(0, env="CACHE_MAX_MB")  # type: ignore
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -1,11 +1,14 @@
 from fastapi import Depends
+from redis import asyncio as aioredis
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.database.db import get_async_session
+from app.database.redis import get_redis
 from app.repositories.repositories import IWorkRepository, ITaskRepository
 from app.repositories.task import TaskRepository
 from app.repositories.work import WorkRepository
 from app.service.upload_csv import UploadCSVUseCase
+from app.service.work_status import WorkStatusUseCase
 
 
 async def get_task_repository(
@@ -26,3 +29,11 @@ async def get_upload_csv_use_case(
     task_repo: ITaskRepository = Depends(get_task_repository),
 ) -> UploadCSVUseCase:
     return UploadCSVUseCase(session, work_repo, task_repo)
+
+
+async def get_work_status_use_case(
+    task_repo: ITaskRepository = Depends(get_task_repository),
+    work_repo: IWorkRepository = Depends(get_work_repository),
+    redis_client: aioredis.Redis = Depends(get_redis),
+) -> WorkStatusUseCase:
+    return WorkStatusUseCase(task_repo, work_repo, redis_client)
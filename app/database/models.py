@@ -3,7 +3,7 @@ from typing import Optional, List, TYPE_CHECKING
 from uuid import UUID, uuid4
 from datetime import datetime
 
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, JSON, UniqueConstraint
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -27,6 +27,12 @@ class TaskStatus(str, Enum):
     FAILED = "failed"
 
 
+class TaskItemStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class Work(SQLModel, table=True):
 
     id: UUID = Field(default_factory=uuid4, primary_key=True)
@@ -38,6 +44,8 @@ class Work(SQLModel, table=True):
     max_tasks: Optional[int] = None
     output_path: Optional[str] = None
     error: Optional[str] = None
+    # SHA-256 del mapping subido; permite reutilizar Works idénticos
+    content_hash: Optional[str] = Field(default=None, index=True)
 
     tasks: List["Task"] = Relationship(back_populates="work")
 
@@ -56,3 +64,20 @@ class Task(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=datetime.now)
 
     work: Optional[Work] = Relationship(back_populates="tasks")
+
+
+class TaskItem(SQLModel, table=True):
+    """Checkpoint de un donante dentro de una tarea (permite reanudarla)."""
+
+    __tablename__ = "task_item"
+    __table_args__ = (UniqueConstraint("task_id", "donor_id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    task_id: UUID = Field(foreign_key="task.id", index=True)
+    work_id: UUID = Field(foreign_key="work.id", index=True)
+    donor_id: str
+    status: TaskItemStatus = Field(default=TaskItemStatus.PENDING)
+    attempts: int = Field(default=0)
+    source: Optional[str] = None  # cache / http / browser
+    error: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.now)
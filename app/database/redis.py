@@ -0,0 +1,10 @@
+from typing import AsyncGenerator
+from redis import asyncio as aioredis
+from app.celery.celery_app import broker_url
+
+# cliente compartido por la API (mantiene su propio pool de conexiones)
+redis_client: aioredis.Redis = aioredis.from_url(broker_url, decode_responses=True)
+
+
+async def get_redis() -> AsyncGenerator[aioredis.Redis, None]:
+    yield redis_client
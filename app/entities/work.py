@@ -18,6 +18,7 @@ class Work:
         filename: str,
         storage_path: str,
         max_tasks: Optional[int] = None,
+        content_hash: Optional[str] = None,
     ):
         self.id = str(uuid4())
         self.filename = filename
@@ -26,6 +27,7 @@ class Work:
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.max_tasks = max_tasks
+        self.content_hash = content_hash
         self.output_path: Optional[str] = None
         self.error: Optional[str] = None
         self.tasks: List[Task] = []
@@ -57,13 +59,27 @@ class Work:
         self.error = error
         self.updated_at = datetime.now()
 
+    def refresh_status(self):
+        """
+        Recalcula el estado a partir de las tareas.
+
+        Un Work cuyas tareas terminaron pero que aún no tiene archivo de
+        salida (shards pendientes de combinar) sigue en progreso.
+        """
+        self._update_status()
+        if self.status == WorkStatus.COMPLETED and not self.output_path:
+            self.status = WorkStatus.IN_PROGRESS
+        self.updated_at = datetime.now()
+
     def _update_status(self):
         """Actualiza el estado global según las tareas."""
-        if all(t.status == TaskStatus.COMPLETED for t in self.tasks):
+        if self.tasks and all(t.status == TaskStatus.COMPLETED for t in self.tasks):
             self.status = WorkStatus.COMPLETED
         elif any(t.status == TaskStatus.RUNNING for t in self.tasks):
             self.status = WorkStatus.IN_PROGRESS
         elif any(t.status == TaskStatus.FAILED for t in self.tasks):
             self.status = WorkStatus.FAILED
+        elif any(t.status == TaskStatus.COMPLETED for t in self.tasks):
+            self.status = WorkStatus.IN_PROGRESS
         else:
             self.status = WorkStatus.PENDING
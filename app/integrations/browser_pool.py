@@ -0,0 +1,303 @@
+"""
+Pool de contextos de Chromium precalentados.
+
+Un navegador por proceso mantiene ``size`` contextos ya situados en la
+página de inicio del sitio. Las descargas toman un contexto en préstamo
+(``lease``), lo usan y lo devuelven; el arranque en frío (lanzar Chromium,
+abrir la home y esperar a que cargue) se paga una vez por proceso y no en
+cada tarea.
+
+Antes de prestarse, cada contexto pasa un health check. El reciclado lo
+decide la memoria medida (MemoryWatchdog): si el RSS de Chromium supera el
+umbral se recicla el contexto, y si eso no basta, el navegador entero. El
+navegador nuevo se lanza en el acto y el antiguo se cierra cuando sus
+últimos contextos prestados vuelven al pool. Opcionalmente se puede fijar
+también un máximo de descargas por contexto. Si el navegador se cae, se
+relanza al siguiente préstamo.
+"""
+import asyncio
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from playwright.async_api import async_playwright
+
+from app.integrations.memory_watchdog import MemoryWatchdog
+from app.integrations.resource_policy import ResourcePolicy
+
+# Umbral de RSS de Chromium por defecto (3/4 de la memoria reservada por job)
+DEFAULT_MAX_RSS_MB = 1536
+
+# Margen para que terminen los procesos renderer antes de medir lo recuperado
+RECLAIM_SETTLE_SECONDS = 0.5
+
+
+class PooledPage:
+    """Contexto del pool con su página y el número de descargas hechas en él."""
+
+    def __init__(self, context, page, generation: int):
+        self.context = context
+        self.page = page
+        self.generation = generation
+        self.pages_used = 0
+        self.created_at = time.monotonic()
+        self.closed = False
+
+
+class BrowserPool:
+    """
+    Contextos de Chromium precalentados y prestados a las tareas.
+
+    - size: contextos simultáneos (descargas en paralelo)
+    - base_url: página de inicio en la que se dejan los contextos
+    - policy: bloqueo de recursos aplicado a cada contexto
+    - max_pages: descargas por contexto antes de reciclarlo (0 = sin límite)
+    - max_rss_mb: umbral de RSS de Chromium que fuerza el reciclado
+      (0 = sin umbral)
+    - sample_seconds: periodo de muestreo de la memoria
+    """
+
+    def __init__(
+        self,
+        size: int,
+        base_url: str,
+        policy: Optional[ResourcePolicy] = None,
+        max_pages: int = 0,
+        max_rss_mb: int = DEFAULT_MAX_RSS_MB,
+        sample_seconds: float = 5.0,
+    ):
+        self.size = max(1, size)
+        self.base_url = base_url
+        self.policy = policy
+        self.max_pages = max_pages
+        self.watchdog = MemoryWatchdog(max_rss_mb, sample_seconds)
+        self._playwright = None
+        self._browsers: dict = {}  # generación -> navegador
+        self._live: Counter = Counter()  # generación -> contextos abiertos
+        self._generation = 0
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._starting: Optional[asyncio.Future] = None
+        self._started = False
+        self.launches = 0
+        self.recycles = {"pages": 0, "context_memory": 0, "browser_memory": 0, "unhealthy": 0}
+        self.leases = 0
+
+    # ------------------------------
+    # Ciclo de vida
+    # ------------------------------
+    async def start(self):
+        """
+        Lanza Chromium y precalienta los contextos (idempotente).
+
+        Los préstamos concurrentes esperan un único arranque compartido: si
+        falla, todos reciben el mismo error y el siguiente préstamo lo
+        reintenta. Cancelar a quien espera no cancela el arranque.
+        """
+        if self._started:
+            return
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+            # Nadie puede quedar esperando (todos cancelados): error ya recogido
+            self._starting.add_done_callback(lambda t: t.cancelled() or t.exception())
+        await asyncio.shield(self._starting)
+
+    async def _start(self):
+        # Arrancar Playwright crea la tarea de su conexión: si se cancela a
+        # medias, se termina de arrancar y se para, o esa tarea queda viva y
+        # el loop no termina nunca
+        starting = asyncio.ensure_future(async_playwright().start())
+        try:
+            self._playwright = await asyncio.shield(starting)
+        except asyncio.CancelledError:
+            self._starting = None
+            playwright = await starting
+            await playwright.stop()
+            raise
+        except BaseException:
+            self._starting = None
+            raise
+        pages: list = []
+        try:
+            await self._launch()
+            pages = [asyncio.ensure_future(self._new_page()) for _ in range(self.size)]
+            entries = await asyncio.gather(*pages)
+        except BaseException:
+            self._starting = None
+            await self._abort_start(pages)
+            raise
+        for entry in entries:
+            self._idle.put_nowait(entry)
+        self._started = True
+        self._starting = None
+        self.watchdog.start()
+        print(f"[BROWSER POOL] {self.size} contextos precalentados en {self.base_url}")
+
+    async def _abort_start(self, pages: list):
+        """Deshace un arranque fallido: contextos a medias, navegadores y Playwright."""
+        for page in pages:
+            page.cancel()
+        await asyncio.gather(*pages, return_exceptions=True)
+        for browser in self._browsers.values():
+            try:
+                await browser.close()
+            except Exception:
+                pass  # el navegador puede haberse caído ya
+        self._browsers.clear()
+        self._live.clear()
+        await self._playwright.stop()
+        self._playwright = None
+
+    @property
+    def _browser(self):
+        return self._browsers.get(self._generation)
+
+    async def _launch(self):
+        """Lanza un navegador nuevo; los contextos del anterior quedan obsoletos."""
+        browser = await self._playwright.chromium.launch(headless=True)
+        self._generation += 1
+        self._browsers[self._generation] = browser
+        self.launches += 1
+
+    async def _new_page(self) -> PooledPage:
+        """Contexto nuevo situado en la home, listo para el buscador."""
+        # Import diferido: el scraper importa este módulo
+        from app.integrations.test import _open_page
+
+        generation = self._generation
+        context, page = await _open_page(self._browsers[generation], self.base_url, self.policy)
+        self._live[generation] += 1
+        return PooledPage(context, page, generation)
+
+    async def close(self):
+        if not self._started:
+            return
+        self.watchdog.stop()
+        while not self._idle.empty():
+            entry = self._idle.get_nowait()
+            if entry is not None:
+                await self._close_entry(entry)
+        try:
+            for browser in self._browsers.values():
+                await browser.close()
+        finally:
+            self._browsers.clear()
+            await self._playwright.stop()
+            self._started = False
+
+    # ------------------------------
+    # Préstamo
+    # ------------------------------
+    async def _healthy(self, entry: PooledPage) -> bool:
+        if entry.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(entry.page.evaluate("1"), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def _close_entry(self, entry: PooledPage):
+        if entry.closed:
+            return
+        entry.closed = True
+        try:
+            await entry.context.close()
+        except Exception:
+            pass  # el navegador puede haberse caído ya
+        generation = entry.generation
+        self._live[generation] -= 1
+        # Navegador retirado sin contextos: se cierra
+        if generation != self._generation and self._live[generation] <= 0:
+            browser = self._browsers.pop(generation, None)
+            del self._live[generation]
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+
+    async def _replace(self, entry: PooledPage, reason: Optional[str] = None) -> PooledPage:
+        if reason:
+            self.recycles[reason] += 1
+        await self._close_entry(entry)
+        return await self._fresh_page()
+
+    async def _fresh_page(self) -> PooledPage:
+        """Contexto nuevo en el navegador actual (relanzándolo si se cayó)."""
+        if self._browser is None or not self._browser.is_connected():
+            print("[BROWSER POOL] Navegador caído, relanzando Chromium")
+            await self._launch()
+        return await self._new_page()
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Presta un contexto sano del pool y lo devuelve al salir.
+
+        Si el contexto se cerró y no se pudo reponer (fallo al relanzar o al
+        abrir la home), vuelve al pool un hueco vacío (None) en su lugar: el
+        pool conserva su tamaño y el siguiente préstamo abre un contexto nuevo.
+        """
+        await self.start()
+        entry = await self._idle.get()
+        try:
+            if entry is None:
+                entry = await self._fresh_page()
+            elif entry.generation != self._generation:
+                entry = await self._replace(entry)
+            elif not await self._healthy(entry):
+                entry = await self._replace(entry, "unhealthy")
+            self.leases += 1
+            yield entry
+        finally:
+            self._idle.put_nowait(entry if entry is not None and not entry.closed else None)
+
+    async def _recycle_in_place(self, entry: PooledPage, reason: Optional[str]):
+        fresh = await self._replace(entry, reason)
+        entry.context, entry.page = fresh.context, fresh.page
+        entry.generation, entry.pages_used = fresh.generation, 0
+        entry.created_at, entry.closed = fresh.created_at, False
+
+    async def after_download(self, entry: PooledPage):
+        """
+        Cuenta un intento de descarga del contexto y lo recicla en el sitio
+        si la memoria de Chromium supera el umbral (contexto o, si no basta,
+        navegador), si superó el máximo de páginas o si su navegador fue
+        retirado.
+        """
+        entry.pages_used += 1
+        if entry.generation != self._generation:
+            await self._recycle_in_place(entry, None)
+            return
+
+        scope = self.watchdog.should_recycle()
+        if scope is not None:
+            before = self.watchdog.last_mb
+            if scope == "browser":
+                await self._launch()
+                await self._recycle_in_place(entry, "browser_memory")
+            else:
+                await self._recycle_in_place(entry, "context_memory")
+            await asyncio.sleep(RECLAIM_SETTLE_SECONDS)
+            self.watchdog.record_recycle(scope, before, self.watchdog.sample())
+        elif self.max_pages and entry.pages_used >= self.max_pages:
+            print("♻️ Recycling browser context (page limit)...")
+            await self._recycle_in_place(entry, "pages")
+
+    def background_tasks(self) -> set:
+        """Tareas residentes del pool, que sobreviven a cada préstamo."""
+        return {self.watchdog.task} if self.watchdog.task is not None else set()
+
+    def stats(self) -> dict:
+        if self._started:
+            self.watchdog.sample()
+        return {
+            "size": self.size,
+            "started": self._started,
+            "idle": self._idle.qsize(),
+            "leases": self.leases,
+            "launches": self.launches,
+            "recycles": dict(self.recycles),
+            "memory": self.watchdog.stats(),
+        }
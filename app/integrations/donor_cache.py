@@ -0,0 +1,280 @@
+"""
+Índice de la caché de donantes.
+
+Los CSV siguen guardándose como CACHE_DIR/{safe_id}.csv, pero cada entrada se
+registra en un índice SQLite junto al directorio con su checksum (sha256),
+tamaño, mtime, número de filas y marcas de tiempo de descarga y último
+acceso. Con eso se puede:
+
+- separar en una sola consulta los IDs cacheados de los que faltan,
+- detectar archivos modificados o dañados (tamaño o mtime distintos del
+  índice) y comprobar su checksum antes de darlos por buenos,
+- revalidar entradas antiguas (TTL) o incompletas,
+- acotar el tamaño del directorio expulsando las menos usadas (LRU).
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, Optional
+
+from app.utils.destructure_file import SIGNATURE_ROWS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS donor_cache (
+    donor_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_donor_cache_last_access ON donor_cache (last_access);
+"""
+
+
+def safe_donor_id(donor_id: str) -> str:
+    """Nombre de archivo seguro para un Donor ID."""
+    return donor_id.replace("/", "_").replace("\\", "_")
+
+
+def file_checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_data_rows(path: Path) -> int:
+    """Cuenta las filas de datos (sin cabecera ni líneas vacías)."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        next(f, None)
+        return sum(1 for line in f if line.strip())
+
+
+class DonorCache:
+    """
+    Caché de CSV de donantes con índice SQLite.
+
+    - ttl_seconds: antigüedad máxima de una entrada antes de revalidarla
+      (None o 0 = sin caducidad)
+    - max_bytes: tamaño máximo del directorio antes de expulsar por LRU
+      (None o 0 = sin límite). Con límite, los jobs copian los CSV a su
+      carpeta en lugar de enlazarlos (``evicts``): expulsar una entrada
+      nunca deja enlaces rotos en otro job en curso
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        index_path: Optional[Path] = None,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = Path(index_path or self.cache_dir / "index.sqlite3")
+        self.ttl_seconds = ttl_seconds or None
+        self.max_bytes = max_bytes or None
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(donor_cache)")}
+            if "mtime_ns" not in columns:
+                # Índice anterior: sus entradas se verifican en el primer acceso
+                conn.execute("ALTER TABLE donor_cache ADD COLUMN mtime_ns INTEGER")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexiones cortas: el índice se comparte entre procesos y threads.
+        # Se usan como closing(...) + transacción: "with conn" solo hace
+        # commit/rollback, no cierra
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    @property
+    def evicts(self) -> bool:
+        """
+        Hay límite de tamaño: las entradas pueden desaparecer mientras otros
+        jobs las usan, así que deben copiarse al job en lugar de enlazarse.
+        """
+        return self.max_bytes is not None
+
+    def path_for(self, donor_id: str) -> Path:
+        return self.cache_dir / f"{safe_donor_id(donor_id)}.csv"
+
+    def _is_fresh(self, rows: int, fetched_at: float, now: float) -> bool:
+        if rows != SIGNATURE_ROWS:
+            return False
+        return self.ttl_seconds is None or now - fetched_at <= self.ttl_seconds
+
+    # ------------------------------
+    # Consultas
+    # ------------------------------
+    def lookup_many(self, ids: Iterable[str]) -> tuple[list[str], list[str]]:
+        """
+        Separa los IDs en (aciertos, fallos) con una única consulta al índice.
+
+        Los CSV presentes en disco pero aún sin indexar (caché heredada) se
+        registran al vuelo. Entradas caducadas o incompletas cuentan como fallo,
+        igual que las que ya no tienen archivo o cuyo archivo no coincide con
+        el checksum indexado (solo se calcula si cambió su tamaño o mtime).
+        """
+        ids = list(dict.fromkeys(ids))
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT donor_id, rows, fetched_at, size, mtime_ns FROM donor_cache "
+                "WHERE donor_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(ids),),
+            ).fetchall()
+        indexed = {donor_id: entry for donor_id, *entry in rows}
+
+        now = time.time()
+        hits, misses = [], []
+        for donor_id in ids:
+            path = self.path_for(donor_id)
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                stat = None
+            entry = indexed.get(donor_id)
+            if stat is None:
+                entry = None
+            elif entry is None:
+                entry = self._index_file(donor_id, fetched_at=stat.st_mtime)
+            elif (entry[2], entry[3]) != (stat.st_size, stat.st_mtime_ns):
+                entry = self._revalidate(donor_id, entry, stat)
+            if entry is not None and self._is_fresh(entry[0], entry[1], now):
+                hits.append(donor_id)
+            else:
+                misses.append(donor_id)
+
+        self.touch(hits)
+        return hits, misses
+
+    def _revalidate(self, donor_id: str, entry: tuple, stat) -> Optional[tuple]:
+        """
+        Entrada cuyo archivo cambió de tamaño o mtime: si el checksum sigue
+        coincidiendo (p. ej. solo se tocó el mtime) se actualiza el índice;
+        si no, se borra y cuenta como fallo.
+        """
+        if not self.verify(donor_id):
+            print(f"⚠️ CSV en caché modificado o dañado para {donor_id}: se descarga de nuevo")
+            self.path_for(donor_id).unlink(missing_ok=True)
+            self.invalidate(donor_id)
+            return None
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE donor_cache SET size = ?, mtime_ns = ? WHERE donor_id = ?",
+                (stat.st_size, stat.st_mtime_ns, donor_id),
+            )
+        return entry
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as conn, conn:
+            n, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM donor_cache"
+            ).fetchone()
+        return {"entries": n, "bytes": total, "max_bytes": self.max_bytes}
+
+    # ------------------------------
+    # Escrituras
+    # ------------------------------
+    def _index_file(self, donor_id: str, fetched_at: Optional[float] = None):
+        path = self.path_for(donor_id)
+        now = time.time()
+        fetched_at = fetched_at or now
+        stat = path.stat()
+        n_rows = count_data_rows(path)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO donor_cache "
+                "(donor_id, filename, checksum, size, rows, fetched_at, last_access, mtime_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    donor_id,
+                    path.name,
+                    file_checksum(path),
+                    stat.st_size,
+                    n_rows,
+                    fetched_at,
+                    now,
+                    stat.st_mtime_ns,
+                ),
+            )
+        return n_rows, fetched_at, stat.st_size, stat.st_mtime_ns
+
+    def record(self, donor_id: str) -> bool:
+        """
+        Registra un CSV recién descargado.
+
+        Returns:
+            True si el archivo está completo (96 contextos)
+        """
+        n_rows = self._index_file(donor_id)[0]
+        if n_rows != SIGNATURE_ROWS:
+            print(f"⚠️ CSV incompleto para {donor_id}: {n_rows} filas")
+        return n_rows == SIGNATURE_ROWS
+
+    def touch(self, ids: Iterable[str]):
+        """Actualiza el último acceso (orden LRU)."""
+        ids = list(ids)
+        if not ids:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE donor_cache SET last_access = ? "
+                "WHERE donor_id IN (SELECT value FROM json_each(?))",
+                (time.time(), json.dumps(ids)),
+            )
+
+    def invalidate(self, donor_id: str):
+        """Elimina una entrada del índice (p. ej. si su archivo desapareció)."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM donor_cache WHERE donor_id = ?", (donor_id,))
+
+    def verify(self, donor_id: str) -> bool:
+        """Comprueba que el archivo en disco coincide con el checksum indexado."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT checksum FROM donor_cache WHERE donor_id = ?", (donor_id,)
+            ).fetchone()
+        path = self.path_for(donor_id)
+        return row is not None and path.exists() and file_checksum(path) == row[0]
+
+    def evict(self, protect: Iterable[str] = ()) -> int:
+        """
+        Expulsa entradas por LRU hasta quedar bajo max_bytes.
+
+        Args:
+            protect: IDs que no deben expulsarse (p. ej. los del job actual)
+
+        Returns:
+            Bytes liberados
+        """
+        if self.max_bytes is None:
+            return 0
+        protect = set(protect)
+        freed = 0
+        with closing(self._connect()) as conn, conn:
+            (total,) = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM donor_cache"
+            ).fetchone()
+            if total <= self.max_bytes:
+                return 0
+            candidates = conn.execute(
+                "SELECT donor_id, filename, size FROM donor_cache ORDER BY last_access"
+            ).fetchall()
+            for donor_id, filename, size in candidates:
+                if total - freed <= self.max_bytes:
+                    break
+                if donor_id in protect:
+                    continue
+                (self.cache_dir / filename).unlink(missing_ok=True)
+                conn.execute("DELETE FROM donor_cache WHERE donor_id = ?", (donor_id,))
+                freed += size
+        print(f"🧹 Caché: expulsados {freed} bytes por LRU")
+        return freed
@@ -0,0 +1,227 @@
+"""
+Descarga directa por HTTP de las firmas de un donante.
+
+El flujo del navegador (buscador, panel de vista previa y botón "Download as
+CSV") termina pidiendo los datos del donante a un endpoint JSON de la propia
+web. Este módulo captura esa petición una sola vez, interceptando las
+respuestas XHR/fetch de Playwright mientras se descarga un donante por la vía
+normal, y la guarda como plantilla (la URL con el ID sustituido por
+``{donor_id}``). A partir de ahí el resto de donantes se piden con un cliente
+httpx con pool de conexiones, sin Chromium.
+
+La plantilla solo se acepta si el JSON capturado contiene exactamente los
+mismos valores que el CSV descargado por el navegador, y se invalida si el
+endpoint deja de responder; cualquier donante que falle por HTTP vuelve al
+flujo del navegador.
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+import httpx
+
+# Contexto trinucleotídico de una sustitución simple, p. ej. A[C>A]T
+CONTEXT_RE = re.compile(r"^[ACGT]\[[ACGT]>[ACGT]\][ACGT]$")
+
+# Cabeceras de la petición capturada que no se reenvían
+_SKIP_HEADERS = {"host", "content-length", "accept-encoding", "connection"}
+
+# Fallos HTTP consecutivos tras los que la plantilla se da por obsoleta
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+def parse_signature_payload(payload) -> Optional[list[tuple[str, float]]]:
+    """
+    Busca en un JSON la lista de contextos -> valor de una firma.
+
+    Acepta las formas habituales de estas APIs: un objeto {contexto: valor}
+    o una lista de objetos con un campo de contexto y uno numérico, a
+    cualquier profundidad.
+
+    Returns:
+        Lista de (contexto, valor) en el orden del JSON, o None si no hay
+        ninguna firma
+    """
+    if isinstance(payload, dict):
+        pairs = [
+            (k, float(v))
+            for k, v in payload.items()
+            if CONTEXT_RE.match(str(k)) and isinstance(v, (int, float))
+        ]
+        if pairs:
+            return pairs
+        children = payload.values()
+    elif isinstance(payload, list):
+        pairs = []
+        for item in payload:
+            if not isinstance(item, dict):
+                break
+            context = next(
+                (v for v in item.values() if isinstance(v, str) and CONTEXT_RE.match(v)),
+                None,
+            )
+            value = next(
+                (v for v in item.values() if isinstance(v, (int, float)) and not isinstance(v, bool)),
+                None,
+            )
+            if context is None or value is None:
+                break
+            pairs.append((context, float(value)))
+        else:
+            if pairs:
+                return pairs
+        children = payload
+    else:
+        return None
+
+    for child in children:
+        found = parse_signature_payload(child)
+        if found:
+            return found
+    return None
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def write_signature_csv(donor_id: str, pairs: list[tuple[str, float]], dest: Path):
+    """Escribe la firma con el mismo formato que el CSV de la web."""
+    # Nombre temporal único: varios jobs pueden escribir el mismo donante
+    tmp = dest.with_name(f".{dest.name}.{uuid4().hex}.tmp")
+    lines = [f'substitution,"{donor_id}_Single-base Substitution"']
+    lines += [f"{context},{_format_value(value)}" for context, value in pairs]
+    tmp.write_text("\n".join(lines), encoding="utf-8")
+    os.replace(tmp, dest)
+
+
+class EndpointTemplate:
+    """Petición JSON capturada, reutilizable para cualquier donante."""
+
+    def __init__(self, url: str, headers: Optional[dict] = None, captured_at: Optional[float] = None):
+        self.url = url
+        self.headers = headers or {}
+        self.captured_at = captured_at or time.time()
+
+    def url_for(self, donor_id: str) -> str:
+        return self.url.replace("{donor_id}", donor_id)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["EndpointTemplate"]:
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+            return cls(data["url"], data.get("headers"), data.get("captured_at"))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path: Path):
+        data = {"url": self.url, "headers": self.headers, "captured_at": self.captured_at}
+        Path(path).write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+class ResponseRecorder:
+    """
+    Registra las respuestas JSON XHR/fetch de una página que mencionan un ID.
+
+    Se engancha con ``page.on("response", recorder.on_response)`` antes de
+    recorrer el flujo del navegador para ``probe_id``.
+    """
+
+    def __init__(self, probe_id: str):
+        self.probe_id = probe_id
+        self.candidates: list[tuple[str, dict, object]] = []
+
+    async def on_response(self, response):
+        request = response.request
+        if request.resource_type not in ("xhr", "fetch") or request.method != "GET":
+            return
+        if self.probe_id not in response.url:
+            return
+        try:
+            payload = await response.json()
+            headers = await request.all_headers()
+        except Exception:
+            return
+        self.candidates.append((response.url, headers, payload))
+
+    def template_for(self, expected: list[tuple[str, float]]) -> Optional[EndpointTemplate]:
+        """
+        Plantilla de la primera respuesta cuya firma coincide con ``expected``
+        (los valores del CSV descargado por el navegador).
+        """
+        expected_map = dict(expected)
+        for url, headers, payload in self.candidates:
+            pairs = parse_signature_payload(payload)
+            if not pairs or dict(pairs) != expected_map:
+                continue
+            kept = {
+                k: v for k, v in headers.items()
+                if not k.startswith(":") and k.lower() not in _SKIP_HEADERS
+            }
+            return EndpointTemplate(url.replace(self.probe_id, "{donor_id}"), kept)
+        return None
+
+
+class HttpDonorFetcher:
+    """
+    Descarga firmas con la plantilla capturada y un cliente httpx compartido.
+
+    - template: endpoint capturado
+    - client: cliente httpx (su pool de conexiones se reutiliza entre donantes)
+    """
+
+    def __init__(self, template: EndpointTemplate, client: httpx.AsyncClient):
+        self.template = template
+        self.client = client
+        self.consecutive_failures = 0
+        # La última petición falló por saturación del sitio (timeout, 429 o
+        # 5xx), no porque el donante no exista o la respuesta no valga
+        self.overloaded = False
+
+    @property
+    def broken(self) -> bool:
+        """La plantilla dejó de funcionar (fallos consecutivos)."""
+        return self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES
+
+    async def fetch(self, donor_id: str, dest: Path) -> bool:
+        """
+        Descarga la firma de ``donor_id`` en ``dest``.
+
+        Returns:
+            True si se obtuvo una firma válida; False si hay que recurrir al
+            navegador para este donante
+        """
+        self.overloaded = False
+        try:
+            response = await self.client.get(
+                self.template.url_for(donor_id), headers=self.template.headers
+            )
+            response.raise_for_status()
+            pairs = parse_signature_payload(response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"⚠️ HTTP fetch failed for {donor_id}: {e}")
+            self.overloaded = isinstance(e, httpx.TimeoutException) or (
+                isinstance(e, httpx.HTTPStatusError)
+                and (e.response.status_code == 429 or e.response.status_code >= 500)
+            )
+            pairs = None
+
+        if not pairs:
+            self.consecutive_failures += 1
+            return False
+
+        self.consecutive_failures = 0
+        write_signature_csv(donor_id, pairs, dest)
+        return True
+
+
+def make_http_client(max_connections: int, timeout: float = 30.0) -> httpx.AsyncClient:
+    """Cliente httpx con un pool dimensionado a la concurrencia del job."""
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True)
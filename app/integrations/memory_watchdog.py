@@ -0,0 +1,128 @@
+"""
+Vigilancia de la memoria de Chromium.
+
+Muestrea periódicamente el RSS del árbol de procesos Chromium que cuelga del
+proceso actual y decide cuándo reciclar: primero el contexto (libera sus
+renderers) y, si tras reciclar la memoria sigue por encima del umbral (fuga
+en el propio navegador), el navegador completo. Cada reciclado registra la
+memoria recuperada, para poder ajustar umbral y densidad de workers.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import psutil
+
+CHROMIUM_NAMES = ("chrome", "chromium", "headless_shell")
+
+MB = 1024 * 1024
+
+
+def is_chromium(proc: psutil.Process) -> bool:
+    try:
+        name = proc.name().lower()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+    return any(n in name for n in CHROMIUM_NAMES)
+
+
+def chromium_rss_mb(root: Optional[psutil.Process] = None) -> int:
+    """RSS total de los procesos Chromium que cuelgan de ``root`` (o del actual)."""
+    root = root or psutil.Process()
+    total = 0
+    for proc in root.children(recursive=True):
+        try:
+            if is_chromium(proc):
+                total += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total // MB
+
+
+class MemoryWatchdog:
+    """
+    Muestreo del RSS de Chromium y decisión de reciclado.
+
+    - threshold_mb: umbral de RSS de Chromium (0 = desactivado)
+    - interval: segundos entre muestras
+    """
+
+    def __init__(self, threshold_mb: int, interval: float = 5.0):
+        self.threshold_mb = threshold_mb
+        self.interval = interval
+        self.last_mb = 0
+        self.peak_mb = 0
+        self.sampled_at = 0.0
+        self.recycles = deque(maxlen=20)
+        self.reclaimed_mb = 0
+        self._escalate = False
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------
+    # Muestreo
+    # ------------------------------
+    def sample(self) -> int:
+        self.last_mb = chromium_rss_mb()
+        self.peak_mb = max(self.peak_mb, self.last_mb)
+        self.sampled_at = time.monotonic()
+        return self.last_mb
+
+    async def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[WARN] Muestreo de memoria de Chromium fallido: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.threshold_mb:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def task(self) -> Optional[asyncio.Task]:
+        """Tarea de muestreo en curso (vive mientras el pool esté arrancado)."""
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ------------------------------
+    # Decisión y registro
+    # ------------------------------
+    def should_recycle(self) -> Optional[str]:
+        """
+        "context", "browser" o None según la última muestra.
+
+        Se escala a "browser" cuando el reciclado anterior de un contexto no
+        bajó la memoria por debajo del umbral.
+        """
+        if not self.threshold_mb or self.last_mb <= self.threshold_mb:
+            self._escalate = False
+            return None
+        return "browser" if self._escalate else "context"
+
+    def record_recycle(self, scope: str, before_mb: int, after_mb: int):
+        reclaimed = max(0, before_mb - after_mb)
+        self.reclaimed_mb += reclaimed
+        self.recycles.append(
+            {"scope": scope, "before_mb": before_mb, "after_mb": after_mb, "reclaimed_mb": reclaimed}
+        )
+        self._escalate = bool(self.threshold_mb) and after_mb > self.threshold_mb
+        self.last_mb = after_mb
+        print(
+            f"♻️ Recycled {scope}: Chromium RSS {before_mb} -> {after_mb} MB "
+            f"({reclaimed} MB reclaimed)"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "threshold_mb": self.threshold_mb,
+            "chromium_rss_mb": self.last_mb,
+            "peak_mb": self.peak_mb,
+            "reclaimed_mb": self.reclaimed_mb,
+            "last_recycles": list(self.recycles),
+        }
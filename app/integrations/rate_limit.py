@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket asíncrono para limitar las peticiones de un event loop.
+
+    - rate: tokens (peticiones) por segundo
+    - burst: máximo de tokens acumulables
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate debe ser mayor que 0")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Espera hasta disponer de un token y lo consume."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def report(self, latency: float, overloaded: bool = False):
+        """Sin backoff adaptativo en el limitador local."""
+        return None
@@ -0,0 +1,103 @@
+"""
+Política de bloqueo de recursos para los contextos de Playwright.
+
+El scraper solo necesita el HTML, el JavaScript de la aplicación y sus
+peticiones de datos; imágenes, fuentes, hojas de estilo, multimedia y
+trackers de terceros solo añaden latencia y ancho de banda por donante. La
+política se instala como route handler del contexto y aborta todo lo que no
+esté en la allowlist de tipos de recurso (y de dominios, si se configura).
+"""
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+DEFAULT_ALLOWED_TYPES = ("document", "script", "xhr", "fetch", "other")
+
+# Analítica y trackers habituales (se bloquean aunque el tipo esté permitido)
+DEFAULT_BLOCKED_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "hotjar.com",
+    "segment.io",
+    "mixpanel.com",
+    "facebook.net",
+    "clarity.ms",
+)
+
+
+def parse_list(value: str) -> tuple[str, ...]:
+    """'a, b,c' -> ('a', 'b', 'c')"""
+    return tuple(item.strip().lower() for item in value.split(",") if item.strip())
+
+
+def _matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == d or host.endswith(f".{d}") for d in domains)
+
+
+class ResourcePolicy:
+    """
+    Route handler con allowlist de tipos de recurso y dominios.
+
+    - allowed_types: tipos de recurso de Playwright que se dejan pasar
+    - allowed_domains: si no está vacío, solo se permiten estos dominios (y
+      sus subdominios)
+    - blocked_domains: dominios bloqueados siempre (analítica)
+    """
+
+    def __init__(
+        self,
+        allowed_types: Iterable[str] = DEFAULT_ALLOWED_TYPES,
+        allowed_domains: Iterable[str] = (),
+        blocked_domains: Iterable[str] = DEFAULT_BLOCKED_DOMAINS,
+    ):
+        self.allowed_types = frozenset(allowed_types)
+        self.allowed_domains = tuple(allowed_domains)
+        self.blocked_domains = tuple(blocked_domains)
+        self.allowed = 0
+        self.blocked = 0
+
+    def allows(self, resource_type: str, url: str) -> bool:
+        if resource_type not in self.allowed_types:
+            return False
+        host = (urlparse(url).hostname or "").lower()
+        if not host:  # data:, blob:
+            return True
+        if _matches(host, self.blocked_domains):
+            return False
+        return not self.allowed_domains or _matches(host, self.allowed_domains)
+
+    async def handle(self, route):
+        request = route.request
+        if self.allows(request.resource_type, request.url):
+            self.allowed += 1
+            await route.continue_()
+        else:
+            self.blocked += 1
+            await route.abort()
+
+    async def install(self, context):
+        """Aplica la política a todas las páginas del contexto."""
+        await context.route("**/*", self.handle)
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "blocked": self.blocked}
+
+
+def policy_from_settings(settings, base_url: Optional[str] = None) -> Optional[ResourcePolicy]:
+    """
+    Política configurada en settings, o None si el bloqueo está desactivado.
+
+    Con SCRAPER_ALLOWED_DOMAINS vacío se permite cualquier dominio salvo los
+    bloqueados; "self" equivale al dominio de ``base_url``.
+    """
+    if not settings.SCRAPER_BLOCK_RESOURCES:
+        return None
+    allowed_domains = [
+        (urlparse(base_url).hostname or "") if d == "self" and base_url else d
+        for d in parse_list(settings.SCRAPER_ALLOWED_DOMAINS)
+    ]
+    return ResourcePolicy(
+        allowed_types=parse_list(settings.SCRAPER_ALLOWED_RESOURCE_TYPES),
+        allowed_domains=[d for d in allowed_domains if d],
+        blocked_domains=parse_list(settings.SCRAPER_BLOCKED_DOMAINS),
+    )
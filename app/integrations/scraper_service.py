@@ -6,10 +6,25 @@ Este módulo encapsula la lógica del scraper para ser usado por tareas de Celer
 import asyncio
 import csv
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterable, Optional
 
-from app.integrations.test import scrape_signal
+from redis import asyncio as aioredis
+
+from app.celery.celery_app import broker_url
+from app.celery.rate_limiter import RedisTokenBucket
+from app.celery.single_flight import DonorFlights
+from app.config.environment import settings
+from app.integrations.browser_pool import BrowserPool
+from app.integrations.donor_cache import DonorCache
+from app.integrations.rate_limit import AsyncTokenBucket
+from app.integrations.resource_policy import policy_from_settings
+from app.integrations.test import CACHE_DIR, WORKS_DIR, scrape_signal
 from app.utils.destructure_file import destructure_csvs
+from app.utils.output_formats import DEFAULT_FORMAT, DEFAULT_LAYOUT
+from app.utils.signature_store import SignatureStore
+
+# Firmas ya parseadas de los donantes de la caché (ver signature_store)
+SIGNATURE_STORE_DIR = CACHE_DIR / "signatures"
 
 
 def load_mapping_from_csv(csv_path: str) -> Dict[str, str]:
@@ -39,45 +54,225 @@ def load_mapping_from_csv(csv_path: str) -> Dict[str, str]:
     return mapping
 
 
-def run_scraper_job(csv_path: str, work_id: str) -> str:
+def get_donor_cache() -> DonorCache:
+    """Caché de donantes configurada según settings."""
+    return DonorCache(
+        CACHE_DIR,
+        ttl_seconds=settings.CACHE_TTL_DAYS * 86400,
+        max_bytes=settings.CACHE_MAX_MB * 1024 * 1024,
+    )
+
+
+def get_signature_store() -> SignatureStore:
+    """Almacén de firmas junto a la caché de donantes."""
+    return SignatureStore(SIGNATURE_STORE_DIR)
+
+
+async def _scrape_with_global_limit(
+    ids: list[str],
+    work_id: str,
+    redis_client: Optional[aioredis.Redis] = None,
+    browser_pool: Optional[BrowserPool] = None,
+    on_item: Optional[Callable] = None,
+    protect: Iterable[str] = (),
+) -> dict:
     """
-    Ejecuta el trabajo completo de scraping: descarga CSVs y los concatena.
-    
-    Esta función es síncrona y puede ser ejecutada por Celery.
-    Internamente ejecuta código asíncrono usando asyncio.run().
-    
+    Ejecuta scrape_signal con el rate limiter global en Redis.
+
+    Si Redis no está disponible se usa un limitador local con la misma tasa,
+    de modo que el job nunca queda sin límite de peticiones; en ese caso
+    tampoco hay coordinación single-flight entre jobs y cada uno descarga
+    sus fallos de caché.
+
+    Si se pasa ``redis_client`` (el pool del worker) se reutiliza y no se
+    cierra.
+    """
+    own_client = redis_client is None
+    if own_client:
+        redis_client = aioredis.from_url(broker_url, decode_responses=True)
+    try:
+        try:
+            await redis_client.ping()
+            rate_limiter = RedisTokenBucket(
+                redis_client,
+                rate=settings.SCRAPER_RATE_LIMIT,
+                burst=settings.SCRAPER_RATE_BURST,
+                slow_seconds=settings.SCRAPER_SLOW_SECONDS,
+                max_penalty=settings.SCRAPER_MAX_BACKOFF,
+            )
+            flights = DonorFlights(redis_client, lease_seconds=settings.DONOR_LEASE_SECONDS)
+        except aioredis.RedisError as e:
+            print(f"[WARN] Redis no disponible para el rate limit global: {e}")
+            rate_limiter = AsyncTokenBucket(
+                rate=settings.SCRAPER_RATE_LIMIT, burst=settings.SCRAPER_RATE_BURST
+            )
+            flights = None
+
+        return await scrape_signal(
+            ids,
+            work_id=work_id,
+            concurrency=settings.SCRAPER_CONCURRENCY,
+            rate_limiter=rate_limiter,
+            cache=get_donor_cache(),
+            fetch_mode=settings.SCRAPER_FETCH_MODE,
+            http_concurrency=settings.SCRAPER_HTTP_CONCURRENCY,
+            base_url=settings.SIGNAL_BASE_URL,
+            resource_policy=policy_from_settings(settings, settings.SIGNAL_BASE_URL),
+            browser_pool=browser_pool,
+            on_item=on_item,
+            protect=protect,
+            flights=flights,
+        )
+    finally:
+        if own_client:
+            await redis_client.aclose()
+
+
+def merge_work_outputs(
+    csv_path: str,
+    work_id: str,
+    output: Optional[dict] = None,
+) -> str:
+    """
+    Concatena los CSVs descargados de un Work en su archivo combinado.
+
     Args:
-        csv_path: Ruta al archivo CSV con los IDs a procesar
-        work_id: ID único del trabajo (usado para organizar archivos)
-        
+        csv_path: CSV subido (de él sale el mapping DO -> SP de las columnas)
+        work_id: ID del trabajo
+        output: formato de salida elegido al subir
+            ({"format": "parquet", "layout": "long"}); por defecto CSV ancho
+
     Returns:
-        Ruta al archivo CSV combinado final
-        
-    Raises:
-        ValueError: Si el CSV está vacío o mal formateado
-        Exception: Si hay errores durante el scraping
+        Ruta al archivo combinado
+    """
+    output = output or {}
+    mapping = load_mapping_from_csv(csv_path)
+    combined_path = destructure_csvs(
+        WORKS_DIR / work_id,
+        mapping,
+        output.get("format", DEFAULT_FORMAT),
+        output.get("layout", DEFAULT_LAYOUT),
+        store=get_signature_store(),
+    )
+
+    if not combined_path:
+        raise Exception("No se pudo generar el archivo combinado")
+
+    print(f"[SCRAPER SERVICE] Resultado final: {combined_path}")
+    return str(combined_path)
+
+
+def build_browser_pool() -> BrowserPool:
+    """Pool de navegador configurado según settings (uno por proceso worker)."""
+    return BrowserPool(
+        size=settings.SCRAPER_CONCURRENCY,
+        base_url=settings.SIGNAL_BASE_URL,
+        policy=policy_from_settings(settings, settings.SIGNAL_BASE_URL),
+        max_pages=settings.BROWSER_MAX_PAGES,
+        max_rss_mb=settings.BROWSER_MAX_RSS_MB,
+        sample_seconds=settings.BROWSER_MEMORY_SAMPLE_SECONDS,
+    )
+
+
+async def run_scraper_job_async(
+    csv_path: str,
+    work_id: str,
+    donor_ids: Optional[list[str]] = None,
+    merge: bool = True,
+    redis_client: Optional[aioredis.Redis] = None,
+    browser_pool: Optional[BrowserPool] = None,
+    on_item: Optional[Callable] = None,
+    protect: Iterable[str] = (),
+    output: Optional[dict] = None,
+) -> dict:
+    """
+    Versión async de run_scraper_job para ejecutarse en un loop existente.
+
+    Los workers de Celery la llaman desde el loop de su runtime pasando su
+    cliente Redis y su pool de navegador precalentado; el merge (CPU) se
+    hace en un thread para no bloquear el loop.
+
+    Al reanudar una tarea, ``donor_ids`` son solo los donantes pendientes
+    (puede ser una lista vacía: entonces solo se hace el merge), ``on_item``
+    recibe el resultado de cada donante para los checkpoints y ``protect``
+    los donantes ya terminados, cuyos archivos no deben expulsarse de la caché.
+    ``output`` es el formato del archivo combinado (ver merge_work_outputs).
     """
     print(f"[SCRAPER SERVICE] Iniciando job {work_id}")
     print(f"[SCRAPER SERVICE] CSV de entrada: {csv_path}")
     
     # 1. Cargar mapping del CSV
     mapping = load_mapping_from_csv(csv_path)
-    ids = list(mapping.keys())  # Lista de Donor IDs
+    ids = donor_ids if donor_ids is not None else list(mapping.keys())
     
-    if not ids:
+    if not mapping:
         raise ValueError(f"No se encontraron IDs en el archivo {csv_path}")
     
     print(f"[SCRAPER SERVICE] Se procesarán {len(ids)} IDs")
     
-    # 2. Ejecutar scraper (código async)
-    work_dir = asyncio.run(scrape_signal(ids, work_id=work_id))
+    # 2. Ejecutar scraper
+    if ids:
+        report = await _scrape_with_global_limit(
+            ids, work_id, redis_client, browser_pool, on_item, protect
+        )
+        work_dir = report.pop("work_dir")
+    else:
+        print("[SCRAPER SERVICE] Nada pendiente: todos los donantes ya estaban hechos")
+        work_dir = WORKS_DIR / work_id
+        report = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "downloaded": 0,
+            "http_fetched": 0,
+            "coalesced": 0,
+            "failed": [],
+        }
     print(f"[SCRAPER SERVICE] Scraping completado: {work_dir}")
+    print(
+        f"[SCRAPER SERVICE] Caché: {report['cache_hits']} aciertos, "
+        f"{report['cache_misses']} fallos"
+    )
+    print(f"[SCRAPER SERVICE] Descargados por HTTP directo: {report['http_fetched']}")
+    print(f"[SCRAPER SERVICE] Descargados por otro job (single-flight): {report['coalesced']}")
+
+    if not merge:
+        return {"result_path": str(work_dir / "downloads"), **report}
     
     # 3. Concatenar CSVs descargados
-    combined_path = destructure_csvs(work_dir, mapping)
+    loop = asyncio.get_running_loop()
+    combined_path = await loop.run_in_executor(
+        None, merge_work_outputs, csv_path, work_id, output
+    )
+    return {"result_path": combined_path, **report}
+
+
+def run_scraper_job(
+    csv_path: str,
+    work_id: str,
+    donor_ids: Optional[list[str]] = None,
+    merge: bool = True,
+) -> dict:
+    """
+    Ejecuta el trabajo completo de scraping: descarga CSVs y los concatena.
     
-    if not combined_path:
-        raise Exception("No se pudo generar el archivo combinado")
+    Esta función es síncrona: ejecuta run_scraper_job_async con asyncio.run(),
+    con un navegador propio para esta llamada.
     
-    print(f"[SCRAPER SERVICE] Resultado final: {combined_path}")
-    return str(combined_path)
+    Args:
+        csv_path: Ruta al archivo CSV con los IDs a procesar
+        work_id: ID único del trabajo (usado para organizar archivos)
+        donor_ids: Subconjunto de IDs a procesar (un shard); por defecto todos
+        merge: Si es False no se genera el archivo combinado (lo hará el callback
+            del chord al terminar todos los shards)
+        
+    Returns:
+        Dict con la ruta del resultado (``result_path``: el archivo combinado, o
+        la carpeta de descargas si ``merge`` es False) y los contadores del
+        scraping (``cache_hits``, ``cache_misses``, ``downloaded``,
+        ``http_fetched``, ``coalesced``, ``failed``)
+        
+    Raises:
+        ValueError: Si el CSV está vacío o mal formateado
+        Exception: Si hay errores durante el scraping
+    """
+    return asyncio.run(run_scraper_job_async(csv_path, work_id, donor_ids, merge))
@@ -0,0 +1,203 @@
+"""
+Réplica local de la web de Signal, para pruebas y benchmarks sin red.
+
+Reproduce los selectores de los que depende el scraper (buscador, panel de
+vista previa, botón "Download as CSV") y sirve los datos del donante desde un
+endpoint JSON igual que la web real, de modo que tanto el flujo del
+navegador como la descarga HTTP directa funcionan sin acceso a la red:
+
+    python -m app.integrations.stub_server --port 8765
+
+y después apuntar SIGNAL_BASE_URL a http://127.0.0.1:8765/.
+
+Los IDs que empiezan por "DO" devuelven una firma determinista; cualquier
+otro ID devuelve 404.
+
+Cada página carga además el tipo de peso que tiene la web real (una imagen
+grande, una hoja de estilos con una fuente web y un script de analítica de
+terceros lento servido desde "localhost" en lugar de "127.0.0.1"), y el
+servidor cuenta las peticiones y los bytes servidos, para que los
+benchmarks de bloqueo de recursos midan tanto latencia como ancho de banda.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+SUBSTITUTIONS = ["C>A", "C>G", "C>T", "T>A", "T>C", "T>G"]
+BASES = "ACGT"
+
+# Mismo orden que el CSV que exporta la web real
+CONTEXTS = [
+    f"{five}[{sub}]{three}"
+    for sub in SUBSTITUTIONS
+    for five in BASES
+    for three in BASES
+]
+
+# Recursos estáticos: ruta -> (content type, tamaño en bytes)
+ASSETS = {
+    "/static/hero.png": ("image/png", 400 * 1024),
+    "/static/font.woff2": ("font/woff2", 150 * 1024),
+}
+SITE_CSS = (
+    "@font-face { font-family: Stub; src: url(/static/font.woff2); }\n"
+    "body { font-family: Stub, sans-serif; }\n"
+)
+
+_ASSET_TAGS = """
+<link rel="stylesheet" href="/static/site.css" />
+<img src="/static/hero.png" alt="" />
+<script async src="http://localhost:{port}/analytics.js"></script>
+"""
+
+_HEADER = """
+<div class="Search__Container-sc-9sy7fy-1 jJwwcd">Search samples</div>
+<input class="text__Input-sc-stub" style="display:none" />
+<div id="preview"></div>
+<script>
+  const box = document.querySelector("div.Search__Container-sc-9sy7fy-1");
+  const input = document.querySelector("input.text__Input-sc-stub");
+  box.addEventListener("click", () => { input.style.display = "block"; });
+  input.addEventListener("input", () => {
+    const id = encodeURIComponent(input.value.trim());
+    document.getElementById("preview").innerHTML = id
+      ? `<a href="/explore/cancerSample/${id}"><div class="PreviewPane__Button-sc-1qbxaw4-5">Go</div></a>`
+      : "";
+  });
+</script>
+"""
+
+_HOME = "<!doctype html><html><head>{assets}</head><body>" + _HEADER + "</body></html>"
+
+_SAMPLE = """<!doctype html><html><head>{assets}</head><body>""" + _HEADER + """
+<div id="sample"></div>
+<script>
+  const sampleId = decodeURIComponent(location.pathname.split("/").pop());
+  fetch(`/api/v1/samples/${encodeURIComponent(sampleId)}/signature`)
+    .then((r) => r.json())
+    .then((data) => {
+      const button = document.createElement("button");
+      button.setAttribute("label", "Download as CSV");
+      button.textContent = "Download as CSV";
+      button.addEventListener("click", () => {
+        const rows = data.sample.signature.mutations
+          .map((m) => `${m.mutationType},${m.count}`);
+        const csv = [`substitution,"${sampleId}_Single-base Substitution"`, ...rows].join("\\n");
+        const link = document.createElement("a");
+        link.href = URL.createObjectURL(new Blob([csv], { type: "text/csv" }));
+        link.download = `${sampleId}.csv`;
+        link.click();
+      });
+      document.getElementById("sample").appendChild(button);
+    });
+</script>
+</body></html>"""
+
+
+def signature_for(donor_id: str) -> list[dict]:
+    """Firma determinista de 96 contextos para un Donor ID."""
+    rng = random.Random(donor_id)
+    return [{"mutationType": c, "count": rng.randint(0, 120)} for c in CONTEXTS]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0  # latencia simulada del servidor (segundos)
+    tracker_delay = 1.0  # el script de analítica mantiene la red ocupada
+    assets = True
+    served: Counter = Counter()  # peticiones / bytes servidos, por tipo
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _page(self, template: str) -> bytes:
+        tags = _ASSET_TAGS.format(port=self.server.server_address[1]) if self.assets else ""
+        return template.replace("{assets}", tags).encode()
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        kind = content_type.split(";")[0]
+        with self._lock:
+            self.served["requests"] += 1
+            self.served["bytes"] += len(body)
+            self.served[f"bytes:{kind}"] += len(body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        path = urlparse(self.path).path
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+
+        if path == "/":
+            return self._send(200, self._page(_HOME), "text/html; charset=utf-8")
+
+        if parts[:2] == ["explore", "cancerSample"] and len(parts) == 3:
+            return self._send(200, self._page(_SAMPLE), "text/html; charset=utf-8")
+
+        if path in ASSETS:
+            content_type, size = ASSETS[path]
+            return self._send(200, bytes(size), content_type)
+
+        if path == "/static/site.css":
+            return self._send(200, SITE_CSS.encode(), "text/css")
+
+        if path == "/analytics.js":
+            time.sleep(self.tracker_delay)
+            return self._send(200, b"window.__stubAnalytics = true;", "text/javascript")
+
+        if parts[:3] == ["api", "v1", "samples"] and parts[4:] == ["signature"]:
+            donor_id = parts[3]
+            if not donor_id.startswith("DO"):
+                return self._send(404, b'{"error": "not found"}', "application/json")
+            body = {"sample": {"id": donor_id, "signature": {"mutations": signature_for(donor_id)}}}
+            return self._send(200, json.dumps(body).encode(), "application/json")
+
+        self._send(404, b"not found", "text/plain")
+
+
+def start_stub_server(
+    port: int = 0, delay: float = 0.0, tracker_delay: float = 1.0, assets: bool = True
+):
+    """
+    Arranca la réplica en un thread en segundo plano.
+
+    Devuelve el par (server, base_url); ``server.shutdown()`` la detiene.
+    Los contadores de tráfico están en ``server.RequestHandlerClass.served``.
+    """
+    handler = type(
+        "ConfiguredStubHandler",
+        (StubHandler,),
+        {"delay": delay, "tracker_delay": tracker_delay, "assets": assets, "served": Counter()},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Réplica local de la web de Signal")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="latencia por petición en segundos")
+    parser.add_argument("--tracker-delay", type=float, default=1.0, help="latencia del script de analítica")
+    parser.add_argument("--no-assets", action="store_true", help="servir páginas sin recursos")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        args.port, args.delay, args.tracker_delay, assets=not args.no_assets
+    )
+    print(f"Réplica de Signal escuchando en {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -2,17 +2,42 @@ import asyncio
 import csv
 import os
 import shutil
+import time
 import uuid
-import random
 from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PWTimeoutError
-from app.utils.destructure_file import destructure_csvs
+from typing import Callable, Iterable, Optional
+from playwright.async_api import TimeoutError as PWTimeoutError
+from urllib.parse import urlparse
+from app.integrations.browser_pool import BrowserPool
+from app.integrations.donor_cache import DonorCache, safe_donor_id
+from app.integrations.http_fetcher import (
+    EndpointTemplate,
+    HttpDonorFetcher,
+    ResponseRecorder,
+    make_http_client,
+)
+from app.integrations.rate_limit import AsyncTokenBucket
+from app.integrations.resource_policy import ResourcePolicy
+from app.utils.destructure_file import destructure_csvs, read_signature_csv
 
 
 BASE_DIR = Path(__file__).resolve().parent
 CACHE_DIR = BASE_DIR / "cache"
 WORKS_DIR = BASE_DIR / "works"
 DEBUG_DIR = BASE_DIR / "debug"
+# JSON endpoint captured from the browser flow (see http_fetcher)
+ENDPOINT_FILE = CACHE_DIR / "endpoint.json"
+
+SIGNAL_URL = "https://signal.mutationalsignatures.com/"
+
+# Selectors of the search / preview / download flow
+SEARCH_SELECTOR = "div.Search__Container-sc-9sy7fy-1.jJwwcd"
+INPUT_SELECTOR = "input[class*='text__Input'], input[class*='Text__Input'], input.bdWgKS"
+GO_BUTTON_SELECTOR = "a[href^='/explore/cancerSample/'] div.PreviewPane__Button-sc-1qbxaw4-5"
+CSV_BUTTON_SELECTOR = "button[label='Download as CSV']"
+
+# ~1 download every 2 s, the average of the old random 1-3 s pause
+DEFAULT_RATE_LIMIT = 0.5
 
 # Create base folders
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -36,110 +61,466 @@ def load_mapping_from_filename(upload_path: Path) -> dict[str, str]:
     return mapping
 
 
-async def scrape_signal(ids, work_id: str):
+def _link_into_work(cached_csv: Path, work_csv: Path, copy: bool = False):
     """
-    Downloads (or reuses) Mutational Signatures CSVs.
+    Links a cached CSV into the job downloads folder.
 
-    - work_id: UUID or string identifier for the job
-    - ids: list of Donor IDs (e.g. ["DO46416", "DO36062"])
+    Idempotent: a retried task finds the links made before the crash for
+    donors that were never checkpointed. A link that already points at the
+    cached file is kept; anything else is replaced atomically.
+
+    With ``copy`` (cache with LRU eviction, see DonorCache.evicts) the file is
+    copied instead, so evicting the entry cannot break this job's merge.
     """
-    work_dir = WORKS_DIR / work_id
-    downloads_dir = work_dir / "downloads"
-    downloads_dir.mkdir(parents=True, exist_ok=True)
+    if copy:
+        tmp_csv = work_csv.with_name(f".{work_csv.name}.{uuid.uuid4().hex}.tmp")
+        shutil.copy2(cached_csv, tmp_csv)
+        os.replace(tmp_csv, work_csv)
+        return
+
+    target = cached_csv.resolve()
+    if os.path.realpath(work_csv) == str(target):
+        return
+    try:
+        os.symlink(target, work_csv)
+    except FileExistsError:
+        tmp_link = work_csv.with_name(f".{work_csv.name}.{uuid.uuid4().hex}.tmp")
+        os.symlink(target, tmp_link)
+        os.replace(tmp_link, work_csv)
+
+
+async def _open_page(
+    browser, base_url: str = SIGNAL_URL, policy: Optional[ResourcePolicy] = None
+):
+    """
+    Opens a fresh context + page positioned on the signal homepage.
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(accept_downloads=True)
-        page = await context.new_page()
+    The page is ready as soon as the search box is rendered; with a policy,
+    blocked assets and trackers are never requested.
+    """
+    context = await browser.new_context(accept_downloads=True)
+    if policy is not None:
+        await policy.install(context)
+    page = await context.new_page()
+    await page.goto(base_url, timeout=60000, wait_until="domcontentloaded")
+    await page.wait_for_selector(SEARCH_SELECTOR, timeout=60000, state="visible")
+    return context, page
+
+
+async def _download_donor(page, id_: str, cached_csv: Path):
+    """Drives the search / preview / download flow for a single donor."""
+    await page.click(SEARCH_SELECTOR)
+    await page.wait_for_selector(INPUT_SELECTOR, timeout=15000, state="visible")
+    input_loc = page.locator(INPUT_SELECTOR)
+    await input_loc.click()
+    await input_loc.fill(id_)
+
+    await page.wait_for_selector(GO_BUTTON_SELECTOR, timeout=15000, state="visible")
+    await page.click(GO_BUTTON_SELECTOR)
+
+    # The button only renders once the sample data has arrived
+    await page.wait_for_selector(CSV_BUTTON_SELECTOR, timeout=20000, state="visible")
+
+    async with page.expect_download() as download_info:
+        await page.click(CSV_BUTTON_SELECTOR)
+    download = await download_info.value
+
+    # Temp file + rename: another job reading the cache never sees a partial CSV
+    tmp_csv = cached_csv.with_name(f".{cached_csv.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        await download.save_as(str(tmp_csv))
+        os.replace(tmp_csv, cached_csv)
+    finally:
+        tmp_csv.unlink(missing_ok=True)
+
+
+async def _save_debug(page, id_: str, safe_id: str):
+    debug_png = DEBUG_DIR / f"debug_{safe_id}.png"
+    debug_html = DEBUG_DIR / f"debug_{safe_id}.html"
+    await page.screenshot(path=str(debug_png), full_page=True)
+    html = await page.content()
+    debug_html.write_text(html, encoding="utf-8")
+    print(f"⚠️ Timeout on {id_}. Debug saved at: {debug_png}")
+
+
+class ScrapeStats:
+    """
+    Job counters plus an optional per-donor callback.
 
-        await page.goto("https://signal.mutationalsignatures.com/", timeout=60000)
-        await page.wait_for_load_state("networkidle")
+    ``on_item(donor_id, ok, source, error)`` is called once per finished
+    donor, with source "cache", "http" or "browser" (e.g. to checkpoint
+    progress); it must not block. Downloaded and failed donors are also
+    reported to ``flights`` so their single-flight leases are released.
+    """
+
+    def __init__(self, on_item: Optional[Callable] = None, flights=None):
+        self.on_item = on_item
+        self.flights = flights
+        self.downloaded = 0
+        self.http_fetched = 0
+        self.failed: list = []
+
+    def done(self, id_: str, source: str):
+        if source != "cache":
+            self.downloaded += 1
+        if source == "http":
+            self.http_fetched += 1
+        if self.flights is not None and source != "cache":
+            self.flights.finish(id_, True)
+        if self.on_item:
+            self.on_item(id_, True, source, None)
+
+    def fail(self, id_: str, error: str):
+        self.failed.append(id_)
+        if self.flights is not None:
+            self.flights.finish(id_, False)
+        if self.on_item:
+            self.on_item(id_, False, "browser", error)
+
+
+def plan_scrape(ids, cache: DonorCache, downloads_dir: Path):
+    """
+    Planning phase: resolves cache hits before any browser is started.
+
+    Hits are linked into ``downloads_dir`` right away; returns the
+    (hits, misses) lists, misses being the IDs that still need a download.
+    """
+    indexed_hits, misses = cache.lookup_many(ids)
+    hits = []
+    for id_ in indexed_hits:
+        cached_csv = cache.path_for(id_)
+        if not cached_csv.exists():
+            cache.invalidate(id_)
+            misses.append(id_)
+            continue
+        _link_into_work(cached_csv, downloads_dir / cached_csv.name, copy=cache.evicts)
+        hits.append(id_)
+    return hits, misses
+
+
+async def _run_workers(coros) -> list:
+    """
+    Runs the workers concurrently like ``asyncio.gather``, but if one of them
+    raises, the others are cancelled and awaited before the error propagates,
+    so nothing keeps pulling from the queue on the worker's shared loop.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _fetch_misses(
+    misses,
+    downloads_dir: Path,
+    concurrency: int,
+    rate_limiter,
+    cache: DonorCache,
+    stats: ScrapeStats,
+    pool: BrowserPool,
+):
+    """Downloads the cache misses through the work queue with pooled browser contexts."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for id_ in misses:
+        queue.put_nowait(id_)
+
+    async def worker(worker_id: int):
+        async with pool.lease() as entry:
+            while True:
+                try:
+                    id_ = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
 
-        downloaded_count = 0  # track only actual downloads
+                safe_id = safe_donor_id(id_)
+                cached_csv = cache.path_for(id_)
+                work_csv = downloads_dir / cached_csv.name
 
-        for idx, id_ in enumerate(ids, start=1):
-            safe_id = id_.replace("/", "_").replace("\\", "_")
-            cached_csv = CACHE_DIR / f"{safe_id}.csv"
-            work_csv = downloads_dir / f"{safe_id}.csv"
+                # --- Download CSV (shared rate limit) ---
+                await rate_limiter.acquire()
+                print(f"⚙️  [{worker_id}] Downloading CSV for {id_} ...")
 
-            # --- Use existing cache if available ---
-            if cached_csv.exists():
-                print(f"Using cached file for {id_}")
+                started = time.monotonic()
                 try:
-                    os.symlink(cached_csv.resolve(), work_csv)
-                except OSError:
-                    shutil.copy2(cached_csv, work_csv)
-                await asyncio.sleep(0.1)
-                continue
-
-            # --- Download CSV if not cached ---
-            print(f"⚙️  Downloading CSV for {id_} ...")
-
-            try:
-                await page.click("div.Search__Container-sc-9sy7fy-1.jJwwcd")
-                input_selector = "input[class*='text__Input'], input[class*='Text__Input'], input.bdWgKS"
-                await page.wait_for_selector(
-                    input_selector, timeout=15000, state="visible"
-                )
-                input_loc = page.locator(input_selector)
-                await input_loc.click()
-                await input_loc.fill(id_)
-
-                go_button_selector = "a[href^='/explore/cancerSample/'] div.PreviewPane__Button-sc-1qbxaw4-5"
-                await page.wait_for_selector(
-                    go_button_selector, timeout=15000, state="visible"
-                )
-                await page.click(go_button_selector)
-                await page.wait_for_load_state("networkidle")
-
-                csv_button_selector = "button[label='Download as CSV']"
-                await page.wait_for_selector(
-                    csv_button_selector, timeout=20000, state="visible"
-                )
-
-                async with page.expect_download() as download_info:
-                    await page.click(csv_button_selector)
-                download = await download_info.value
-
-                await download.save_as(str(cached_csv))
+                    await _download_donor(entry.page, id_, cached_csv)
+                    await rate_limiter.report(time.monotonic() - started)
+                    cache.record(id_)
+                    _link_into_work(cached_csv, work_csv, copy=cache.evicts)
+                    print(f"📥 CSV saved and cached: {cached_csv}")
+                    stats.done(id_, "browser")
+
+                except PWTimeoutError:
+                    await rate_limiter.report(time.monotonic() - started, overloaded=True)
+                    await _save_debug(entry.page, id_, safe_id)
+                    stats.fail(id_, "timeout")
+
+                # --- Recycle the context (or browser) when Chromium memory crosses the threshold ---
+                await pool.after_download(entry)
+
+    n_workers = max(1, min(concurrency, pool.size, len(misses)))
+    await _run_workers(worker(i) for i in range(n_workers))
+
+
+def _load_endpoint(base_url: str) -> Optional[EndpointTemplate]:
+    """Previously captured endpoint, if it belongs to the same site."""
+    template = EndpointTemplate.load(ENDPOINT_FILE)
+    if template and urlparse(template.url).netloc == urlparse(base_url).netloc:
+        return template
+    return None
+
+
+async def _discover_endpoint(
+    probe_id: str,
+    downloads_dir: Path,
+    rate_limiter,
+    cache: DonorCache,
+    stats: ScrapeStats,
+    pool: BrowserPool,
+) -> Optional[EndpointTemplate]:
+    """
+    Downloads ``probe_id`` through the browser while recording the page's
+    XHR/fetch responses, and returns the JSON endpoint whose data matches the
+    downloaded CSV (saved to ENDPOINT_FILE), or None if there is none.
+    """
+    recorder = ResponseRecorder(probe_id)
+    cached_csv = cache.path_for(probe_id)
+
+    async with pool.lease() as entry:
+        page = entry.page
+        page.on("response", recorder.on_response)
+
+        await rate_limiter.acquire()
+        print(f"🔎 Capturing data endpoint while downloading {probe_id} ...")
+        started = time.monotonic()
+        try:
+            await _download_donor(page, probe_id, cached_csv)
+            await rate_limiter.report(time.monotonic() - started)
+        except PWTimeoutError:
+            await rate_limiter.report(time.monotonic() - started, overloaded=True)
+            await _save_debug(page, probe_id, safe_donor_id(probe_id))
+            stats.fail(probe_id, "timeout")
+            return None
+        finally:
+            page.remove_listener("response", recorder.on_response)
+            await pool.after_download(entry)
+
+    cache.record(probe_id)
+    _link_into_work(cached_csv, downloads_dir / cached_csv.name, copy=cache.evicts)
+    stats.done(probe_id, "browser")
+
+    template = recorder.template_for(list(zip(*read_signature_csv(cached_csv))))
+    if template is None:
+        print(f"No JSON endpoint matched the CSV among {len(recorder.candidates)} responses")
+        return None
+    template.save(ENDPOINT_FILE)
+    print(f"📡 Data endpoint captured: {template.url}")
+    return template
+
+
+async def _fetch_misses_http(
+    misses,
+    downloads_dir: Path,
+    concurrency: int,
+    rate_limiter,
+    cache: DonorCache,
+    stats: ScrapeStats,
+    pool: BrowserPool,
+) -> list:
+    """
+    Downloads the cache misses from the captured JSON endpoint with a pooled
+    httpx client (capturing it first if needed).
+
+    Returns the IDs that still need the browser flow.
+    """
+    pending = list(misses)
+    template = _load_endpoint(pool.base_url)
+    if template is None:
+        template = await _discover_endpoint(
+            pending.pop(0), downloads_dir, rate_limiter, cache, stats, pool
+        )
+    if template is None or not pending:
+        return pending
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for id_ in pending:
+        queue.put_nowait(id_)
+    fallback = []
+
+    async with make_http_client(concurrency) as client:
+        fetcher = HttpDonorFetcher(template, client)
+
+        async def worker():
+            while True:
                 try:
-                    os.symlink(cached_csv.resolve(), work_csv)
-                except OSError:
-                    shutil.copy2(cached_csv, work_csv)
-
-                print(f"📥 CSV saved and cached: {cached_csv}")
-
-                downloaded_count += 1  # increment only when actually downloaded
-
-                # --- Random sleep between downloads to avoid rate limiting ---
-                await asyncio.sleep(random.uniform(1, 3))
-
-            except PWTimeoutError:
-                debug_png = DEBUG_DIR / f"debug_{safe_id}.png"
-                debug_html = DEBUG_DIR / f"debug_{safe_id}.html"
-                await page.screenshot(path=str(debug_png), full_page=True)
-                html = await page.content()
-                debug_html.write_text(html, encoding="utf-8")
-                print(f"⚠️ Timeout on {id_}. Debug saved at: {debug_png}")
-                continue
-
-            # --- Restart browser and context every 60 IDs to avoid memory leaks ---
-            if downloaded_count > 0 and downloaded_count % 60 == 0:
-                print("♻️ Restarting browser to free memory...")
-                await context.close()
-                await browser.close()
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(accept_downloads=True)
-                page = await context.new_page()
-                await page.goto(
-                    "https://signal.mutationalsignatures.com/", timeout=60000
-                )
-                await page.wait_for_load_state("networkidle")
-
-        await browser.close()
+                    id_ = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if fetcher.broken:
+                    fallback.append(id_)
+                    continue
+
+                cached_csv = cache.path_for(id_)
+                await rate_limiter.acquire()
+                started = time.monotonic()
+                ok = await fetcher.fetch(id_, cached_csv)
+                await rate_limiter.report(time.monotonic() - started, overloaded=fetcher.overloaded)
+                if ok and cache.record(id_):
+                    _link_into_work(cached_csv, downloads_dir / cached_csv.name, copy=cache.evicts)
+                    stats.done(id_, "http")
+                else:
+                    fallback.append(id_)
+
+        n_workers = max(1, min(concurrency, len(pending)))
+        await _run_workers(worker() for _ in range(n_workers))
+
+    if fetcher.broken:
+        print("⚠️ Captured endpoint keeps failing, discarding it")
+        ENDPOINT_FILE.unlink(missing_ok=True)
+    print(f"HTTP fetch: {stats.http_fetched} donors, {len(fallback)} left for the browser")
+    return fallback
+
+
+async def scrape_signal(
+    ids,
+    work_id: str,
+    concurrency: int = 1,
+    rate_limiter=None,
+    cache: Optional[DonorCache] = None,
+    fetch_mode: str = "browser",
+    http_concurrency: int = 4,
+    base_url: str = SIGNAL_URL,
+    resource_policy: Optional[ResourcePolicy] = None,
+    browser_pool: Optional[BrowserPool] = None,
+    on_item: Optional[Callable] = None,
+    protect: Iterable[str] = (),
+    flights=None,
+) -> dict:
+    """
+    Downloads (or reuses) Mutational Signatures CSVs.
+
+    - work_id: UUID or string identifier for the job
+    - ids: list of Donor IDs (e.g. ["DO46416", "DO36062"])
+    - concurrency: number of browser contexts sharing the work queue
+    - rate_limiter: object with async ``acquire()`` (called before every
+      download) and ``report(latency, overloaded)`` (called after it,
+      overloaded on timeouts, 429 and 5xx); defaults to ~1 request every 2 s
+      for the whole job
+    - cache: indexed donor cache; hits and misses are resolved with a single
+      index query before any download starts
+    - fetch_mode: "browser" drives the website for every donor; "http"
+      fetches donors from the site's JSON endpoint (captured once through
+      the browser) and falls back to the browser per ID on failure
+    - http_concurrency: parallel requests in "http" mode
+    - base_url: site to scrape (e.g. the local stub_server)
+    - resource_policy: route handler that blocks images, fonts, stylesheets
+      and trackers in every browser context (None loads everything)
+    - browser_pool: warm pool of browser contexts to lease from (e.g. the
+      one resident in a Celery worker); without it a pool of
+      ``concurrency`` contexts is created for this call and closed at the end
+    - on_item: per-donor callback ``(donor_id, ok, source, error)``, see
+      ScrapeStats
+    - protect: extra IDs whose cache files must survive eviction (e.g. the
+      donors finished by a previous attempt of a resumed job)
+    - flights: cluster-wide single-flight leases (DonorFlights); misses
+      already being fetched by another job are not downloaded again but
+      taken from the cache once that job finishes them
+
+    Chromium is only launched when there are cache misses that need it.
+
+    Returns a dict with ``work_dir`` and the job counters
+    (``cache_hits``, ``cache_misses``, ``downloaded``, ``http_fetched``,
+    ``coalesced``, ``failed``).
+    """
+    work_dir = WORKS_DIR / work_id
+    downloads_dir = work_dir / "downloads"
+    downloads_dir.mkdir(parents=True, exist_ok=True)
+
+    if rate_limiter is None:
+        rate_limiter = AsyncTokenBucket(rate=DEFAULT_RATE_LIMIT)
+
+    if cache is None:
+        cache = DonorCache(CACHE_DIR)
+
+    hits, misses = plan_scrape(ids, cache, downloads_dir)
+    print(f"Cache: {len(hits)} hits, {len(misses)} misses")
+
+    # The pool only launches Chromium on its first lease
+    pool = browser_pool or BrowserPool(concurrency, base_url, resource_policy)
+    stats = ScrapeStats(on_item, flights)
+    for id_ in hits:
+        stats.done(id_, "cache")
+
+    async def fetch(fetch_ids):
+        browser_misses = fetch_ids
+        if fetch_ids and fetch_mode == "http":
+            browser_misses = await _fetch_misses_http(
+                fetch_ids, downloads_dir, http_concurrency, rate_limiter, cache, stats, pool
+            )
+        if browser_misses:
+            await _fetch_misses(
+                browser_misses, downloads_dir, concurrency, rate_limiter, cache, stats, pool
+            )
+        elif fetch_ids:
+            print("All misses fetched over HTTP, skipping browser launch")
+
+    def take_cached(id_: str):
+        cached_csv = cache.path_for(id_)
+        _link_into_work(cached_csv, downloads_dir / cached_csv.name, copy=cache.evicts)
+        stats.done(id_, "cache")
+
+    def take_ready(id_: str) -> bool:
+        """Donor fetched by another job: link it from the cache if it is there."""
+        if not cache.lookup_many([id_])[0] or not cache.path_for(id_).exists():
+            return False
+        take_cached(id_)
+        return True
+
+    try:
+        owned, waiting = misses, []
+        if flights is not None and misses:
+            owned, waiting = await flights.claim(misses)
+            # Another job may have fetched some of them between the cache
+            # lookup and the claim, releasing its lease: don't fetch them again
+            fetched, owned = cache.lookup_many(owned)
+            owned += [id_ for id_ in fetched if not cache.path_for(id_).exists()]
+            fetched = [id_ for id_ in fetched if cache.path_for(id_).exists()]
+            for id_ in fetched:
+                take_cached(id_)
+                flights.finish(id_, True)
+            flights.coalesced += len(fetched)
+            if waiting:
+                print(f"Single-flight: {len(waiting)} misses already being fetched by other jobs")
+
+        if waiting:
+            _, taken_over = await _run_workers([fetch(owned), flights.wait(waiting, take_ready)])
+            await fetch(taken_over)
+        elif owned:
+            await fetch(owned)
+        else:
+            print("All donors cached, skipping browser launch")
+    finally:
+        if flights is not None:
+            await flights.close()
+        if browser_pool is None:
+            await pool.close()
+
+    cache.evict(protect=set(ids) | set(protect))
+    if pool.policy is not None:
+        print(f"Resource policy: {pool.policy.stats()}")
 
     print(f"Work completed: {work_dir}")
-    return work_dir
+    return {
+        "work_dir": work_dir,
+        "cache_hits": len(hits),
+        "cache_misses": len(misses),
+        "downloaded": stats.downloaded,
+        "http_fetched": stats.http_fetched,
+        "coalesced": flights.coalesced if flights is not None else 0,
+        "failed": stats.failed,
+    }
 
 
 if __name__ == "__main__":
@@ -152,8 +533,8 @@ if __name__ == "__main__":
     ids = list(mapping.keys())  # List of Donor IDs
 
     # Run scraper
-    work_dir = asyncio.run(scrape_signal(ids, work_id=test_work_id))
+    report = asyncio.run(scrape_signal(ids, work_id=test_work_id))
 
     # Process downloaded CSVs
-    destructure_csvs(work_dir, mapping)
+    destructure_csvs(report["work_dir"], mapping)
     print("All done.")
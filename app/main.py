@@ -7,6 +7,8 @@ from app.api import upload
 from app.api import check
 from app.api import status
 from app.api import download
+from app.api import metrics
+from app.api import events
 from app.celery.task.process_task import set_initial_tokens
 
 app = fastapi.FastAPI()
@@ -22,10 +24,18 @@ async def on_app_startup():
     await set_initial_tokens()
 
 
+@app.on_event("shutdown")
+async def on_app_shutdown():
+    """Cierra la suscripción compartida a los eventos de los Works."""
+    await events.work_event_hub.close()
+
+
 app.include_router(upload.router)
 app.include_router(check.router)
 app.include_router(status.router)
 app.include_router(download.router)
+app.include_router(metrics.router)
+app.include_router(events.router)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,7 +1,7 @@
 from typing import Protocol, Optional
 from uuid import UUID
 
-from app.entities.work import Work
+from app.entities.work import Work, WorkStatus
 from app.entities.task import Task
 
 
@@ -9,6 +9,11 @@ class IWorkRepository(Protocol):
     async def add(self, work: Work) -> None: ...
     async def get(self, work_id: str) -> Optional[Work]: ...
     async def update(self, work: Work) -> None: ...
+    async def get_many(self, work_ids: list[str]) -> dict[str, Work]: ...
+    async def find_by_content_hash(
+        self, content_hash: str, statuses: list[WorkStatus]
+    ) -> Optional[Work]: ...
+    async def lock_content_hash(self, content_hash: str) -> None: ...
 
 
 class ITaskRepository(Protocol):
@@ -16,3 +21,12 @@ class ITaskRepository(Protocol):
     async def get(self, task_id: str) -> Optional[Task]: ...
     async def update(self, task: Task) -> None: ...
     async def list_by_work(self, work_id: str) -> list[Task]: ...
+    async def list_by_works(self, work_ids: list[str]) -> dict[str, list[Task]]: ...
+
+
+class ITaskItemRepository(Protocol):
+    async def add_pending(self, task_id: str, work_id: str, donor_ids: list[str]) -> int: ...
+    async def list_remaining(self, task_id: str, max_attempts: int) -> list[str]: ...
+    async def mark_done(self, task_id: str, sources: dict[str, str]) -> None: ...
+    async def mark_failed(self, task_id: str, errors: dict[str, str]) -> None: ...
+    async def count_by_status(self, task_id: str) -> dict[str, int]: ...
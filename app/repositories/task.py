@@ -1,3 +1,4 @@
+from collections import defaultdict
 from typing import Optional, List
 from uuid import UUID
 from sqlmodel import select
@@ -54,21 +55,37 @@ class TaskRepository(ITaskRepository):
 
     async def list_by_work(self, work_id: str) -> List[Task]:
         result = await self.session.exec(
-            select(TaskModel).where(TaskModel.work_id == UUID(work_id))
+            select(TaskModel)
+            .where(TaskModel.work_id == UUID(work_id))
+            .order_by(TaskModel.created_at)  # type: ignore
         )
-        tasks = result.all()
-        entities = []
-        for db_task in tasks:
-            task = Task(
-                work_id=str(db_task.work_id),
-                payload=db_task.payload,
-            )
-            task.id = str(db_task.id)
-            task.status = TaskStatus(db_task.status.value)
-            task.result_path = db_task.result_path
-            task.attempts = db_task.attempts
-            task.error = db_task.error
-            task.created_at = db_task.created_at
-            task.updated_at = db_task.updated_at
-            entities.append(task)
-        return entities
+        return [self._to_entity(db_task) for db_task in result.all()]
+
+    async def list_by_works(self, work_ids: List[str]) -> dict[str, List[Task]]:
+        """Tareas de varios Works en una sola consulta (IN), por work_id."""
+        if not work_ids:
+            return {}
+        result = await self.session.exec(
+            select(TaskModel)
+            .where(TaskModel.work_id.in_([UUID(w) for w in work_ids]))  # type: ignore
+            .order_by(TaskModel.created_at)  # type: ignore
+        )
+        by_work: dict[str, List[Task]] = defaultdict(list)
+        for db_task in result.all():
+            by_work[str(db_task.work_id)].append(self._to_entity(db_task))
+        return dict(by_work)
+
+    @staticmethod
+    def _to_entity(db_task: TaskModel) -> Task:
+        task = Task(
+            work_id=str(db_task.work_id),
+            payload=db_task.payload,
+        )
+        task.id = str(db_task.id)
+        task.status = TaskStatus(db_task.status.value)
+        task.result_path = db_task.result_path
+        task.attempts = db_task.attempts
+        task.error = db_task.error
+        task.created_at = db_task.created_at
+        task.updated_at = db_task.updated_at
+        return task
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.repositories.repositories import ITaskItemRepository
+from app.database.models import TaskItem as TaskItemModel, TaskItemStatus
+
+INSERT_CHUNK = 1000
+
+
+class TaskItemRepository(ITaskItemRepository):
+    """Checkpoints por donante de una tarea, con operaciones en bloque."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_pending(self, task_id: str, work_id: str, donor_ids: list[str]) -> int:
+        """
+        Registra los donantes de la tarea; los que ya existen no se tocan.
+        Devuelve cuántos eran nuevos.
+        """
+        if not donor_ids:
+            return 0
+        now = datetime.now()
+        rows = [
+            {
+                "task_id": UUID(task_id),
+                "work_id": UUID(work_id),
+                "donor_id": donor_id,
+                "status": TaskItemStatus.PENDING,
+                "attempts": 0,
+                "updated_at": now,
+            }
+            for donor_id in dict.fromkeys(donor_ids)
+        ]
+        # Por bloques: el número de parámetros por sentencia está limitado
+        inserted = 0
+        for start in range(0, len(rows), INSERT_CHUNK):
+            stmt = insert(TaskItemModel).values(rows[start : start + INSERT_CHUNK])
+            result = await self.session.execute(
+                stmt.on_conflict_do_nothing(index_elements=["task_id", "donor_id"])
+                .returning(TaskItemModel.id)
+            )
+            inserted += len(result.all())
+        return inserted
+
+    async def list_remaining(self, task_id: str, max_attempts: int) -> list[str]:
+        """
+        Donantes por hacer: pendientes y fallidos con intentos disponibles,
+        primero los que menos intentos llevan.
+        """
+        result = await self.session.exec(
+            select(TaskItemModel.donor_id)
+            .where(TaskItemModel.task_id == UUID(task_id))
+            .where(
+                or_(
+                    TaskItemModel.status == TaskItemStatus.PENDING,
+                    (TaskItemModel.status == TaskItemStatus.FAILED)
+                    & (TaskItemModel.attempts < max_attempts),
+                )
+            )
+            .order_by(TaskItemModel.attempts, TaskItemModel.id)
+        )
+        return list(result.all())
+
+    async def mark_done(self, task_id: str, sources: dict[str, str]) -> None:
+        """Marca como hechos los donantes {donor_id: origen}, un UPDATE por origen."""
+        by_source = defaultdict(list)
+        for donor_id, source in sources.items():
+            by_source[source].append(donor_id)
+        for source, donor_ids in by_source.items():
+            await self._update(
+                task_id, donor_ids, status=TaskItemStatus.DONE, source=source, error=None
+            )
+
+    async def mark_failed(self, task_id: str, errors: dict[str, str]) -> None:
+        """Marca como fallidos los donantes {donor_id: error}, un UPDATE por error."""
+        by_error = defaultdict(list)
+        for donor_id, error in errors.items():
+            by_error[error].append(donor_id)
+        for error, donor_ids in by_error.items():
+            await self._update(task_id, donor_ids, status=TaskItemStatus.FAILED, error=error)
+
+    async def _update(self, task_id: str, donor_ids: list[str], **values) -> None:
+        await self.session.execute(
+            update(TaskItemModel)
+            .where(TaskItemModel.task_id == UUID(task_id))
+            .where(TaskItemModel.donor_id.in_(donor_ids))  # type: ignore
+            .values(
+                attempts=TaskItemModel.attempts + 1,
+                updated_at=datetime.now(),
+                **values,
+            )
+        )
+
+    async def count_by_status(self, task_id: str) -> dict[str, int]:
+        result = await self.session.exec(
+            select(TaskItemModel.status, func.count())
+            .where(TaskItemModel.task_id == UUID(task_id))
+            .group_by(TaskItemModel.status)
+        )
+        counts = {status.value: 0 for status in TaskItemStatus}
+        for status, n in result.all():
+            counts[TaskItemStatus(status).value] = n
+        return counts
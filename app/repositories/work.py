@@ -1,5 +1,7 @@
 from typing import Optional
 from uuid import UUID
+from sqlalchemy import text
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.database.models import Work as WorkModel
 from app.entities.work import Work as WorkEntity
@@ -18,8 +20,10 @@ class WorkRepository(IWorkRepository):
             filename=work.filename,
             storage_path=work.storage_path,
             status=DbWorkStatus(work.status.value),
+            max_tasks=work.max_tasks,
             output_path=work.output_path,
             error=work.error,
+            content_hash=work.content_hash,
             created_at=work.created_at,
             updated_at=work.updated_at,
         )
@@ -31,11 +35,49 @@ class WorkRepository(IWorkRepository):
         if not db_work:
             return None
 
+        return self._to_entity(db_work)
+
+    async def get_many(self, work_ids: list[str]) -> dict[str, WorkEntity]:
+        """Varios Works en una sola consulta (IN), por id."""
+        if not work_ids:
+            return {}
+        result = await self.session.exec(
+            select(WorkModel).where(WorkModel.id.in_([UUID(w) for w in work_ids]))  # type: ignore
+        )
+        return {str(db_work.id): self._to_entity(db_work) for db_work in result.all()}
+
+    async def find_by_content_hash(
+        self, content_hash: str, statuses: list[DomainWorkStatus]
+    ) -> Optional[WorkEntity]:
+        """El Work más reciente con ese mapping y alguno de esos estados."""
+        result = await self.session.exec(
+            select(WorkModel)
+            .where(WorkModel.content_hash == content_hash)
+            .where(WorkModel.status.in_([DbWorkStatus(s.value) for s in statuses]))  # type: ignore
+            .order_by(WorkModel.created_at.desc())  # type: ignore
+            .limit(1)
+        )
+        db_work = result.first()
+        return self._to_entity(db_work) if db_work else None
+
+    async def lock_content_hash(self, content_hash: str) -> None:
+        """
+        Bloqueo consultivo de Postgres sobre el hash hasta el fin de la
+        transacción: dos subidas iguales simultáneas no crean dos Works.
+        """
+        await self.session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtextextended(:content_hash, 0))"),
+            {"content_hash": content_hash},
+        )
+
+    @staticmethod
+    def _to_entity(db_work: WorkModel) -> WorkEntity:
         # Crear la entidad con los valores requeridos
         work_entity = WorkEntity(
             filename=db_work.filename,
             storage_path=db_work.storage_path,
             max_tasks=db_work.max_tasks,
+            content_hash=db_work.content_hash,
         )
 
         # Sobrescribir los valores generados por defecto
@@ -1,35 +1,186 @@
-from app.entities.work import Work
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from celery import chord
+
+from app.config.environment import settings
+from app.entities.work import Work, WorkStatus
 from app.entities.task import Task
+from app.integrations.scraper_service import load_mapping_from_csv
 from app.repositories.repositories import ITaskRepository, IWorkRepository
-from app.celery.task.process_task import process_task as celery_process_task
+from app.utils.output_formats import DEFAULT_FORMAT, DEFAULT_LAYOUT
+from app.celery.task.process_task import (
+    process_task as celery_process_task,
+    merge_work_results,
+)
+
+
+def split_shards(donor_ids: list[str], shard_size: int) -> list[list[str]]:
+    """Divide la lista de donantes en shards de `shard_size` (0 = sin dividir)."""
+    if shard_size <= 0 or len(donor_ids) <= shard_size:
+        return [donor_ids]
+    return [
+        donor_ids[i : i + shard_size] for i in range(0, len(donor_ids), shard_size)
+    ]
+
+
+def mapping_hash(mapping: dict[str, str], output: dict) -> str:
+    """
+    Huella del contenido de una subida: SHA-256 del formato de salida pedido
+    y de los pares DO → SP normalizados (sin espacios, únicos y ordenados),
+    de modo que el orden de las filas, los duplicados o el nombre del
+    archivo no cuentan. El SP entra en la huella porque da nombre a las
+    columnas del resultado, y el formato porque solo se reutiliza un Work
+    que entrega exactamente lo que se pidió.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{output['format']}\t{output['layout']}\n".encode("utf-8"))
+    for do_id, sp_id in sorted({(do.strip(), sp.strip()) for do, sp in mapping.items()}):
+        digest.update(f"{do_id}\t{sp_id}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _task_fields(task_ids: list) -> dict:
+    """
+    task_id solo identifica el resultado si el Work tiene una única tarea:
+    con shards es None y el resultado se descarga a nivel de Work.
+    """
+    return {"task_id": task_ids[0] if len(task_ids) == 1 else None, "task_ids": task_ids}
+
+
+def _download_url(task_ids: list, work_id) -> str:
+    """Descarga del resultado: la de la tarea o, con shards, la del Work."""
+    if len(task_ids) == 1:
+        return f"/download/{task_ids[0]}"
+    return f"/download/work/{work_id}"
 
 
 class UploadCSVUseCase:
-    def __init__(self, session, work_repo: IWorkRepository, task_repo: ITaskRepository):
+    def __init__(
+        self,
+        session,
+        work_repo: IWorkRepository,
+        task_repo: ITaskRepository,
+        shard_size: int = settings.SHARD_SIZE,
+    ):
         self.session = session
         self.work_repo = work_repo
         self.task_repo = task_repo
+        self.shard_size = shard_size
 
-    async def execute(self, file_path: str, filename: str):
-        async with self.session.begin():  
+    async def execute(
+        self,
+        file_path: str,
+        filename: str,
+        output_format: str = DEFAULT_FORMAT,
+        layout: str = DEFAULT_LAYOUT,
+    ):
+        mapping = load_mapping_from_csv(file_path)
+        donor_ids = list(mapping.keys())
+        output = {"format": output_format, "layout": layout}
+        content_hash = mapping_hash(mapping, output)
+        shards = split_shards(donor_ids, self.shard_size)
+
+        async with self.session.begin():
             try:
+                if settings.DEDUPE_UPLOADS:
+                    # Serializa las subidas con el mismo contenido hasta el commit
+                    await self.work_repo.lock_content_hash(content_hash)
+                    existing = await self._find_reusable(content_hash)
+                    if existing:
+                        tasks = await self.task_repo.list_by_work(existing.id)
+                        if tasks:
+                            reused = existing.status == WorkStatus.COMPLETED
+                            print(
+                                f"[UseCase] Upload deduplicated: Work {existing.id} "
+                                f"({'result reused' if reused else 'attached, in flight'})"
+                            )
+                            return {
+                                "work_id": existing.id,
+                                **_task_fields([t.id for t in tasks]),
+                                "download_url": (
+                                    _download_url([t.id for t in tasks], existing.id)
+                                    if reused
+                                    else None
+                                ),
+                                "deduplicated": True,
+                                "reused": reused,
+                            }
+
                 # Crear Work
-                work = Work(filename=filename, storage_path=file_path)
+                work = Work(
+                    filename=filename,
+                    storage_path=file_path,
+                    max_tasks=len(shards),
+                    content_hash=content_hash,
+                )
                 await self.work_repo.add(work)
                 await self.session.flush()
 
-                # Crear Task
-                db_task = Task(work_id=work.id, payload={"csv_path": file_path})
-                await self.task_repo.add(db_task)
+                # Crear Tasks (una por shard)
+                if len(shards) == 1:
+                    payload = {"csv_path": file_path, "output": output}
+                    work.add_task(Task(work_id=work.id, payload=payload))
+                else:
+                    for i, shard in enumerate(shards):
+                        payload = {
+                            "csv_path": file_path,
+                            "donor_ids": shard,
+                            "shard": i,
+                            "shards": len(shards),
+                            "output": output,
+                        }
+                        work.add_task(Task(work_id=work.id, payload=payload))
+
+                for db_task in work.tasks:
+                    await self.task_repo.add(db_task)
                 print(f"[UseCase] Work created: {work.id}")
-                print(f"[UseCase] Task created: {db_task.id}")
+                print(f"[UseCase] {len(work.tasks)} task(s) created")
 
             except Exception as e:
                 print(f"[UseCase] Exception: {e}")
                 raise
 
-        # Encolar tarea Celery
-        celery_process_task.apply_async(args=[str(db_task.id)]) # type: ignore
-        print(f"[UseCase] Task {db_task.id} enqueued in Celery")
+        # Encolar tarea(s) Celery
+        task_ids = [str(t.id) for t in work.tasks]
+        if len(task_ids) == 1:
+            celery_process_task.apply_async(args=[task_ids[0]]) # type: ignore
+            print(f"[UseCase] Task {task_ids[0]} enqueued in Celery")
+        else:
+            header = [celery_process_task.s(task_id) for task_id in task_ids] # type: ignore
+            chord(header)(merge_work_results.s(str(work.id), output)) # type: ignore
+            print(f"[UseCase] {len(task_ids)} shard tasks enqueued in a chord")
+
+        return {
+            "work_id": work.id,
+            **_task_fields(task_ids),
+            "download_url": None,
+            "deduplicated": False,
+            "reused": False,
+        }
+
+    async def _find_reusable(self, content_hash: str) -> Optional[Work]:
+        """
+        Work al que se puede enganchar una subida con ese contenido: uno en
+        curso (se comparte su ejecución) o uno completado cuyo resultado
+        sigue en disco y no es más antiguo que CACHE_TTL_DAYS (0 = sin
+        caducidad, como la caché de donantes).
+        """
+        in_flight = await self.work_repo.find_by_content_hash(
+            content_hash, [WorkStatus.PENDING, WorkStatus.IN_PROGRESS]
+        )
+        if in_flight:
+            return in_flight
 
-        return {"work_id": work.id, "task_id": db_task.id}
+        completed = await self.work_repo.find_by_content_hash(
+            content_hash, [WorkStatus.COMPLETED]
+        )
+        if not completed or not completed.output_path or not os.path.exists(completed.output_path):
+            return None
+        if settings.CACHE_TTL_DAYS and (
+            datetime.now() - completed.updated_at > timedelta(days=settings.CACHE_TTL_DAYS)
+        ):
+            return None
+        return completed
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.celery.events import EVENTS_PREFIX, EVENTS_SUFFIX, work_id_from_channel
+
+# Eventos pendientes por suscriptor; si un cliente no da abasto se descartan
+# los más antiguos (el último estado es lo que importa)
+QUEUE_SIZE = 100
+
+
+class WorkEventHub:
+    """
+    Reparto de los eventos de los Works a los clientes SSE del proceso.
+
+    Una única suscripción por patrón (``work:*:events``) por proceso de la
+    API, en lugar de una conexión pub/sub de Redis por pestaña abierta. Cada
+    cliente recibe una cola con los eventos de su Work.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis):
+        self.redis = redis_client
+        self._queues: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def subscribe(self, work_id: str):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._queues[work_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._queues[work_id].discard(queue)
+            if not self._queues[work_id]:
+                del self._queues[work_id]
+
+    def _dispatch(self, work_id: str, event: dict):
+        for queue in self._queues.get(work_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _run(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{EVENTS_PREFIX}*{EVENTS_SUFFIX}")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    work_id = work_id_from_channel(message["channel"])
+                    if work_id in self._queues:
+                        self._dispatch(work_id, json.loads(message["data"]))
+            except aioredis.RedisError as e:
+                print(f"[WARN] Suscripción a eventos de Works perdida: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,186 @@
+from typing import Optional
+from uuid import UUID
+
+from redis import asyncio as aioredis
+
+from app.celery.events import (
+    cache_status,
+    cache_statuses,
+    read_status_snapshot,
+    read_status_snapshots,
+)
+from app.celery.progress import read_progress, read_progress_many
+from app.entities.task import Task, TaskStatus
+from app.entities.work import Work, WorkStatus
+from app.repositories.repositories import ITaskRepository, IWorkRepository
+
+# Estados del Work expresados con los valores que ya consume el cliente
+WORK_TO_TASK_STATUS = {
+    WorkStatus.PENDING: TaskStatus.PENDING.value,
+    WorkStatus.IN_PROGRESS: TaskStatus.RUNNING.value,
+    WorkStatus.COMPLETED: TaskStatus.COMPLETED.value,
+    WorkStatus.FAILED: TaskStatus.FAILED.value,
+    WorkStatus.CANCELLED: TaskStatus.FAILED.value,
+}
+
+
+async def load_work_status(
+    task_repo: ITaskRepository, work_repo: IWorkRepository, work_id: str
+) -> Optional[dict]:
+    """
+    Obtiene el estado de un Work y sus tareas de la base de datos.
+
+    Con una sola tarea se reporta el estado de esa tarea (como hasta ahora);
+    con varias (fan-out por shards) el estado es el del Work, derivado de
+    sus tareas.
+
+    Returns:
+        Dict con status, work_id, task_id y, según el caso, error,
+        result_path, download_url y el progreso de los shards; None si no
+        existe ninguna tarea para ese work_id.
+    """
+    try:
+        UUID(work_id)
+    except ValueError:
+        return None
+
+    tasks = await task_repo.list_by_work(work_id)
+    if not tasks:
+        return None
+    work = await work_repo.get(work_id) if len(tasks) > 1 else None
+    return build_work_status(work_id, tasks, work)
+
+
+async def load_work_statuses(
+    task_repo: ITaskRepository, work_repo: IWorkRepository, work_ids: list[str]
+) -> dict[str, dict]:
+    """
+    Estado de varios Works con dos consultas IN: las tareas de todos y los
+    Works con fan-out (los de una sola tarea no lo necesitan). Los work_id
+    inexistentes o no válidos no aparecen en el resultado.
+    """
+    valid = []
+    for work_id in work_ids:
+        try:
+            UUID(work_id)
+        except ValueError:
+            continue
+        valid.append(work_id)
+
+    tasks_by_work = await task_repo.list_by_works(valid)
+    works = await work_repo.get_many(
+        [work_id for work_id, tasks in tasks_by_work.items() if len(tasks) > 1]
+    )
+    return {
+        work_id: build_work_status(work_id, tasks, works.get(work_id))
+        for work_id, tasks in tasks_by_work.items()
+    }
+
+
+def build_work_status(work_id: str, tasks: list[Task], work: Optional[Work]) -> dict:
+    """Estado de una tarea única o, en fan-out, el del Work y sus shards."""
+    if len(tasks) == 1:
+        task = tasks[0]
+        data = {"status": task.status.value, "work_id": work_id, "task_id": task.id}
+        if task.status == TaskStatus.FAILED and task.error:
+            data["error"] = task.error
+        if task.status == TaskStatus.COMPLETED and task.result_path:
+            data["result_path"] = task.result_path
+            data["download_url"] = f"/download/{task.id}"
+        return data
+
+    status_value = WORK_TO_TASK_STATUS[work.status] if work else TaskStatus.PENDING.value
+    data = {
+        "status": status_value,
+        "work_id": work_id,
+        "task_id": tasks[0].id,
+        "tasks_total": len(tasks),
+        "tasks_completed": sum(t.status == TaskStatus.COMPLETED for t in tasks),
+    }
+    if status_value == TaskStatus.FAILED.value:
+        errors = [t.error for t in tasks if t.error] + ([work.error] if work and work.error else [])
+        if errors:
+            data["error"] = errors[-1]
+    if work and work.status == WorkStatus.COMPLETED and work.output_path:
+        data["result_path"] = work.output_path
+        data["download_url"] = f"/download/work/{work_id}"
+    return data
+
+
+class WorkStatusUseCase:
+    """
+    Consulta del estado de un Work con caché de lectura en Redis.
+
+    Los workers escriben el estado en la caché en cada transición; la API lo
+    lee de ahí y solo va a la base de datos cuando falta (Work aún sin
+    empezar o entrada caducada), dejando el resultado en caché con un TTL
+    corto. El progreso por donantes se añade siempre al día desde sus
+    contadores.
+    """
+
+    def __init__(
+        self,
+        task_repo: ITaskRepository,
+        work_repo: IWorkRepository,
+        redis_client: aioredis.Redis,
+    ):
+        self.task_repo = task_repo
+        self.work_repo = work_repo
+        self.redis = redis_client
+
+    async def execute(self, work_id: str) -> Optional[dict]:
+        try:
+            data = await read_status_snapshot(self.redis, work_id)
+        except aioredis.RedisError as e:
+            print(f"[WARN] Caché de estado no disponible: {e}")
+            return await load_work_status(self.task_repo, self.work_repo, work_id)
+
+        if data is None:
+            data = await load_work_status(self.task_repo, self.work_repo, work_id)
+            if data is None:
+                return None
+            try:
+                # Sin pisar lo que haya escrito un worker entretanto
+                await cache_status(self.redis, work_id, data, overwrite=False)
+            except aioredis.RedisError as e:
+                print(f"[WARN] No se pudo cachear el estado de {work_id}: {e}")
+
+        try:
+            progress = await read_progress(self.redis, work_id)
+        except aioredis.RedisError as e:
+            print(f"[WARN] No se pudo leer el progreso de {work_id}: {e}")
+            progress = None
+        if progress:
+            data["progress"] = progress
+        return data
+
+    async def execute_many(self, work_ids: list[str]) -> dict[str, dict]:
+        """
+        Estado de varios Works: un MGET a la caché, una consulta IN para los
+        que falten y un pipeline para el progreso. Devuelve {work_id: estado}
+        solo con los que existen.
+        """
+        try:
+            statuses = await read_status_snapshots(self.redis, work_ids)
+        except aioredis.RedisError as e:
+            print(f"[WARN] Caché de estado no disponible: {e}")
+            return await load_work_statuses(self.task_repo, self.work_repo, work_ids)
+
+        misses = [work_id for work_id in work_ids if work_id not in statuses]
+        if misses:
+            loaded = await load_work_statuses(self.task_repo, self.work_repo, misses)
+            statuses.update(loaded)
+            try:
+                await cache_statuses(self.redis, loaded)
+            except aioredis.RedisError as e:
+                print(f"[WARN] No se pudieron cachear los estados: {e}")
+
+        try:
+            progress = await read_progress_many(self.redis, list(statuses))
+        except aioredis.RedisError as e:
+            print(f"[WARN] No se pudo leer el progreso: {e}")
+            progress = {}
+        for work_id, data in statuses.items():
+            if work_id in progress:
+                data["progress"] = progress[work_id]
+        return statuses
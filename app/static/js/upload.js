@@ -156,6 +156,8 @@
     mkStatus("Subiendo...");
     const fd = new FormData();
     fd.append("file", state.file, state.file.name);
+    fd.append("output_format", qs("#outputFormat").value);
+    fd.append("layout", qs("#outputLayout").value);
 
     try {
       const resp = await fetch("/", { method: "POST", body: fd });
@@ -172,12 +174,14 @@
         taskStatusDiv.style.display = "block";
         workIdSpan.textContent = json.work_id;
 
-        // Iniciar polling del estado
-        startStatusPolling(json.work_id);
+        // Seguir el estado (eventos del servidor o polling)
+        startStatusUpdates(json.work_id);
 
         result.innerHTML = `
           <div class="result-box result-success">
             <strong>Archivo subido correctamente:</strong> ${escapeHtml(state.file.name)}<br>
+            ${json.reused ? '<span class="muted small">Ya existía un resultado para este mapping; se reutiliza.</span><br>' : ""}
+            ${json.deduplicated && !json.reused ? '<span class="muted small">Este mapping ya se está procesando; se sigue ese trabajo.</span><br>' : ""}
             <span class="muted small">El estado se actualizará automáticamente abajo</span>
           </div>
         `;
@@ -191,15 +195,54 @@
     }
   });
 
-  // Función para hacer polling del estado
+  // Actualizaciones del estado: eventos del servidor (SSE) y, si el
+  // navegador no los soporta o la conexión falla, polling
   let pollingInterval = null;
+  let eventSource = null;
+  let lastStatus = null;
 
-  function startStatusPolling(workId) {
-    // Limpiar polling anterior si existe
+  function stopStatusUpdates() {
     if (pollingInterval) {
       clearInterval(pollingInterval);
+      pollingInterval = null;
+    }
+    if (eventSource) {
+      eventSource.close();
+      eventSource = null;
+    }
+  }
+
+  function startStatusUpdates(workId) {
+    stopStatusUpdates();
+    if (!window.EventSource) {
+      startStatusPolling(workId);
+      return;
     }
 
+    let failures = 0;
+    eventSource = new EventSource(`/api/events/${workId}`);
+    eventSource.addEventListener("status", (e) => {
+      failures = 0;
+      renderStatus(JSON.parse(e.data));
+    });
+    eventSource.addEventListener("progress", (e) => {
+      failures = 0;
+      renderProgress(JSON.parse(e.data), lastStatus);
+    });
+    eventSource.onerror = () => {
+      // EventSource reconecta solo; tras varios fallos seguidos, polling
+      failures += 1;
+      if (failures >= 3) {
+        console.warn("Eventos del servidor no disponibles, usando polling");
+        startStatusPolling(workId);
+      }
+    };
+  }
+
+  function startStatusPolling(workId) {
+    // Limpiar actualizaciones anteriores si existen
+    stopStatusUpdates();
+
     // Hacer primera consulta inmediatamente
     updateTaskStatus(workId);
 
@@ -209,63 +252,89 @@
     }, 3000);
   }
 
+  function formatEta(seconds) {
+    if (seconds < 60) return `${seconds} s`;
+    const minutes = Math.round(seconds / 60);
+    if (minutes < 60) return `${minutes} min`;
+    return `${Math.floor(minutes / 60)} h ${minutes % 60} min`;
+  }
+
+  // Progreso por donantes (contadores agregados del Work)
+  function renderProgress(progress, status) {
+    const box = qs("#progress");
+    if (!progress || !progress.total) {
+      box.style.display = "none";
+      return;
+    }
+    box.style.display = "block";
+    qs("#progressFill").style.width = progress.percent + "%";
+
+    const parts = [
+      `${progress.done}/${progress.total} donantes (${progress.percent}%)`,
+      `caché: ${progress.cache_hits} aciertos, ${progress.cache_misses} descargas`,
+    ];
+    if (progress.failed) parts.push(`${progress.failed} fallidos`);
+    if (status === "running" && progress.throughput_per_second) {
+      parts.push(`${(progress.throughput_per_second * 60).toFixed(1)} donantes/min`);
+      if (progress.eta_seconds != null) {
+        parts.push(`ETA ~${formatEta(progress.eta_seconds)}`);
+      }
+    }
+    qs("#progressText").textContent = parts.join(" · ");
+  }
+
   async function updateTaskStatus(workId) {
     try {
       const resp = await fetch(`/api/status/${workId}`);
-      const data = await resp.json();
-
-      const statusBadge = qs("#statusBadge");
-      const statusMessage = qs("#statusMessage");
-      const errorMessage = qs("#errorMessage");
-      const downloadBtn = qs("#downloadBtn");
-
-      // Actualizar badge de estado
-      statusBadge.className = "status-badge " + data.status.toLowerCase();
-      statusBadge.textContent = data.status;
-
-      // Actualizar mensaje según el estado
-      switch (data.status) {
-        case "pending":
-          statusMessage.textContent = "La tarea está en cola, será procesada pronto...";
-          break;
-        case "running":
-          statusMessage.textContent = "El scraper está descargando los CSVs. Esto puede tomar varios minutos...";
-          break;
-        case "completed":
-          statusMessage.textContent = "¡Proceso completado! Tu archivo está listo para descargar.";
-          downloadBtn.href = data.download_url;
-          downloadBtn.style.display = "inline-block";
-          // Detener polling
-          if (pollingInterval) {
-            clearInterval(pollingInterval);
-            pollingInterval = null;
-          }
-          break;
-        case "failed":
-          statusMessage.textContent = "La tarea falló durante la ejecución.";
-          if (data.error) {
-            errorMessage.textContent = "Error: " + data.error;
-            errorMessage.style.display = "block";
-          }
-          // Detener polling
-          if (pollingInterval) {
-            clearInterval(pollingInterval);
-            pollingInterval = null;
-          }
-          break;
-        case "not_found":
-          statusMessage.textContent = "No se encontró la tarea.";
-          if (pollingInterval) {
-            clearInterval(pollingInterval);
-            pollingInterval = null;
-          }
-          break;
-      }
+      renderStatus(await resp.json());
     } catch (err) {
       console.error("Error al consultar estado:", err);
     }
   }
 
+  function renderStatus(data) {
+    lastStatus = data.status;
+    const statusBadge = qs("#statusBadge");
+    const statusMessage = qs("#statusMessage");
+    const errorMessage = qs("#errorMessage");
+    const downloadBtn = qs("#downloadBtn");
+
+    // Actualizar badge de estado
+    statusBadge.className = "status-badge " + data.status.toLowerCase();
+    statusBadge.textContent = data.status;
+    renderProgress(data.progress, data.status);
+
+    // Actualizar mensaje según el estado
+    switch (data.status) {
+      case "pending":
+        statusMessage.textContent = "La tarea está en cola, será procesada pronto...";
+        break;
+      case "running":
+        statusMessage.textContent = "El scraper está descargando los CSVs. Esto puede tomar varios minutos...";
+        break;
+      case "completed":
+        statusMessage.textContent = "¡Proceso completado! Tu archivo está listo para descargar.";
+        downloadBtn.href = data.download_url;
+        downloadBtn.style.display = "inline-block";
+        // Detener actualizaciones
+        stopStatusUpdates();
+        break;
+      case "failed":
+        statusMessage.textContent = "La tarea falló durante la ejecución.";
+        if (data.error) {
+          errorMessage.textContent = "Error: " + data.error;
+          errorMessage.style.display = "block";
+        }
+        // Detener actualizaciones
+        stopStatusUpdates();
+        break;
+      case "not_found":
+        statusMessage.textContent = "No se encontró la tarea.";
+        stopStatusUpdates();
+        break;
+    }
+  }
+
   drop.addEventListener("keydown", (e) => {
     if (e.key === "Enter" || e.key === " ") input.click();
   });
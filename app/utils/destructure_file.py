@@ -1,42 +1,174 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import Optional
 
+from app.utils.output_formats import (
+    COMBINED_STEM,
+    DEFAULT_FORMAT,
+    DEFAULT_LAYOUT,
+    result_filename,
+    write_matrix,
+)
+from app.utils.result_encoding import prepare_download
+from app.utils.signature_store import SignatureStore
 
-def destructure_csvs(work_dir: Path, mapping: dict):
+COMBINED_FILENAME = result_filename()
+
+# Cada CSV descargado trae los 96 contextos de sustitución simple
+SIGNATURE_ROWS = 96
+
+
+def read_signature_csv(csv_file: Path) -> tuple[list[str], list[float]]:
+    """
+    Lee un CSV de firma (cabecera + filas "Type,valor") sin pasar por pandas.
+
+    Returns:
+        Tupla (tipos, valores) en el orden del archivo
+    """
+    types: list[str] = []
+    values: list[float] = []
+    with open(csv_file, encoding="utf-8") as f:
+        next(f, None)  # saltar encabezado
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            mutation_type, _, value = line.rpartition(",")
+            types.append(mutation_type.strip('"'))
+            values.append(float(value) if value else np.nan)
+    return types, values
+
+
+def build_signature_matrix(csv_files: list[Path], mapping: dict) -> pd.DataFrame:
+    """
+    Construye la matriz Type x donante en una sola pasada.
+
+    Todos los archivos se vuelcan en una matriz NumPy preasignada cuyas filas
+    siguen un vocabulario "Type" compartido (orden de primera aparición), lo que
+    equivale al outer join iterativo pero sin copiar el DataFrame en cada archivo.
+    """
+    vocab: list[str] = []
+    row_of: dict[str, int] = {}
+    matrix = np.full((SIGNATURE_ROWS, len(csv_files)), np.nan)
+    columns = []
+
+    for j, csv_file in enumerate(csv_files):
+        do_id = csv_file.stem
+        columns.append(mapping.get(do_id, do_id))
+
+        types, values = read_signature_csv(csv_file)
+
+        # Caso habitual: mismo orden de contextos que los archivos previos
+        if types == vocab:
+            matrix[:, j] = values
+            continue
+
+        for mutation_type, value in zip(types, values):
+            row = row_of.get(mutation_type)
+            if row is None:
+                row = len(vocab)
+                row_of[mutation_type] = row
+                vocab.append(mutation_type)
+                if row >= matrix.shape[0]:
+                    extra = np.full((matrix.shape[0], matrix.shape[1]), np.nan)
+                    matrix = np.vstack([matrix, extra])
+            matrix[row, j] = value
+
+    matrix = matrix[: len(vocab)]
+
+    # El outer join de pandas devuelve la unión de índices ordenada
+    if len(csv_files) > 1:
+        order = sorted(range(len(vocab)), key=vocab.__getitem__)
+        vocab = [vocab[i] for i in order]
+        matrix = matrix[order]
+
+    return _to_frame(matrix, vocab, columns)
+
+
+def build_matrix_from_store(
+    csv_files: list[Path], mapping: dict, store: SignatureStore
+) -> pd.DataFrame:
+    """
+    Misma matriz que build_signature_matrix, tomando las firmas del almacén.
+
+    Solo se leen los CSV de donantes que aún no están en el almacén (o cuyo
+    CSV cambió); se añaden a él y el resto es un fancy-index sobre el memmap.
+    Si algún CSV no tiene los contextos canónicos, se recurre a leerlos todos.
+    """
+    if len(csv_files) < 2:
+        # Con un solo archivo el orden de filas es el del CSV, no el canónico
+        return build_signature_matrix(csv_files, mapping)
+
+    sources = {f.stem: f.stat() for f in csv_files}
+    rows = store.rows_for(sources)
+    missing = [f for f in csv_files if f.stem not in rows]
+    if missing:
+        parsed = {f.stem: (*read_signature_csv(f), sources[f.stem]) for f in missing}
+        rows.update(store.add_many(parsed))
+        if len(rows) < len(csv_files):
+            print("⚠️ Hay firmas fuera del formato del almacén; se combinan leyendo los CSV")
+            return build_signature_matrix(csv_files, mapping)
+        print(f"Almacén de firmas: {len(missing)} donantes añadidos")
+
+    matrix = store.take(rows[f.stem] for f in csv_files).T
+    columns = [mapping.get(f.stem, f.stem) for f in csv_files]
+    return _to_frame(matrix, store.contexts(), columns)
+
+
+def _to_frame(matrix: np.ndarray, vocab: list[str], columns: list[str]) -> pd.DataFrame:
+    df = pd.DataFrame(matrix, index=pd.Index(vocab, name="Type"), columns=columns)
+
+    # Conservar enteros en las columnas completas (como hacía pandas con el join)
+    finite = np.nan_to_num(matrix)
+    complete = ~np.isnan(matrix).any(axis=0)
+    integral = complete & (finite == np.floor(finite)).all(axis=0)
+    if integral.all():
+        df = df.astype(np.int64)
+    elif integral.any():
+        df = df.astype({df.columns[j]: np.int64 for j in np.flatnonzero(integral)})
+
+    return df
+
+
+def destructure_csvs(
+    work_dir: Path,
+    mapping: dict,
+    output_format: str = DEFAULT_FORMAT,
+    layout: str = DEFAULT_LAYOUT,
+    store: Optional[SignatureStore] = None,
+):
     """
     Combina los CSV descargados en un solo archivo,
     usando el mapping SP<->DO para nombrar las columnas.
+
+    El resultado se guarda con el formato (csv, csv.gz, csv.zst, parquet,
+    feather) y layout (wide, long) pedidos; ver app.utils.output_formats.
+    Con ``store`` las firmas salen del almacén persistente en lugar de
+    leer cada CSV (ver app.utils.signature_store).
     """
     downloads_dir = work_dir / "downloads"
-    csv_files = list(downloads_dir.glob("*.csv"))
+    csv_files = [
+        f for f in downloads_dir.glob("*.csv") if not f.name.startswith(COMBINED_STEM)
+    ]
 
     if not csv_files:
         print("⚠️ No se encontraron CSVs en", downloads_dir)
         return None
 
-    combined_df: pd.DataFrame | None = None
-
-    for csv_file in csv_files:
-        do_id = csv_file.stem
-        sp_id = mapping.get(do_id, do_id)
-
-        df = pd.read_csv(csv_file)
-        df.columns = ["Type", sp_id]
-        df.set_index("Type", inplace=True)
-
-        if combined_df is None:
-            combined_df = df
-        else:
-            combined_df = combined_df.join(df, how="outer")
+    if store is not None:
+        combined_df = build_matrix_from_store(csv_files, mapping, store)
+    else:
+        combined_df = build_signature_matrix(csv_files, mapping)
 
-    # Asegurarse de que no sea None
-    if combined_df is None:
+    if combined_df.empty:
         print("⚠️ No se generó ningún DataFrame combinado.")
         return None
 
-    combined_df.reset_index(inplace=True)
-    combined_path = downloads_dir / "combined.csv"
-    combined_df.to_csv(combined_path, index=False)
+    combined_path = downloads_dir / result_filename(output_format, layout)
+    write_matrix(combined_df, combined_path, output_format, layout)
+    # Checksum (ETag) y copias gzip/zstd para las descargas
+    prepare_download(combined_path)
 
     print(f"✅ Archivo combinado guardado en: {combined_path}")
     return combined_path
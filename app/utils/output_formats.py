@@ -0,0 +1,146 @@
+"""
+Formatos de salida de la matriz de firmas combinada.
+
+La matriz (Type x donante) se puede guardar como CSV (plano, gzip o zstd),
+Parquet o Arrow IPC/Feather, en formato ancho (una columna por donante, el
+de siempre) o largo/tidy (filas Type, donor, value). Parquet y Feather
+necesitan pyarrow y el CSV zstd el paquete zstandard; si faltan, esos
+formatos no se ofrecen.
+"""
+import importlib.util
+import os
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+
+from app.utils.result_encoding import prepare_download
+
+COMBINED_STEM = "combined"
+
+LAYOUTS = ("wide", "long")
+
+# formato -> (extensión, media type, módulo opcional necesario)
+FORMATS = {
+    "csv": (".csv", "text/csv", None),
+    "csv.gz": (".csv.gz", "application/gzip", None),
+    "csv.zst": (".csv.zst", "application/zstd", "zstandard"),
+    "parquet": (".parquet", "application/vnd.apache.parquet", "pyarrow"),
+    "feather": (".feather", "application/vnd.apache.arrow.file", "pyarrow"),
+}
+
+DEFAULT_FORMAT = "csv"
+DEFAULT_LAYOUT = "wide"
+
+
+def available_formats() -> list[str]:
+    """Formatos utilizables con las dependencias instaladas."""
+    return [
+        name
+        for name, (_, _, module) in FORMATS.items()
+        if module is None or importlib.util.find_spec(module) is not None
+    ]
+
+
+def validate_output(output_format: str, layout: str) -> None:
+    """
+    Raises:
+        ValueError: si el formato o el layout no existen o falta su dependencia
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Formato desconocido: {output_format} (opciones: {', '.join(FORMATS)})")
+    if output_format not in available_formats():
+        raise ValueError(f"El formato {output_format} requiere el paquete {FORMATS[output_format][2]}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Layout desconocido: {layout} (opciones: {', '.join(LAYOUTS)})")
+
+
+def result_filename(output_format: str = DEFAULT_FORMAT, layout: str = DEFAULT_LAYOUT) -> str:
+    """combined.csv, combined.parquet, combined_long.csv.gz, ..."""
+    stem = COMBINED_STEM if layout == "wide" else f"{COMBINED_STEM}_{layout}"
+    return stem + FORMATS[output_format][0]
+
+
+def media_type_for(path: Path) -> str:
+    for extension, media_type, _ in sorted(FORMATS.values(), key=lambda f: -len(f[0])):
+        if path.name.endswith(extension):
+            return media_type
+    return "application/octet-stream"
+
+
+def detect_output(path: Path) -> tuple[str, str]:
+    """(formato, layout) de un archivo de resultado a partir de su nombre."""
+    name = path.name
+    layout = "long" if name.startswith(f"{COMBINED_STEM}_long") else "wide"
+    for output_format, (extension, _, _) in sorted(FORMATS.items(), key=lambda f: -len(f[1][0])):
+        if name.endswith(extension):
+            return output_format, layout
+    raise ValueError(f"Formato de resultado no reconocido: {name}")
+
+
+def to_long(df: pd.DataFrame) -> pd.DataFrame:
+    """Matriz ancha (índice Type) -> filas (Type, donor, value) sin los NaN."""
+    long_df = df.reset_index().melt(id_vars="Type", var_name="donor", value_name="value")
+    long_df = long_df.dropna(subset=["value"]).reset_index(drop=True)
+    # Columnas repetitivas como categorías: Parquet/Arrow las guardan como
+    # diccionario en lugar de repetir cada cadena
+    return long_df.astype({"Type": "category", "donor": "category"})
+
+
+def to_wide(long_df: pd.DataFrame) -> pd.DataFrame:
+    """Inversa de to_long: matriz con índice Type y una columna por donante."""
+    long_df = long_df.astype({"Type": str, "donor": str})
+    donors = list(dict.fromkeys(long_df["donor"]))
+    wide = long_df.pivot(index="Type", columns="donor", values="value")
+    wide.columns.name = None
+    return wide[donors]
+
+
+def write_matrix(df: pd.DataFrame, path: Path, output_format: str, layout: str) -> Path:
+    """
+    Guarda la matriz (índice Type) en ``path`` con el formato y layout pedidos.
+
+    Se escribe en un temporal y se renombra, para que una descarga nunca vea
+    un archivo a medias.
+    """
+    table = to_long(df) if layout == "long" else df.reset_index()
+    tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    if output_format == "parquet":
+        table.to_parquet(tmp_path, index=False, compression="zstd")
+    elif output_format == "feather":
+        table.to_feather(tmp_path, compression="zstd")
+    else:
+        compression = {"csv": None, "csv.gz": "gzip", "csv.zst": "zstd"}[output_format]
+        table.to_csv(tmp_path, index=False, compression=compression)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_matrix(path: Path) -> pd.DataFrame:
+    """Lee un resultado en cualquier formato y lo devuelve como matriz ancha."""
+    output_format, layout = detect_output(path)
+    if output_format == "parquet":
+        table = pd.read_parquet(path)
+    elif output_format == "feather":
+        table = pd.read_feather(path)
+    else:
+        compression = {"csv": None, "csv.gz": "gzip", "csv.zst": "zstd"}[output_format]
+        table = pd.read_csv(path, compression=compression)
+    if layout == "long":
+        return to_wide(table)
+    return table.set_index("Type")
+
+
+def convert_result(path: Path, output_format: str, layout: str) -> Path:
+    """
+    Resultado en otro formato/layout, generado junto al original la primera
+    vez que se pide y reutilizado mientras el original no cambie.
+    """
+    target = path.with_name(result_filename(output_format, layout))
+    if target == path:
+        return path
+    if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+        return target
+    write_matrix(read_matrix(path), target, output_format, layout)
+    prepare_download(target)
+    return target
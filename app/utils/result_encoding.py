@@ -0,0 +1,115 @@
+"""
+Archivos auxiliares para servir los resultados de forma eficiente.
+
+Junto a cada resultado se guarda, en ``.encoded/``, su checksum SHA-256
+(base del ETag) y, si es texto sin comprimir (CSV), copias precomprimidas en
+gzip y zstd para la negociación de Content-Encoding. Se generan al escribir
+el resultado (merge o conversión) en una sola lectura del archivo, y bajo
+demanda para resultados anteriores; se consideran válidos mientras no sean
+más antiguos que el resultado.
+"""
+import gzip
+import hashlib
+import importlib.util
+import os
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+ENCODED_DIR = ".encoded"
+
+CHUNK_SIZE = 1024 * 1024
+
+# Content-Encoding -> extensión, por orden de preferencia
+ENCODINGS = {"zstd": ".zst", "gzip": ".gz"}
+
+# Solo merece la pena precomprimir lo que no viene ya comprimido
+COMPRESSIBLE_SUFFIXES = (".csv",)
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def _zstd_available() -> bool:
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def _sidecar(path: Path, suffix: str) -> Path:
+    return path.parent / ENCODED_DIR / f"{path.name}{suffix}"
+
+
+def _fresh(sidecar: Path, path: Path) -> bool:
+    return sidecar.exists() and sidecar.stat().st_mtime >= path.stat().st_mtime
+
+
+def prepare_download(path: Path) -> str:
+    """
+    Calcula el checksum del resultado y escribe sus copias precomprimidas.
+
+    Returns:
+        SHA-256 en hexadecimal
+    """
+    encoded_dir = path.parent / ENCODED_DIR
+    encoded_dir.mkdir(exist_ok=True)
+    tag = uuid4().hex
+
+    encodings = []
+    if path.name.endswith(COMPRESSIBLE_SUFFIXES):
+        encodings.append("gzip")
+        if _zstd_available():
+            encodings.append("zstd")
+
+    digest = hashlib.sha256()
+    tmp_paths = {enc: encoded_dir / f".{path.name}{ENCODINGS[enc]}.{tag}.tmp" for enc in encodings}
+    writers = {}
+    files = []
+    try:
+        for enc, tmp_path in tmp_paths.items():
+            raw = open(tmp_path, "wb")
+            files.append(raw)
+            if enc == "gzip":
+                writers[enc] = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+            else:
+                import zstandard
+
+                writers[enc] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+                for writer in writers.values():
+                    writer.write(chunk)
+        for writer in writers.values():
+            writer.close()  # cierra también el archivo subyacente (zstd)
+    except Exception:
+        for tmp_path in tmp_paths.values():
+            tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        for raw in files:
+            raw.close()
+
+    for enc, tmp_path in tmp_paths.items():
+        os.replace(tmp_path, _sidecar(path, ENCODINGS[enc]))
+
+    checksum = digest.hexdigest()
+    checksum_tmp = encoded_dir / f".{path.name}.sha256.{tag}.tmp"
+    checksum_tmp.write_text(checksum)
+    os.replace(checksum_tmp, _sidecar(path, ".sha256"))
+    return checksum
+
+
+def checksum_for(path: Path) -> str:
+    """SHA-256 del resultado (del sidecar si está al día; si no, se regenera)."""
+    sidecar = _sidecar(path, ".sha256")
+    if _fresh(sidecar, path):
+        return sidecar.read_text().strip()
+    return prepare_download(path)
+
+
+def encoded_variant(path: Path, encoding: str) -> Optional[Path]:
+    """Copia precomprimida del resultado con ese Content-Encoding, si está al día."""
+    if encoding == "zstd" and not _zstd_available():
+        return None
+    sidecar = _sidecar(path, ENCODINGS[encoding])
+    return sidecar if _fresh(sidecar, path) else None
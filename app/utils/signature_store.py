@@ -0,0 +1,188 @@
+"""
+Almacén persistente de firmas por donante.
+
+La firma de 96 contextos de un donante no cambia entre jobs, así que en lugar
+de volver a leer su CSV en cada merge se guarda una sola vez como una fila
+float64 de un archivo binario (``signatures.f64``, leído con ``np.memmap``),
+con los contextos en un orden canónico común. Un índice SQLite junto a él
+asocia cada donante a su fila y guarda el tamaño y mtime del CSV del que
+salió: si el CSV cambia (revalidación de la caché), la fila deja de valer y
+se añade una nueva.
+
+El almacén crece por anexión: las filas nuevas se escriben al final bajo un
+bloqueo de archivo (varios workers pueden hacer merge a la vez) y solo
+después se registran en el índice, de modo que un lector nunca apunta a una
+fila sin escribir. Construir la matriz de un job es entonces un fancy-index
+sobre el memmap: se copian bytes en lugar de parsear archivos.
+"""
+import fcntl
+import json
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+DTYPE = np.dtype("<f8")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signature_store (
+    donor_id TEXT PRIMARY KEY,
+    row INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signature_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SignatureStore:
+    """
+    Matriz donante x contexto en disco con índice SQLite.
+
+    - store_dir: directorio del almacén (datos, índice y bloqueo)
+    - n_contexts: contextos por firma (columnas de cada fila)
+    """
+
+    def __init__(self, store_dir: Path, n_contexts: int = 96):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.store_dir / "signatures.f64"
+        self.index_path = self.store_dir / "index.sqlite3"
+        self.lock_path = self.store_dir / "store.lock"
+        self.n_contexts = n_contexts
+        self.row_bytes = n_contexts * DTYPE.itemsize
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexiones cortas: el índice se comparte entre procesos y threads.
+        # Se usan como closing(...) + transacción: "with conn" no cierra
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ------------------------------
+    # Consultas
+    # ------------------------------
+    def contexts(self) -> Optional[list[str]]:
+        """Orden canónico de los contextos (None mientras el almacén esté vacío)."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT value FROM signature_meta WHERE key = 'contexts'"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rows_for(self, sources: dict[str, os.stat_result]) -> dict[str, int]:
+        """
+        Filas vigentes de los donantes pedidos, con una única consulta.
+
+        Args:
+            sources: donante -> stat del CSV actual; una fila solo vale si se
+                generó a partir de un CSV con el mismo tamaño y mtime
+        """
+        with closing(self._connect()) as conn, conn:
+            entries = conn.execute(
+                "SELECT donor_id, row, size, mtime_ns FROM signature_store "
+                "WHERE donor_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(sources)),),
+            ).fetchall()
+        return {
+            donor_id: row
+            for donor_id, row, size, mtime_ns in entries
+            if sources[donor_id].st_size == size and sources[donor_id].st_mtime_ns == mtime_ns
+        }
+
+    def matrix(self) -> np.ndarray:
+        """Vista memmap de todas las filas escritas (donantes x contextos)."""
+        n_rows = self.data_path.stat().st_size // self.row_bytes if self.data_path.exists() else 0
+        if n_rows == 0:
+            return np.empty((0, self.n_contexts), dtype=DTYPE)
+        return np.memmap(self.data_path, dtype=DTYPE, mode="r", shape=(n_rows, self.n_contexts))
+
+    def take(self, rows: Iterable[int]) -> np.ndarray:
+        """Copia las filas pedidas, en ese orden (fancy-index sobre el memmap)."""
+        return np.asarray(self.matrix()[np.fromiter(rows, dtype=np.int64)])
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as conn, conn:
+            (donors,) = conn.execute("SELECT COUNT(*) FROM signature_store").fetchone()
+        size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        return {"donors": donors, "rows": size // self.row_bytes, "bytes": size}
+
+    # ------------------------------
+    # Escrituras
+    # ------------------------------
+    def add_many(
+        self, signatures: dict[str, tuple[list[str], list[float], os.stat_result]]
+    ) -> dict[str, int]:
+        """
+        Añade firmas al final del almacén.
+
+        Args:
+            signatures: donante -> (contextos, valores, stat del CSV leído)
+
+        Returns:
+            Filas asignadas; no incluye las firmas que no tienen exactamente
+            los contextos canónicos (quedan fuera del almacén)
+        """
+        if not signatures:
+            return {}
+        with self._locked():
+            contexts = self.contexts()
+            if contexts is None:
+                first = next(iter(signatures.values()))[0]
+                contexts = sorted(first)
+            position = {context: i for i, context in enumerate(contexts)}
+            if len(position) != self.n_contexts:
+                return {}
+
+            block = []
+            accepted = []
+            for donor_id, (types, values, stat) in signatures.items():
+                if len(types) != self.n_contexts or set(types) != position.keys():
+                    continue
+                row = np.empty(self.n_contexts, dtype=DTYPE)
+                row[[position[t] for t in types]] = values
+                block.append(row)
+                accepted.append((donor_id, stat))
+            if not block:
+                return {}
+
+            fd = os.open(self.data_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                # Un anexo interrumpido puede dejar una fila a medias: se pisa
+                first_row = os.fstat(fd).st_size // self.row_bytes
+                os.pwrite(fd, np.stack(block).tobytes(), first_row * self.row_bytes)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            rows = {donor_id: first_row + i for i, (donor_id, _) in enumerate(accepted)}
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO signature_meta (key, value) VALUES ('contexts', ?)",
+                    (json.dumps(contexts),),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO signature_store (donor_id, row, size, mtime_ns) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (donor_id, rows[donor_id], stat.st_size, stat.st_mtime_ns)
+                        for donor_id, stat in accepted
+                    ],
+                )
+        return rows
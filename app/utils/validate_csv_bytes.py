@@ -1,72 +1,190 @@
+import codecs
 import csv
-import io
 
+# Límites de memoria del validador en streaming
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 20
 
-def validate_csv_bytes(
-    content: bytes, max_sample_bytes: int = 65536, max_rows: int = 500
-):
-    errors = []
-    info = {}
-    for encoding in ("utf-8", "latin-1"):
-        try:
-            text = content.decode(encoding)
-            used_encoding = encoding
-            break
-        except UnicodeDecodeError:
-            used_encoding = None
-    else:
-        errors.append("No se pudo decodificar el archivo como UTF-8 ni latin-1.")
-        return {"valid": False, "errors": errors, "info": {}}
-
-    sample = text[:max_sample_bytes]
-    if not sample.strip():
-        errors.append(
-            "El archivo está vacío o contiene solo espacios/lineas en blanco."
-        )
-        return {"valid": False, "errors": errors, "info": {}}
-
-    sniffer = csv.Sniffer()
-    try:
-        dialect = sniffer.sniff(sample)
-        delimiter = dialect.delimiter
-    except (csv.Error, Exception):
-        delimiter = next((d for d in [",", ";", "\t", "|"] if d in sample), ",")
-
-    info["delimiter"] = delimiter
-    try:
-        info["has_header"] = sniffer.has_header(sample)
-    except Exception:
-        info["has_header"] = False
-
-    try:
-        stream = io.StringIO(text)
-        reader = csv.reader(stream, delimiter=delimiter)
-        rows = []
-        expected_cols = None
-        for n, row in enumerate(reader, 1):
-            if not any(cell.strip() for cell in row):
-                continue
-            rows.append(row)
-            if expected_cols is None:
-                expected_cols = len(row)
-            elif len(row) != expected_cols:
-                errors.append(
-                    f"Inconsistencia de columnas en la fila {n}: tiene {len(row)} columnas, se esperaban {expected_cols}."
-                )
-            if len(rows) >= max_rows:
-                break
-        if not rows:
-            errors.append("No se encontraron filas útiles en el CSV.")
-        info.update(
+
+class CSVStreamValidator:
+    """
+    Valida un CSV a medida que llegan sus bytes, sin cargarlo entero.
+
+    - La codificación y el delimitador se deciden con el primer bloque
+      (`max_sample_bytes`).
+    - El resto se decodifica de forma incremental y se comprueba fila a fila
+      que el número de columnas sea consistente.
+    - En memoria solo quedan el primer bloque (hasta decidir el dialecto) y
+      la línea incompleta en curso.
+    """
+
+    def __init__(self, max_sample_bytes: int = 65536, max_rows=None):
+        self.max_sample_bytes = max_sample_bytes
+        self.max_rows = max_rows
+        self.errors: list[str] = []
+        self.info: dict = {}
+        self._head = bytearray()
+        self._decoder = None
+        self._encoding = None
+        self._delimiter = ","
+        self._pending = ""
+        self._record = ""
+        self._line_no = 0
+        self._n_rows = 0
+        self._expected_cols = None
+        self._sample_rows: list[list[str]] = []
+        self._n_errors = 0
+        self._failed = False
+
+    # ------------------------------
+    # Entrada
+    # ------------------------------
+    def feed(self, chunk: bytes):
+        if self._failed or not chunk:
+            return
+        if self._decoder is None:
+            self._head.extend(chunk)
+            if len(self._head) >= self.max_sample_bytes:
+                self._start(final=False)
+            return
+        self._consume(self._decode(chunk))
+
+    def close(self) -> dict:
+        """Termina la validación y devuelve {"valid", "errors", "info"}."""
+        if self._failed:
+            return {"valid": False, "errors": self.errors, "info": {}}
+        if self._decoder is None:
+            self._start(final=True)
+            if self._failed:
+                return {"valid": False, "errors": self.errors, "info": {}}
+        self._consume(self._decode(b"", final=True))
+        if self._pending:
+            self._add_line(self._pending)
+            self._pending = ""
+        if self._record:
+            self._add_record(self._record)
+            self._record = ""
+
+        if self._n_rows == 0:
+            self.errors.append("No se encontraron filas útiles en el CSV.")
+        if self._n_errors > MAX_REPORTED_ERRORS:
+            self.errors.append(
+                f"... y {self._n_errors - MAX_REPORTED_ERRORS} inconsistencias más."
+            )
+        self.info.update(
             {
-                "n_sample_rows": len(rows),
-                "n_columns": expected_cols or 0,
-                "sample_rows": rows[:5],
-                "encoding": used_encoding,
+                "n_sample_rows": self._n_rows,
+                "n_columns": self._expected_cols or 0,
+                "sample_rows": self._sample_rows,
+                "encoding": self._encoding,
             }
         )
-    except Exception as e:
-        errors.append(f"Error leyendo CSV: {e}")
+        return {"valid": len(self.errors) == 0, "errors": self.errors, "info": self.info}
+
+    # ------------------------------
+    # Internos
+    # ------------------------------
+    def _fail(self, message: str):
+        self.errors.append(message)
+        self._failed = True
 
-    return {"valid": len(errors) == 0, "errors": errors, "info": info}
+    def _start(self, final: bool):
+        """Decide codificación y dialecto a partir del primer bloque."""
+        head = bytes(self._head)
+        self._head = bytearray()
+        for encoding in ("utf-8", "latin-1"):
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                text = decoder.decode(head, final=final)
+            except UnicodeDecodeError:
+                continue
+            self._decoder = decoder
+            self._encoding = encoding
+            break
+        else:
+            self._fail("No se pudo decodificar el archivo como UTF-8 ni latin-1.")
+            return
 
+        sample = text[: self.max_sample_bytes]
+        if final and not sample.strip():
+            self._fail("El archivo está vacío o contiene solo espacios/lineas en blanco.")
+            return
+
+        sniffer = csv.Sniffer()
+        try:
+            dialect = sniffer.sniff(sample)
+            self._delimiter = dialect.delimiter
+        except (csv.Error, Exception):
+            self._delimiter = next(
+                (d for d in [",", ";", "\t", "|"] if d in sample), ","
+            )
+        self.info["delimiter"] = self._delimiter
+        try:
+            self.info["has_header"] = sniffer.has_header(sample)
+        except Exception:
+            self.info["has_header"] = False
+
+        self._consume(text)
+
+    def _decode(self, chunk: bytes, final: bool = False) -> str:
+        try:
+            return self._decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            # UTF-8 inválido más allá del primer bloque: el resto como latin-1
+            buffered, _ = self._decoder.getstate()
+            self._decoder = codecs.getincrementaldecoder("latin-1")()
+            self._encoding = "latin-1"
+            return self._decoder.decode(buffered + chunk, final=final)
+
+    def _consume(self, text: str):
+        if not text:
+            return
+        lines = (self._pending + text).splitlines(keepends=True)
+        self._pending = ""
+        if lines and not lines[-1].endswith(("\n", "\r")):
+            self._pending = lines.pop()
+            if len(self._pending) > MAX_LINE_BYTES:
+                self._fail(f"Línea {self._line_no + 1} demasiado larga.")
+                return
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line: str):
+        self._line_no += 1
+        self._record += line
+        # Un campo entre comillas puede abarcar varias líneas
+        if self._record.count('"') % 2 == 0:
+            record, self._record = self._record, ""
+            self._add_record(record)
+        elif len(self._record) > MAX_LINE_BYTES:
+            self._fail(f"Registro demasiado largo cerca de la línea {self._line_no}.")
+
+    def _add_record(self, record: str):
+        if self.max_rows is not None and self._n_rows >= self.max_rows:
+            return
+        try:
+            row = next(csv.reader([record], delimiter=self._delimiter), [])
+        except csv.Error as e:
+            self.errors.append(f"Error leyendo CSV: {e}")
+            return
+        if not any(cell.strip() for cell in row):
+            return
+        self._n_rows += 1
+        if len(self._sample_rows) < 5:
+            self._sample_rows.append(row)
+        if self._expected_cols is None:
+            self._expected_cols = len(row)
+        elif len(row) != self._expected_cols:
+            self._n_errors += 1
+            if self._n_errors <= MAX_REPORTED_ERRORS:
+                self.errors.append(
+                    f"Inconsistencia de columnas en la fila {self._line_no}: tiene {len(row)} columnas, se esperaban {self._expected_cols}."
+                )
+
+
+def validate_csv_bytes(
+    content: bytes, max_sample_bytes: int = 65536, max_rows: int = 500
+):
+    validator = CSVStreamValidator(max_sample_bytes=max_sample_bytes, max_rows=max_rows)
+    validator.feed(content)
+    return validator.close()
@@ -0,0 +1,110 @@
+"""
+Benchmark del paso de merge (destructure_csvs) según el número de donantes.
+
+Genera directorios sintéticos de descargas a partir de los CSV de la caché y
+mide, en un proceso limpio por caso, el tiempo de merge y el pico de RSS del
+motor vectorizado frente al outer join iterativo anterior.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_merge
+    python -m benchmarks.bench_merge --sizes 100 1000 10000 --legacy-max 1000
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import shutil
+import tempfile
+import time
+from itertools import cycle
+from pathlib import Path
+
+import pandas as pd
+
+from app.utils.destructure_file import destructure_csvs
+
+CACHE_DIR = Path(__file__).resolve().parents[1] / "app" / "integrations" / "cache"
+
+
+def legacy_destructure_csvs(work_dir: Path, mapping: dict):
+    """Implementación previa: un outer join por archivo."""
+    downloads_dir = work_dir / "downloads"
+    combined_df = None
+    for csv_file in downloads_dir.glob("*.csv"):
+        if csv_file.name == "combined.csv":
+            continue
+        do_id = csv_file.stem
+        df = pd.read_csv(csv_file)
+        df.columns = ["Type", mapping.get(do_id, do_id)]
+        df.set_index("Type", inplace=True)
+        combined_df = df if combined_df is None else combined_df.join(df, how="outer")
+    combined_df.reset_index(inplace=True)
+    combined_path = downloads_dir / "combined.csv"
+    combined_df.to_csv(combined_path, index=False)
+    return combined_path
+
+
+def make_work_dir(root: Path, n_donors: int) -> tuple[Path, dict]:
+    """Crea works/<n>/downloads con n_donors CSV copiados (cíclicamente) de la caché."""
+    work_dir = root / f"work_{n_donors}"
+    downloads_dir = work_dir / "downloads"
+    downloads_dir.mkdir(parents=True)
+    sources = cycle(sorted(CACHE_DIR.glob("*.csv")))
+    mapping = {}
+    for i in range(n_donors):
+        do_id = f"DO{i:06d}"
+        shutil.copyfile(next(sources), downloads_dir / f"{do_id}.csv")
+        mapping[do_id] = f"SP{i:06d}"
+    return work_dir, mapping
+
+
+def _measure(engine: str, work_dir: Path, mapping: dict, queue):
+    fn = destructure_csvs if engine == "vectorized" else legacy_destructure_csvs
+    start = time.perf_counter()
+    fn(work_dir, mapping)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb / 1024))
+
+
+def measure(engine: str, work_dir: Path, mapping: dict) -> tuple[float, float]:
+    """Ejecuta el merge en un proceso nuevo para que el pico de RSS sea independiente."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(engine, work_dir, mapping, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=1000,
+        help="Tamaño máximo para el que se mide el join iterativo (es cuadrático)",
+    )
+    args = parser.parse_args()
+
+    print(f"{'donantes':>9} {'motor':>11} {'tiempo (s)':>11} {'pico RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            work_dir, mapping = make_work_dir(Path(tmp), n)
+            engines = ["vectorized"]
+            if n <= args.legacy_max:
+                engines.append("legacy")
+            outputs = {}
+            for engine in engines:
+                elapsed, peak_mb = measure(engine, work_dir, mapping)
+                combined = work_dir / "downloads" / "combined.csv"
+                outputs[engine] = combined.read_bytes()
+                combined.unlink()
+                print(f"{n:>9} {engine:>11} {elapsed:>11.3f} {peak_mb:>14.1f}")
+            if len(outputs) == 2 and outputs["vectorized"] != outputs["legacy"]:
+                print(f"⚠️ Salidas distintas para {n} donantes")
+
+
+if __name__ == "__main__":
+    main()
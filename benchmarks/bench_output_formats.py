@@ -0,0 +1,88 @@
+"""
+Benchmark de los formatos de salida de la matriz combinada.
+
+Para cada número de donantes construye la matriz a partir de CSV sintéticos
+(copiados de la caché) y mide, por formato y layout: tiempo de escritura,
+tamaño del archivo y tiempo de lectura aguas abajo (cargar el archivo en un
+DataFrame ancho con read_matrix). Se comprueba además que la lectura
+devuelve la misma matriz que se escribió.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_output_formats
+    python -m benchmarks.bench_output_formats --sizes 1000 10000 --repeat 3
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.destructure_file import build_signature_matrix
+from app.utils.output_formats import (
+    LAYOUTS,
+    available_formats,
+    read_matrix,
+    result_filename,
+    write_matrix,
+)
+from benchmarks.bench_merge import make_work_dir
+
+
+def best_of(repeat: int, fn):
+    """Mejor tiempo de `repeat` ejecuciones y el último resultado."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    formats = available_formats()
+    print(f"Formatos disponibles: {', '.join(formats)}")
+    print(
+        f"{'donantes':>9} {'formato':>8} {'layout':>6} "
+        f"{'escritura (s)':>14} {'tamaño (MB)':>12} {'lectura (s)':>12} {'vs csv':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            work_dir, mapping = make_work_dir(Path(tmp), n)
+            csv_files = sorted((work_dir / "downloads").glob("*.csv"))
+            df = build_signature_matrix(csv_files, mapping)
+            out_dir = work_dir / "out"
+            out_dir.mkdir()
+
+            baseline = None
+            for layout in LAYOUTS:
+                for output_format in formats:
+                    path = out_dir / result_filename(output_format, layout)
+                    write_s, _ = best_of(
+                        args.repeat, lambda: write_matrix(df, path, output_format, layout)
+                    )
+                    read_s, loaded = best_of(args.repeat, lambda: read_matrix(path))
+                    size_mb = path.stat().st_size / (1024 * 1024)
+                    if baseline is None:
+                        baseline = size_mb
+
+                    same = np.allclose(
+                        loaded.loc[df.index, df.columns].to_numpy(dtype=float),
+                        df.to_numpy(dtype=float),
+                        equal_nan=True,
+                    )
+                    print(
+                        f"{n:>9} {output_format:>8} {layout:>6} {write_s:>14.3f} "
+                        f"{size_mb:>12.2f} {read_s:>12.3f} {size_mb / baseline:>6.2f}x"
+                        + ("" if same else "  ⚠️ matriz distinta")
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark del flujo de navegador con y sin bloqueo de recursos.
+
+Levanta el sitio de pruebas local (app.integrations.stub_server, con imagen,
+fuente, hoja de estilos y un script de analítica lento) y descarga los mismos
+donantes dos veces:
+
+- antes: sin route handler y esperando ``networkidle`` tras cada navegación
+  (flujo anterior del scraper)
+- después: ResourcePolicy (analítica en "localhost" bloqueada) y esperas
+  sobre selectores
+
+Para cada caso muestra la latencia por donante y los bytes servidos por el
+sitio, y comprueba que los CSV descargados son idénticos. Requiere Chromium
+de Playwright (``playwright install chromium``).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_resource_blocking
+    python -m benchmarks.bench_resource_blocking --donors 20 --tracker-delay 1.5
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from app.integrations.resource_policy import DEFAULT_BLOCKED_DOMAINS, ResourcePolicy
+from app.integrations.stub_server import start_stub_server
+from app.integrations.test import (
+    CSV_BUTTON_SELECTOR,
+    GO_BUTTON_SELECTOR,
+    INPUT_SELECTOR,
+    SEARCH_SELECTOR,
+    _download_donor,
+    _open_page,
+)
+
+
+async def legacy_open_page(browser, base_url: str):
+    """Apertura anterior: todos los recursos y espera a networkidle."""
+    context = await browser.new_context(accept_downloads=True)
+    page = await context.new_page()
+    await page.goto(base_url, timeout=60000)
+    await page.wait_for_load_state("networkidle")
+    return context, page
+
+
+async def legacy_download_donor(page, id_: str, dest: Path):
+    """Flujo anterior de descarga, con networkidle tras abrir la muestra."""
+    await page.click(SEARCH_SELECTOR)
+    await page.wait_for_selector(INPUT_SELECTOR, timeout=15000, state="visible")
+    await page.locator(INPUT_SELECTOR).fill(id_)
+    await page.wait_for_selector(GO_BUTTON_SELECTOR, timeout=15000, state="visible")
+    await page.click(GO_BUTTON_SELECTOR)
+    await page.wait_for_load_state("networkidle")
+    await page.wait_for_selector(CSV_BUTTON_SELECTOR, timeout=20000, state="visible")
+    async with page.expect_download() as download_info:
+        await page.click(CSV_BUTTON_SELECTOR)
+    await (await download_info.value).save_as(str(dest))
+
+
+async def run_case(blocking: bool, base_url: str, ids: list[str], out_dir: Path) -> list[float]:
+    """Descarga ``ids`` en un único contexto y devuelve la latencia de cada donante."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    latencies = []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        if blocking:
+            policy = ResourcePolicy(blocked_domains=DEFAULT_BLOCKED_DOMAINS + ("localhost",))
+            context, page = await _open_page(browser, base_url, policy)
+            download = _download_donor
+        else:
+            context, page = await legacy_open_page(browser, base_url)
+            download = legacy_download_donor
+
+        for id_ in ids:
+            started = time.perf_counter()
+            await download(page, id_, out_dir / f"{id_}.csv")
+            latencies.append(time.perf_counter() - started)
+
+        await context.close()
+        await browser.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--donors", type=int, default=10)
+    parser.add_argument("--tracker-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    ids = [f"DO{i}" for i in range(args.donors)]
+    print(f"{'caso':>8} {'media (s)':>10} {'p95 (s)':>8} {'peticiones':>11} {'KB servidos':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {}
+        for name, blocking in (("antes", False), ("después", True)):
+            server, base_url = start_stub_server(tracker_delay=args.tracker_delay)
+            try:
+                latencies = asyncio.run(run_case(blocking, base_url, ids, Path(tmp) / name))
+            finally:
+                server.shutdown()
+            served = server.RequestHandlerClass.served
+            p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+            print(
+                f"{name:>8} {statistics.mean(latencies):>10.3f} {p95:>8.3f} "
+                f"{served['requests']:>11} {served['bytes'] / 1024:>12.1f}"
+            )
+            outputs[name] = {f.name: f.read_bytes() for f in (Path(tmp) / name).glob("*.csv")}
+
+        if outputs["antes"] != outputs["después"]:
+            print("⚠️ Los CSV descargados difieren entre ambos casos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark del almacén de firmas frente a leer los CSV en cada merge.
+
+Para cada número de donantes construye la matriz del job de tres formas:
+leyendo todos los CSV (build_signature_matrix, lo que hacía cada merge),
+con el almacén vacío (primer merge: lee los CSV y los añade) y con el
+almacén ya poblado (merges siguientes: fancy-index sobre el memmap). Se
+comprueba que las tres matrices son idénticas.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_signature_store
+    python -m benchmarks.bench_signature_store --sizes 1000 10000 --repeat 5
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.utils.destructure_file import build_matrix_from_store, build_signature_matrix
+from app.utils.signature_store import SignatureStore
+from benchmarks.bench_merge import make_work_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'donantes':>9} {'CSV (s)':>9} {'almacén frío (s)':>17} "
+        f"{'almacén caliente (s)':>21} {'aceleración':>12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            work_dir, mapping = make_work_dir(Path(tmp), n)
+            csv_files = sorted((work_dir / "downloads").glob("*.csv"))
+
+            parse_s = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                expected = build_signature_matrix(csv_files, mapping)
+                parse_s = min(parse_s, time.perf_counter() - start)
+
+            store = SignatureStore(Path(tmp) / f"store_{n}")
+            start = time.perf_counter()
+            cold = build_matrix_from_store(csv_files, mapping, store)
+            cold_s = time.perf_counter() - start
+
+            warm_s = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                warm = build_matrix_from_store(csv_files, mapping, store)
+                warm_s = min(warm_s, time.perf_counter() - start)
+
+            same = expected.equals(cold) and expected.equals(warm)
+            print(
+                f"{n:>9} {parse_s:>9.3f} {cold_s:>17.3f} {warm_s:>21.3f} "
+                f"{parse_s / warm_s:>11.1f}x" + ("" if same else "  ⚠️ matriz distinta")
+            )
+
+
+if __name__ == "__main__":
+    main()